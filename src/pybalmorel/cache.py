@@ -0,0 +1,521 @@
+"""
+Caches for results extracted from gdx files and for the Balmorel folder structure
+"""
+#%% ------------------------------- ###
+###        0. Script Settings       ###
+### ------------------------------- ###
+
+import os
+import json
+import hashlib
+import threading
+import pandas as pd
+from pathlib import Path
+from collections import OrderedDict
+
+def read_json(path: Path) -> dict:
+    """Read a json file, or an empty dictionary if it does not exist or is corrupt"""
+    if path.exists():
+        try:
+            return json.loads(path.read_text())
+        except json.JSONDecodeError:
+            return {}
+    else:
+        return {}
+
+def write_atomically(path: Path, write):
+    """Write to a temporary file and rename it, so other processes never see a partially written file
+
+    Args:
+        path (Path): The file to write
+        write (callable): Function writing the content to the temporary file path it receives
+    """
+    # Unique per thread, and removed again if writing fails
+    tmp = path.with_name(f'.{path.name}.{os.getpid()}.{threading.get_ident()}.tmp')
+    try:
+        write(tmp)
+        os.replace(tmp, path)
+    finally:
+        tmp.unlink(missing_ok=True)
+
+def file_hash(path: str | Path) -> str:
+    """Content hash of a file, read in chunks"""
+    content_hash = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(2**23), b''):
+            content_hash.update(chunk)
+    return content_hash.hexdigest()
+
+def write_if_changed(path: Path, write) -> bool:
+    """Write to a temporary file and rename it, unless the content is the same as the existing file, which then keeps its modification time
+
+    Args:
+        path (Path): The file to write
+        write (callable): Function writing the content to the temporary file path it receives
+
+    Returns:
+        bool: Whether the file was written
+    """
+    # Unique per thread, keeping the suffix for writers that need it, and removed again if writing fails
+    tmp = path.with_name(f'.{path.stem}.{os.getpid()}.{threading.get_ident()}{path.suffix}')
+    try:
+        write(tmp)
+        if path.exists() and path.stat().st_size == tmp.stat().st_size and file_hash(path) == file_hash(tmp):
+            return False
+        os.replace(tmp, path)
+        return True
+    finally:
+        tmp.unlink(missing_ok=True)
+
+#%% ------------------------------- ###
+###        1. In-Memory Cache       ###
+### ------------------------------- ###
+
+class ResultCache:
+    """A least-recently-used cache of DataFrames, bounded by the memory they use.
+    Keys are tuples of (symbol, columns, scenarios, filters, aggregation)
+
+    Args:
+        max_bytes (int): Memory budget of the cache in bytes. 0 disables the cache.
+    """
+    def __init__(self, max_bytes: int = 2**30):
+        self.max_bytes = int(max_bytes)
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self.nbytes = 0
+
+    def get(self, key: tuple) -> pd.DataFrame | None:
+        """Get a DataFrame from the cache and mark it as recently used. Returns None if not cached"""
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key][0]
+        else:
+            self.misses += 1
+            return None
+
+    def put(self, key: tuple, df: pd.DataFrame) -> bool:
+        """Store a DataFrame, evicting the least recently used ones if the memory budget is exceeded. Returns False if it was not stored"""
+        if self.max_bytes <= 0:
+            return False
+        nbytes = int(df.memory_usage(deep=True).sum())
+        if nbytes > self.max_bytes:
+            # Too big to be cached
+            return False
+
+        self.pop(key)
+        self._entries[key] = (df, nbytes)
+        self.nbytes += nbytes
+        while self.nbytes > self.max_bytes:
+            self.pop(next(iter(self._entries)))
+        return True
+
+    def pop(self, key: tuple):
+        """Remove a DataFrame from the cache"""
+        if key in self._entries:
+            self.nbytes -= self._entries.pop(key)[1]
+
+    def invalidate(self, scenarios: list | None = None):
+        """Remove all DataFrames, or the ones that contain any of the given scenarios
+
+        Args:
+            scenarios (list, optional): Scenarios to invalidate. Defaults to None, which clears the cache.
+        """
+        if scenarios is None:
+            self._entries.clear()
+            self.nbytes = 0
+        else:
+            for key in [key for key in self._entries if any(SC in key[2] for SC in scenarios)]:
+                self.pop(key)
+
+    def info(self) -> dict:
+        """Hits, misses and memory use of the cache"""
+        return {'hits' : self.hits, 'misses' : self.misses, 'entries' : len(self._entries),
+                'bytes' : self.nbytes, 'max_bytes' : self.max_bytes}
+
+    def __len__(self):
+        return len(self._entries)
+
+
+#%% ------------------------------- ###
+###          2. Disk Cache          ###
+### ------------------------------- ###
+
+class DiskCache:
+    """Symbols extracted from gdx files, stored as uncompressed Arrow (Feather) files that can be memory-mapped.
+    The files are stored in a folder per gdx file content, so they can be shared between sessions, 
+    processes and copies of the same gdx file
+
+    Args:
+        directory (str, Path): The cache folder, will be created if it does not exist
+    """
+    def __init__(self, directory: str | Path):
+        try:
+            import pyarrow.feather
+        except ImportError:
+            raise ImportError("The on-disk cache requires pyarrow, install it with: pip install pyarrow")
+        self._feather = pyarrow.feather
+
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._index_file = self.directory / 'index.json'
+        self._index = {}
+        self._index_mtime = None
+
+    def _read_index(self, force: bool = False) -> dict:
+        """The index of gdx file hashes, only read again if another process or session wrote to the index file"""
+        try:
+            mtime = self._index_file.stat().st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if force or mtime != self._index_mtime:
+            self._index = read_json(self._index_file)
+            self._index_mtime = mtime
+        return self._index
+
+    def file_hash(self, gdx_file: str | Path) -> str:
+        """Content hash of a gdx file. Only computed again if the size or modification time of the file changed"""
+        gdx_file = Path(gdx_file).absolute()
+        stat = gdx_file.stat()
+        entry = self._read_index().get(str(gdx_file))
+        if entry is not None and entry['size'] == stat.st_size and entry['mtime'] == stat.st_mtime:
+            return entry['hash']
+        
+        content_hash = file_hash(gdx_file)
+        
+        # Store it, other processes might have written to the index in the meantime
+        index = self._read_index(force=True)
+        index[str(gdx_file)] = {'size' : stat.st_size, 'mtime' : stat.st_mtime, 'hash' : content_hash}
+        write_atomically(self._index_file, lambda tmp: tmp.write_text(json.dumps(index, indent=1)))
+        self._index_mtime = self._index_file.stat().st_mtime_ns
+        
+        return content_hash
+
+    def path(self, gdx_file: str | Path, symbol: str, result_type: str = 'balmorel') -> Path:
+        """Path of the cached symbol"""
+        return self.directory / self.file_hash(gdx_file) / f'{symbol}.{result_type.lower()}.feather'
+
+    def get(self, gdx_file: str | Path, symbol: str, result_type: str = 'balmorel') -> pd.DataFrame | None:
+        """Read a cached symbol through a memory map. Returns None if it is not cached"""
+        path = self.path(gdx_file, symbol, result_type)
+        if path.exists():
+            return self._feather.read_table(path, memory_map=True).to_pandas()
+        else:
+            return None
+
+    def put(self, gdx_file: str | Path, symbol: str, df: pd.DataFrame, result_type: str = 'balmorel'):
+        """Store an extracted symbol. Empty symbols are not stored"""
+        if len(df.columns) == 0:
+            return
+        path = self.path(gdx_file, symbol, result_type)
+        path.parent.mkdir(exist_ok=True)
+        write_atomically(path, lambda tmp: self._feather.write_feather(df, tmp, compression='uncompressed'))
+
+    def clear(self):
+        """Delete all cached symbols"""
+        for path in self.directory.glob('*/*.feather'):
+            path.unlink()
+        for folder in self.directory.iterdir():
+            if folder.is_dir() and not any(folder.iterdir()):
+                folder.rmdir()
+        self._index_file.unlink(missing_ok=True)
+        self._index = {}
+        self._index_mtime = None
+
+
+#%% ------------------------------- ###
+###         3. Scenario Index       ###
+### ------------------------------- ###
+
+def user_cache_directory() -> Path:
+    """The folder where pybalmorel stores caches of the current user, e.g. ~/.cache/pybalmorel or %LOCALAPPDATA%\\pybalmorel"""
+    if os.name == 'nt' and os.environ.get('LOCALAPPDATA'):
+        return Path(os.environ['LOCALAPPDATA']) / 'pybalmorel'
+    return Path(os.environ.get('XDG_CACHE_HOME') or Path.home() / '.cache') / 'pybalmorel'
+
+class ScenarioIndex:
+    """The folders of a Balmorel model, and whether their model folder contains a model and MainResults files. 
+    A folder is only listed again if its modification time changed. The index is stored outside the Balmorel folder, 
+    so writing it does not change the modification times it watches
+
+    Args:
+        model_folder (str, Path): The top level folder of Balmorel, where base and simex are located
+        index_directory (str, Path, optional): Folder to store the index in, named by a hash of the resolved path of the model folder. 
+            Defaults to scenario_index in user_cache_directory().
+    """
+    def __init__(self, model_folder: str | Path, index_directory: str | Path | None = None):
+        self.path = Path(model_folder)
+        if index_directory is None:
+            index_directory = user_cache_directory() / 'scenario_index'
+        path_hash = hashlib.blake2b(str(self.path.resolve()).encode(), digest_size=16).hexdigest()
+        self._index_file = Path(index_directory) / f'{path_hash}.json'
+        self._index = read_json(self._index_file)
+        self.refresh()
+
+    def refresh(self):
+        """List the folders again that changed since the last refresh"""
+        changed = False
+        
+        # New or deleted scenario folders change the modification time of the Balmorel folder
+        mtime = self.path.stat().st_mtime
+        if self._index.get('mtime') != mtime:
+            folders = self._index.get('folders', {})
+            directories = sorted(entry.name for entry in os.scandir(self.path) if entry.is_dir())
+            self._index = {'mtime' : mtime, 'folders' : {name : folders.get(name, {}) for name in directories}}
+            changed = True
+        
+        # New or deleted files change the modification time of the model folders
+        for name, folder in self._index['folders'].items():
+            model_folder = self.path / name / 'model'
+            try:
+                model_mtime = model_folder.stat().st_mtime
+            except FileNotFoundError:
+                model_mtime = None
+            if 'model_mtime' in folder and folder['model_mtime'] == model_mtime:
+                continue
+            
+            files = [entry.name for entry in os.scandir(model_folder) if entry.is_file()] if model_mtime is not None else []
+            self._index['folders'][name] = {
+                'model_mtime' : model_mtime,
+                'model_folder' : model_mtime is not None,
+                'model' : 'Balmorel.gms' in files and ('cplex.op4' in files or 'cplex.op2' in files),
+                'results' : sorted(file for file in files if 'MainResults' in file and '.gdx' in file)
+            }
+            changed = True
+        
+        if changed:
+            try:
+                self._index_file.parent.mkdir(parents=True, exist_ok=True)
+                write_atomically(self._index_file, lambda tmp: tmp.write_text(json.dumps(self._index, indent=1)))
+            except OSError:
+                # The index is still used in this session if the cache folder is not writable
+                pass
+
+    @property
+    def directories(self) -> list:
+        """All folders in the Balmorel folder"""
+        return list(self._index['folders'].keys())
+
+    @property
+    def scenario_folders(self) -> list:
+        """All folders, excluding simex and hidden folders"""
+        return [name for name in self._index['folders'] if name != 'simex' and name[0] != '.']
+
+    def has_model(self, scenario: str) -> bool:
+        """Whether the model folder of a scenario contains Balmorel.gms and a cplex.op4 or cplex.op2 file"""
+        return self._index['folders'][scenario]['model']
+
+    def has_model_folder(self, folder: str) -> bool:
+        """Whether a folder contains a model folder"""
+        return self._index['folders'][folder]['model_folder']
+
+    def results(self, scenario: str) -> list:
+        """The MainResults files in the model folder of a scenario"""
+        return list(self._index['folders'][scenario]['results'])
+
+
+#%% ------------------------------- ###
+###          4. File Manifest       ###
+### ------------------------------- ###
+
+def build_manifest(files: list, previous: dict | None = None) -> dict:
+    """
+    Content hashes of files. Hashes in a previous manifest are reused for files with the same size and modification time
+
+    Args:
+        files (list): Paths to the files
+        previous (dict, optional): A previous manifest. Defaults to None.
+
+    Returns:
+        dict: Absolute paths pointing to the size, modification time and content hash of each file
+    """
+    if previous is None:
+        previous = {}
+    manifest = {}
+    for file in files:
+        file = Path(file).absolute()
+        stat = file.stat()
+        entry = previous.get(str(file))
+        if entry is not None and entry['size'] == stat.st_size and entry['mtime'] == stat.st_mtime:
+            manifest[str(file)] = entry
+        else:
+            manifest[str(file)] = {'size' : stat.st_size, 'mtime' : stat.st_mtime, 'hash' : file_hash(file)}
+    return manifest
+
+def compare_manifests(old: dict, new: dict) -> dict:
+    """
+    Files that were added, removed or whose content changed between two manifests
+
+    Args:
+        old (dict): The previous manifest
+        new (dict): The current manifest
+
+    Returns:
+        dict: Lists of 'added', 'removed' and 'changed' files
+    """
+    return {'added' : sorted(file for file in new if file not in old),
+            'removed' : sorted(file for file in old if file not in new),
+            'changed' : sorted(file for file in new if file in old and new[file]['hash'] != old[file]['hash'])}
+
+
+#%% ------------------------------- ###
+###          5. Input Store         ###
+### ------------------------------- ###
+
+class InputStore:
+    """Input symbols of several scenarios, where symbols with the same content are stored once 
+    and shared between the scenarios, e.g. the symbols a scenario did not change from base
+    """
+    def __init__(self):
+        self._frames = {}
+        self._symbols = {}
+
+    def put(self, scenario: str, dfs: dict):
+        """Store the symbols of a scenario, replacing the ones stored before
+
+        Args:
+            scenario (str): The scenario
+            dfs (dict): Symbols pointing to their hash and dataframe, where the dataframe can be None if the hash is stored already
+        """
+        symbols = {}
+        for symbol, (df_hash, df) in dfs.items():
+            if df_hash not in self._frames:
+                if df is None:
+                    raise KeyError('No symbol with hash %s is stored, provide its dataframe'%df_hash)
+                self._frames[df_hash] = df
+            symbols[symbol] = df_hash
+        self._symbols[scenario] = symbols
+        self._drop_unused()
+
+    def get(self, scenario: str, symbol: str) -> pd.DataFrame:
+        """The dataframe of a symbol in a scenario. Do not modify it, as it may be shared with other scenarios"""
+        return self._frames[self._symbols[scenario][symbol]]
+
+    def hash(self, scenario: str, symbol: str) -> str | None:
+        """The content hash of a symbol in a scenario, or None if the scenario does not have it"""
+        return self._symbols.get(scenario, {}).get(symbol)
+
+    def hashes(self, scenario: str | None = None) -> set:
+        """The hashes of the symbols of a scenario, or of all stored symbols"""
+        if scenario is None:
+            return set(self._frames.keys())
+        return set(self._symbols.get(scenario, {}).values())
+
+    def symbols(self, scenario: str) -> list:
+        """The symbols of a scenario"""
+        return list(self._symbols.get(scenario, {}).keys())
+
+    @property
+    def scenarios(self) -> list:
+        return list(self._symbols.keys())
+
+    def shared(self, scenario: str, other: str = 'base') -> list:
+        """The symbols of a scenario with the same content as in another scenario"""
+        return [symbol for symbol, df_hash in self._symbols.get(scenario, {}).items() 
+                if self.hash(other, symbol) == df_hash]
+
+    def remove(self, scenario: str):
+        """Remove the symbols of a scenario, and the dataframes no other scenario uses"""
+        self._symbols.pop(scenario, None)
+        self._drop_unused()
+
+    def _drop_unused(self):
+        used = {df_hash for symbols in self._symbols.values() for df_hash in symbols.values()}
+        for df_hash in [df_hash for df_hash in self._frames if df_hash not in used]:
+            del self._frames[df_hash]
+
+    def memory_usage(self) -> pd.DataFrame:
+        """Memory used by the symbols of each scenario if they were stored separately, and memory actually used"""
+        nbytes = {df_hash : int(df.memory_usage(deep=True).sum()) for df_hash, df in self._frames.items()}
+        df = pd.DataFrame([(scenario, len(symbols), sum(nbytes[df_hash] for df_hash in symbols.values())) 
+                           for scenario, symbols in self._symbols.items()],
+                          columns=['Scenario', 'Symbols', 'Bytes'])
+        df.attrs['stored_bytes'] = sum(nbytes.values())
+        return df
+
+    def __contains__(self, scenario: str):
+        return scenario in self._symbols
+
+
+#%% ------------------------------- ###
+###          6. Shared Store        ###
+### ------------------------------- ###
+
+class SharedStore:
+    """Results of several scenarios in uncompressed Arrow (Feather) files, one per symbol, that worker processes 
+    memory-map instead of reading the gdx files again. The value columns are not copied into the memory of each 
+    process, so the operating system keeps one copy of the records for all of them. The store only holds the 
+    path to its folder, so it can be sent to worker processes
+
+    Args:
+        directory (str, Path): The store folder, will be created if it does not exist
+    """
+    def __init__(self, directory: str | Path):
+        try:
+            import pyarrow.feather
+        except ImportError:
+            raise ImportError("The shared store requires pyarrow, install it with: pip install pyarrow")
+        
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def path(self, symbol: str) -> Path:
+        return self.directory / f'{symbol}.feather'
+
+    def put(self, symbol: str, df: pd.DataFrame):
+        """Store a symbol, replacing it if it is stored already. String columns are stored dictionary encoded"""
+        import pyarrow.feather
+        df = df.astype({col : 'category' for col in df.columns 
+                        if pd.api.types.is_object_dtype(df[col]) or pd.api.types.is_string_dtype(df[col])})
+        write_atomically(self.path(symbol), lambda tmp: pyarrow.feather.write_feather(df, tmp, compression='uncompressed'))
+
+    def table(self, symbol: str):
+        """The memory-mapped Arrow table of a symbol"""
+        import pyarrow.feather
+        if not self.path(symbol).exists():
+            raise KeyError(f'{symbol} is not in the shared store {self.directory}')
+        return pyarrow.feather.read_table(self.path(symbol), memory_map=True)
+
+    def get(self, symbol: str, scenarios: list | str | None = None,
+            filters: dict | None = None) -> pd.DataFrame:
+        """Get a symbol, with records filtered before they are converted to pandas. 
+        The value columns of the returned DataFrame are read-only views of the memory-mapped file
+
+        Args:
+            symbol (str): The symbol
+            scenarios (list, optional): Only get these scenarios. Defaults to all.
+            filters (dict, optional): Only get records with these elements, e.g. {'Year' : '2050'}. Defaults to None.
+        """
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        table = self.table(symbol)
+        filters = dict(filters) if filters is not None else {}
+        if scenarios is not None:
+            filters['Scenario'] = scenarios
+        
+        if filters:
+            mask = None
+            for col, values in filters.items():
+                if col not in table.column_names:
+                    raise KeyError(f'{col} is not a column of {symbol}, choose from {", ".join(table.column_names)}')
+                if isinstance(values, str) or not hasattr(values, '__iter__'):
+                    values = [values]
+                col_mask = pc.is_in(table[col], value_set=pa.array([str(value) for value in values]))
+                mask = col_mask if mask is None else pc.and_(mask, col_mask)
+            table = table.filter(mask)
+        
+        return table.to_pandas(split_blocks=True)
+
+    @property
+    def symbols(self) -> list:
+        """The stored symbols"""
+        return sorted(path.stem for path in self.directory.glob('*.feather'))
+
+    def clear(self):
+        """Delete all stored symbols"""
+        for path in self.directory.glob('*.feather'):
+            path.unlink()
+
+    def __reduce__(self):
+        return (SharedStore, (str(self.directory),))
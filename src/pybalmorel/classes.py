@@ -8,19 +8,28 @@ Created on 08.06.2024
 ### ------------------------------- ###
 
 import os
+import re
 import sys
+import json
+import time
+import asyncio
+import threading
 import shutil
+import tempfile
 import gams
 import pandas as pd
 import numpy as np
 import requests
 from dataclasses import dataclass, field
+from collections import deque
 from urllib.parse import urljoin
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
 from typing import Union, Tuple, List
 from matplotlib.figure import Figure
 from matplotlib.axes import Axes
-from .utils import symbol_to_df
+from .utils import symbol_to_df, symbol_to_dfs, symbol_metadata, concat_scenarios, diff_frames, scenario_deltas, filter_df, aggregate_df, check_aggfunc, df_chunks, iter_symbol, gdx_to_dfs, symbol_hash, parse_incfiles, export_symbol, default_engine, default_chunk_rows, engines, parse_listing, RunReport, write_table, find_declaration, table_to_records, pivot_table, join_levels
+from .cache import ResultCache, DiskCache, ScenarioIndex, InputStore, SharedStore, read_json, write_atomically, write_if_changed, build_manifest, compare_manifests
 from .plotting.production_profile import plot_profile, plot_profiles
 from .plotting.maps_balmorel import plot_map
 
@@ -33,7 +42,12 @@ class MainResults:
                  paths: Union[str, list, tuple] = '.', 
                  scenario_names: str | list | tuple | None = None,
                  system_directory: str | None = None,
-                 result_type: str = 'balmorel'):
+                 result_type: str = 'balmorel',
+                 engine: str | None = None,
+                 lazy: bool = False,
+                 cache_size: int = 0,
+                 cache_dir: str | Path | None = None,
+                 max_workers: int = 1):
         """
         Initialises the MainResults class and loads gdx result file(s)
 
@@ -43,6 +57,11 @@ class MainResults:
             scenario_names (str, list, tuple): Name of scenarios corresponding to each gdx file, defaults to ['SC1', 'SC2', ..., 'SCN'] if None given
             system_directory (str, optional): GAMS system directory. Is not used if not specified.
             result_type (str, optional): Specifies the type of result to extract. Use 'optiflow' for OptiFlow results. If not specified, it defaults to extracting Balmorel GDX results.
+            engine (str, optional): How symbols are read, 'transfer' (columnar, through gams.transfer) or 'gams' (record by record). Defaults to 'transfer' if available.
+            lazy (bool, optional): Only read the symbol metadata of the gdx file(s) now, and read each symbol from the files the first time it is requested with get_result. Defaults to False.
+            cache_size (int, optional): Memory budget in bytes for remembering get_result outputs, the least recently used are removed first, e.g. 2**30 for 1 GiB. Defaults to 0, which disables it.
+            cache_dir (str, Path, optional): Folder to store extracted symbols in, so they can be read quickly in later sessions or by other processes. Requires pyarrow. Not used if not specified.
+            max_workers (int, optional): Amount of processes extracting a symbol from the gdx files at the same time. Defaults to 1.
         """
 
         ## Loading scenarios
@@ -94,49 +113,386 @@ class MainResults:
         self.paths = paths
         self.sc = scenario_names
         self.type = result_type
+        self.engine = engine if engine is not None else default_engine()
+        if self.engine not in engines:
+            raise ValueError("Unknown engine '%s', choose from %s"%(self.engine, ', '.join(engines)))
+        self.lazy = lazy
         self.db = {}
+        self.symbols = {}
+        self._resident = {SC : {} for SC in scenario_names}
+        self._mtimes = {}
+        self.cache = ResultCache(cache_size)
+        self.disk_cache = DiskCache(cache_dir) if cache_dir is not None else None
+        self.max_workers = max_workers
+        self.load_report = pd.DataFrame(columns=['Name', 'Symbol', 'Seconds', 'Records', 'Error'])
             
         if system_directory is not None:
-            ws = gams.GamsWorkspace(system_directory=system_directory)
+            self._workspace = gams.GamsWorkspace(system_directory=system_directory)
             self._gams_system_directory = system_directory
-        else:
-            ws = gams.GamsWorkspace()
+        elif not lazy:
+            self._workspace = gams.GamsWorkspace()
             
         for i in range(len(files)):    
-            print('Loading', str(Path(paths[i]) / files[i]))
+            self._load(scenario_names[i], Path(paths[i]) / files[i])
+    
+    def _load(self, scenario: str, file: Path):
+        """Load the gdx file of a scenario, or only its symbol metadata if lazy"""
+        if self.lazy:
+            # Only keep the path and read which symbols the file contains
+            print('Indexing', str(file))
+            if not file.exists():
+                raise FileNotFoundError(f'\nCouldnt find file {file.name} in {os.path.abspath(file.parent)}!')
+            self.db[scenario] = str(file.absolute())
+            self.symbols[scenario] = symbol_metadata(file, getattr(self, '_gams_system_directory', None))
+        else:
+            print('Loading', str(file))
             try:
-                self.db[scenario_names[i]] = ws.add_database_from_gdx(str((Path(paths[i]) / files[i]).absolute()))
+                self.db[scenario] = self._workspace.add_database_from_gdx(str(file.absolute()))
             except gams.GamsException:
-                raise FileNotFoundError(f'\nCouldnt add file {files[i]}!\nBeware of æ,ø,å,ö,ü,ä or other non-english letters in the folders of your absolute path: {os.path.abspath(paths[i])}.\nThe GAMS API requires an absolute path with no non-english letters.')
+                raise FileNotFoundError(f'\nCouldnt add file {file.name}!\nBeware of æ,ø,å,ö,ü,ä or other non-english letters in the folders of your absolute path: {os.path.abspath(file.parent)}.\nThe GAMS API requires an absolute path with no non-english letters.')
+            self.symbols[scenario] = symbol_metadata(self.db[scenario])
+        self._resident[scenario] = {}
+        self._mtimes[scenario] = file.stat().st_mtime
+    
+    def _reload_changed_files(self, scenarios: list):
+        """Load gdx files again if they changed since they were loaded, and invalidate cached results from them"""
+        changed = []
+        for SC in scenarios:
+            file = self._file(SC)
+            if file.exists() and file.stat().st_mtime != self._mtimes[SC]:
+                print(f'{file} changed since it was loaded')
+                self._load(SC, file)
+                changed.append(SC)
+        if len(changed) > 0:
+            self.cache.invalidate(changed)
+    
+    def _file(self, scenario: str) -> Path:
+        """Path to the gdx file of a scenario"""
+        return Path(self.paths[self.sc.index(scenario)]) / self.files[self.sc.index(scenario)]
      
     # Getting a certain result
-    def get_result(self, symbol: str, cols: list | None = None) -> pd.DataFrame:
+    def get_result(self, symbol: str, cols: list | None = None,
+                   scenarios: list | None = None,
+                   filters: dict | None = None,
+                   keep: list | None = None,
+                   aggfunc: str = 'sum') -> pd.DataFrame:
         """Get a certain result from the loaded gdx file(s) into a pandas DataFrame
 
         Args:
             symbol (str): The desired result, e.g. PRO_YCRAGF
             cols (str, optional): Specify custom columns. Defaults to pre-defined formats.
+            scenarios (list, optional): Only get the result from these scenarios. Defaults to all.
+            filters (dict, optional): Only get records with these elements, e.g. {'Year' : '2050', 'Region' : ['DK1', 'DK2']}. 
+                Uses the pre-defined column names, even if cols are specified, and 'Scenario'. Records are filtered while reading the gdx file(s). Defaults to None.
+            keep (list, optional): Only keep these columns, e.g. ['Year', 'Region', 'Technology'], and aggregate the values over the other columns while reading. 
+                Uses the pre-defined column names, the Scenario column is always kept. The memory use is only bounded with engine='gams', see utils.symbol_to_df. Defaults to None, which keeps all columns.
+            aggfunc (str, optional): How to aggregate the values if keep is given, choose from 'sum', 'min', 'max', 'mean' or 'count'. Defaults to 'sum'.
 
         Returns:
             pd.DataFrame: The output DataFrame
         """
-        # Placeholder
-        df = pd.DataFrame()
+        scenarios, filters = self._select_scenarios(scenarios, filters)
+        if keep is not None:
+            check_aggfunc(aggfunc)
+            keep = [col for col in keep if col != 'Scenario']
         
-        for SC in self.sc:
-            # Get results from each scenario
-            try :
-                temp = symbol_to_df(self.db[SC], symbol, cols, result_type=self.type)
-                temp['Scenario'] = SC 
-                # Put scenario in first column
-                temp = temp.loc[:, ['Scenario'] + list(temp.columns[:-1])]
-                # Save
-                df = pd.concat((df, temp), ignore_index=True)
+        # Check if it was already extracted
+        self._reload_changed_files(scenarios)
+        key = (symbol, None if cols is None else tuple(cols), tuple(scenarios), self._filters_key(filters),
+               None if keep is None else (tuple(keep), aggfunc))
+        df = self.cache.get(key)
+        if df is not None:
+            return df.copy()
+        
+        # Get results from each scenario and concatenate them once
+        dfs = {SC : temp for SC, temp in self._read_symbols(scenarios, symbol, filters, keep, aggfunc).items() if len(temp.columns) > 0}
+        df = concat_scenarios(dfs)
+        if cols is not None and len(dfs) > 0:
+            try:
+                df.columns = ['Scenario'] + list(cols)
+            except ValueError:
+                print(f'{len(cols)} columns given, but {symbol} has {len(df.columns) - 1} columns')
+                df = pd.DataFrame()
+        if self.cache.put(key, df):
+            # The cached DataFrame must not be modified by the caller
+            return df.copy()
+        
+        return df
+    
+    def compare(self, symbol: str, baseline: str | None = None,
+                by: list | None = None,
+                scenarios: list | None = None,
+                filters: dict | None = None,
+                aggfunc: str = 'sum',
+                fill_value: float | None = 0.0) -> pd.DataFrame:
+        """Compare a result of the scenarios with a baseline scenario, giving absolute and relative differences. 
+        The scenarios are aligned on integer codes of their columns in long format, so it scales to many scenarios
+
+        Args:
+            symbol (str): The desired result, e.g. G_CAP_YCRAF
+            baseline (str, optional): The scenario to compare with. Defaults to the first scenario.
+            by (list, optional): Compare the values aggregated over all other columns, e.g. ['Year', 'Country']. See keep in get_result. Defaults to None, which compares all records.
+            scenarios (list, optional): Only compare these scenarios with the baseline. Defaults to all.
+            filters (dict, optional): Only compare records with these elements, see get_result. Defaults to None.
+            aggfunc (str, optional): How to aggregate the values if by is given. Defaults to 'sum'.
+            fill_value (float, optional): Value of records that are missing in a scenario, as Balmorel does not store zeros. 
+                Missing records are left out if None. Defaults to 0.0.
+
+        Returns:
+            pd.DataFrame: The records of the other scenarios with the Value, Baseline, Delta and Relative columns
+        """
+        if baseline is None:
+            baseline = self.sc[0]
+        scenarios, filters = self._select_scenarios(scenarios, filters)
+        scenarios = list(dict.fromkeys([baseline] + list(scenarios)))
+        
+        df = self.get_result(symbol, scenarios=scenarios, filters=filters, keep=by, aggfunc=aggfunc)
+        if len(df) == 0:
+            return df
+        elif baseline not in df['Scenario'].unique():
+            print(f'{baseline} doesn\'t have any value in the table {symbol}')
+        
+        # Only the main value is compared for variables and equations
+        df = df.drop(columns=[col for col in ['Marginal', 'Lower', 'Upper', 'Scale'] if col in df.columns])
+        df['Scenario'] = df['Scenario'].cat.set_categories(scenarios)
+        
+        return scenario_deltas(df, baseline, fill_value=fill_value)
+    
+    def _select_scenarios(self, scenarios: list | str | None, filters: dict | None) -> tuple[list, dict]:
+        """Check the requested scenarios and apply a Scenario filter to them, returning the scenarios and the remaining filters"""
+        if scenarios is None:
+            scenarios = self.sc
+        elif type(scenarios) is str:
+            scenarios = [scenarios]
+        for SC in scenarios:
+            if SC not in self.sc:
+                raise KeyError(f'{SC} is not a loaded scenario, choose from {", ".join(self.sc)}')
+        
+        filters = dict(filters) if filters is not None else {}
+        if 'Scenario' in filters:
+            selected = filters.pop('Scenario')
+            selected = [selected] if isinstance(selected, str) else list(selected)
+            scenarios = [SC for SC in scenarios if SC in selected]
+        
+        return scenarios, filters
+    
+    def iter_result(self, symbol: str, chunk_rows: int = default_chunk_rows,
+                    scenarios: list | None = None,
+                    filters: dict | None = None):
+        """Iterate through a certain result in chunks of a bounded size, for results that are too large to get at once. 
+        Gdx files are read a chunk at a time, without loading the rest of the file
+
+        Args:
+            symbol (str): The desired result, e.g. PRO_YCRAGFST
+            chunk_rows (int, optional): The maximum amount of rows in each chunk. Defaults to 2**20.
+            scenarios (list, optional): Only get the result from these scenarios. Defaults to all.
+            filters (dict, optional): Only get records with these elements, see get_result. Defaults to None.
+
+        Yields:
+            pd.DataFrame: Chunks of the result, with the same columns as get_result
+        """
+        scenarios, filters = self._select_scenarios(scenarios, filters)
+        
+        self._reload_changed_files(scenarios)
+        scenario_categories = pd.Index(scenarios)
+        for i, SC in enumerate(scenarios):
+            # Read from memory or the disk cache if possible, otherwise from the gdx file
+            df = self._resident[SC].get(symbol)
+            if df is None and self.disk_cache is not None:
+                df = self.disk_cache.get(self._file(SC), symbol, self.type)
             
-            except ValueError :
+            if df is not None:
+                chunks = df_chunks(filter_df(df, filters), chunk_rows)
+            elif symbol not in self.symbols[SC].index:
                 print(f'{SC} doesn\'t have any value in the table {symbol}')
+                continue
+            else:
+                chunks = iter_symbol(self.db[SC], symbol, chunk_rows, result_type=self.type, 
+                                     system_directory=getattr(self, '_gams_system_directory', None), filters=filters)
+            
+            for chunk in chunks:
+                chunk = chunk.copy(deep=False)
+                chunk.insert(0, 'Scenario', pd.Categorical.from_codes(np.full(len(chunk), i), categories=scenario_categories))
+                yield chunk
+    
+    @staticmethod
+    def _filters_key(filters: dict) -> tuple:
+        """Hashable version of filters, used in the cache keys"""
+        key = []
+        for col, values in sorted(filters.items()):
+            if isinstance(values, str) or not hasattr(values, '__iter__'):
+                values = [values]
+            key.append((col, tuple(sorted(str(value) for value in values))))
+        return tuple(key)
+    
+    def _read_symbols(self, scenarios: list, symbol: str, filters: dict | None = None,
+                      keep: list | None = None, aggfunc: str = 'sum') -> dict:
+        """Read a symbol of scenarios with default columns, from memory if lazy, the disk cache or the gdx files.
+        Filtered or aggregated symbols are reduced while reading the gdx files, and are not kept in memory or the disk cache"""
+        dfs = {}
+        to_extract = []
+        for SC in scenarios:
+            df = None
+            if symbol in self._resident[SC]:
+                df = self._resident[SC][symbol]
+            elif self.disk_cache is not None:
+                df = self.disk_cache.get(self._file(SC), symbol, self.type)
             
-        return df  
+            if df is not None:
+                dfs[SC] = filter_df(df, filters)
+                if keep is not None:
+                    dfs[SC] = aggregate_df(dfs[SC], keep, aggfunc)
+            elif self.lazy and symbol not in self.symbols[SC].index:
+                print(f'{SC} doesn\'t have any value in the table {symbol}')
+            else:
+                to_extract.append(SC)
+        
+        # Extract the rest from the gdx files, in parallel processes if more than one worker
+        if len(to_extract) > 0:
+            if self.max_workers > 1:
+                sources = {SC : str(self._file(SC).absolute()) for SC in to_extract}
+            else:
+                sources = {SC : self.db[SC] for SC in to_extract}
+            extracted, self.load_report = symbol_to_dfs(sources, symbol, self.type, self.engine, 
+                                                        getattr(self, '_gams_system_directory', None), self.max_workers,
+                                                        filters, keep, aggfunc)
+            for SC in to_extract:
+                if SC not in extracted:
+                    print(f'{SC} doesn\'t have any value in the table {symbol}')
+                    continue
+                if filters or keep is not None:
+                    # Only part of the symbol was read
+                    dfs[SC] = extracted[SC]
+                    continue
+                if self.disk_cache is not None:
+                    self.disk_cache.put(self._file(SC), symbol, extracted[SC], self.type)
+                if self.lazy:
+                    self._resident[SC][symbol] = extracted[SC]
+                dfs[SC] = extracted[SC]
+        
+        # Keep the order of the scenarios
+        return {SC : dfs[SC] for SC in scenarios if SC in dfs}
+    
+    def available_symbols(self, include_empty: bool = False) -> list:
+        """The symbols that exist in any of the loaded gdx file(s), from the symbol metadata without reading any records
+
+        Args:
+            include_empty (bool, optional): Also list symbols without records. Defaults to False.
+
+        Returns:
+            list: Symbol names
+        """
+        symbols = []
+        for SC in self.sc:
+            metadata = self.symbols[SC]
+            if not include_empty:
+                metadata = metadata[metadata.Records != 0]
+            symbols += [symbol for symbol in metadata.index if symbol not in symbols]
+        return symbols
+    
+    @property
+    def resident_symbols(self) -> dict:
+        """The symbols that have been read into memory, per scenario"""
+        return {SC : list(self._resident[SC].keys()) for SC in self.sc}
+    
+    def memory_usage(self) -> pd.DataFrame:
+        """Memory used by the symbols read into memory
+
+        Returns:
+            pd.DataFrame: Bytes used per scenario and symbol
+        """
+        usage = [(SC, symbol, int(df.memory_usage(deep=True).sum())) 
+                 for SC in self.sc for symbol, df in self._resident[SC].items()]
+        return pd.DataFrame(usage, columns=['Scenario', 'Symbol', 'Bytes'])
+    
+    def release(self, symbol: str | None = None):
+        """Remove a symbol, or all symbols if None given, from memory. It will be read again on next access
+        
+        Args:
+            symbol (str, optional): The symbol to remove. Defaults to None.
+        """
+        for SC in self.sc:
+            if symbol is None:
+                self._resident[SC] = {}
+            else:
+                self._resident[SC].pop(symbol, None)
+    
+    def share(self, symbols: list | str, directory: str | Path | None = None,
+              scenarios: list | None = None) -> SharedStore:
+        """Export symbols of all scenarios to a shared store, that worker processes can read with memory maps
+        instead of reading the gdx files again, e.g. when plotting in a pool of processes:
+        
+        store = res.share(['PRO_YCRAGFST'], 'shared')
+        # In each worker
+        df = store.get('PRO_YCRAGFST', filters={'Year' : '2050'})
+
+        Args:
+            symbols (list, str): The symbols to export
+            directory (str, Path, optional): Folder of the store. Defaults to a 'shared' folder in cache_dir, or a temporary folder if no cache_dir was given.
+            scenarios (list, optional): Only export these scenarios. Defaults to all.
+
+        Returns:
+            SharedStore: The store, which can be passed to worker processes
+        """
+        if type(symbols) is str:
+            symbols = [symbols]
+        if directory is None:
+            directory = self.disk_cache.directory / 'shared' if self.disk_cache is not None else tempfile.mkdtemp(prefix='pybalmorel_')
+        
+        store = SharedStore(directory)
+        for symbol in symbols:
+            df = self.get_result(symbol, scenarios=scenarios)
+            if len(df.columns) > 0:
+                store.put(symbol, df)
+        return store
+    
+    def export(self, symbols: list | str, directory: str | Path,
+               file_format: str = 'parquet',
+               partition_by: list | None = None,
+               compression: str | None = 'zstd',
+               scenarios: list | None = None,
+               max_workers: int | None = None,
+               chunk_rows: int = default_chunk_rows) -> pd.DataFrame:
+        """Export symbols of all scenarios to columnar datasets, one folder per symbol partitioned in folders like 
+        Scenario=SC1/Year=2050, that can be read by e.g. pyarrow, polars, duckdb or spark. The symbols are read from 
+        the gdx files and written a chunk at a time, in parallel processes for several files. Requires pyarrow
+
+        Args:
+            symbols (list, str): The symbols to export
+            directory (str, Path): The folder to export to
+            file_format (str, optional): 'parquet' or 'feather'. Defaults to 'parquet'.
+            partition_by (list, optional): Columns to partition by, the ones a symbol does not have are skipped. Defaults to ['Scenario', 'Year'] if None.
+            compression (str, optional): Compression of the files, e.g. 'zstd', 'snappy', 'lz4' or None. Defaults to 'zstd'.
+            scenarios (list, optional): Only export these scenarios. Defaults to all.
+            max_workers (int, optional): Amount of processes exporting at the same time. Defaults to max_workers of this MainResults.
+            chunk_rows (int, optional): The maximum amount of records read and written at a time. Defaults to 2**20.
+
+        Returns:
+            pd.DataFrame: The records written, time used and errors of each scenario and symbol
+        """
+        if type(symbols) is str:
+            symbols = [symbols]
+        scenarios, _ = self._select_scenarios(scenarios, None)
+        if max_workers is None:
+            max_workers = self.max_workers
+        system_directory = getattr(self, '_gams_system_directory', None)
+        
+        # Only export symbols with records
+        tasks = [(SC, symbol) for SC in scenarios for symbol in symbols 
+                 if symbol in self.symbols[SC].index and self.symbols[SC].loc[symbol, 'Records'] > 0]
+        if max_workers > 1 and len(tasks) > 1:
+            with ProcessPoolExecutor(max_workers=min(max_workers, len(tasks))) as pool:
+                futures = [pool.submit(export_symbol, str(self._file(SC).absolute()), SC, symbol, directory, file_format, 
+                                       partition_by, compression, self.type, system_directory, chunk_rows) 
+                           for SC, symbol in tasks]
+                outputs = [future.result() for future in futures]
+        else:
+            outputs = [export_symbol(self.db[SC], SC, symbol, directory, file_format, partition_by, 
+                                     compression, self.type, system_directory, chunk_rows) 
+                       for SC, symbol in tasks]
+        
+        return pd.DataFrame([(SC, symbol) + output for (SC, symbol), output in zip(tasks, outputs)],
+                            columns=['Scenario', 'Symbol', 'Records', 'Seconds', 'Error'])
     
     ## Plotting tools
     # Interactive bar chart plotting
@@ -315,12 +671,12 @@ class IncFile:
     """A useful class for creating .inc-files for GAMS models
     Args:
     prefix (str): The first part of the .inc file.
-    body (str): The main part of the .inc file.
+    body (str, pd.DataFrame, list): The main part of the .inc file. A DataFrame is written as a GAMS table, and a list of strings and DataFrames is written in order.
     suffix (str): The last part of the .inc file.
     name (str): The name of the .inc file.
     path (str): The path to save the file, defaults to 'Balmorel/base/data'.
     """
-    def __init__(self, prefix: str = '', body: str | pd.DataFrame = '', 
+    def __init__(self, prefix: str = '', body: str | pd.DataFrame | list = '', 
                  suffix: str = '', name: str = 'name', 
                  path: str = 'Balmorel/base/data/'):
         self.prefix = prefix
@@ -341,52 +697,132 @@ class IncFile:
                     values: str = 'Value',
                     aggfunc: str ='sum',
                     fill_value: Union[str, int] = ''):
+        """Pivot a body of records to a table, joining multiple index or column levels with " . ". 
+        Uses utils.pivot_table, which gives the same table as DataFrame.pivot_table"""
     
         # Pivot
         if type(self.body) is not pd.DataFrame:
             raise TypeError(".inc file body needs to be a DataFrame for this to work!")
 
-        self.body = self.body.pivot_table(index=index, columns=columns, 
-                            values=values, aggfunc=aggfunc,
-                            fill_value=fill_value)
-        
-        # Check if there are multiple levels in index and 
-        # concatenate with " . "
-        if hasattr(self.body.index, 'levels'):
-            new_ind = pd.Series(self.body.index.get_level_values(0))
-            for level in range(1, len(self.body.index.levels)):
-                new_ind += ' . ' + self.body.index.get_level_values(level) 
-
-            self.body.index = new_ind
+        self.body = pivot_table(self.body, index=index, columns=columns, 
+                                values=values, aggfunc=aggfunc,
+                                fill_value=fill_value)
         
-        # Check if there are multiple levels in columns and 
+        # Check if there are multiple levels in index and columns and 
         # concatenate with " . "
-        if hasattr(self.body.columns, 'levels'):
-            new_ind = pd.Series(self.body.columns.get_level_values(0))
-            for level in range(1, len(self.body.columns.levels)):
-                new_ind += ' . ' + self.body.columns.get_level_values(level) 
-
-            self.body.columns = new_ind
+        self.body.index = join_levels(self.body.index)
+        self.body.columns = join_levels(self.body.columns)
             
         # Delete names
         self.body.columns.name = ''
         self.body.index.name = ''
 
+    def save(self, precision: int = 10, max_line_length: int = 80000,
+             gdx: bool = False, system_directory: str | None = None) -> bool:
+        """Write the .inc file. DataFrames in the body are written as GAMS tables a chunk of rows at a time, see utils.write_table.
+        The file is written to a temporary file and renamed, and left untouched if the content did not change
+
+        Args:
+            precision (int, optional): Significant digits of the numbers in DataFrames. Defaults to 10.
+            max_line_length (int, optional): Wider tables are split into blocks of columns. Defaults to 80000, the limit of GAMS.
+            gdx (bool, optional): Write the DataFrames to a .gdx file next to the .inc file, with full precision, 
+                and only declare and $LOAD them in the .inc file. Defaults to False.
+            system_directory (str, optional): GAMS system directory, used if gdx is True. Will let GAMS find it if not specified.
 
-    def save(self):
+        Returns:
+            bool: Whether the file was written, False if it was unchanged
+        """
         if self.name[-4:] != '.inc':
             self.name += '.inc'  
+        
+        parts = self.body if type(self.body) is list else [self.body]
+        if gdx and any(type(part) is pd.DataFrame for part in parts):
+            return self._save_gdx(parts, system_directory)
        
-        with open(Path(self.path) / self.name, 'w') as f:
-            f.write(self.prefix)
-            if type(self.body) is str:
-                f.write(self.body)
-            elif type(self.body) is pd.DataFrame:
-                f.write(self.body.to_string())
-            else:
-                print('Wrong format of %s.body!'%self.name)
-                print('No body written')
-            f.write(self.suffix)
+        def write(tmp: Path):
+            with open(tmp, 'w', buffering=2**20) as f:
+                f.write(self.prefix)
+                for part in parts:
+                    if type(part) is str:
+                        f.write(part)
+                    elif type(part) is pd.DataFrame:
+                        write_table(f, part, precision=precision, max_line_length=max_line_length)
+                    else:
+                        print('Wrong format of %s.body!'%self.name)
+                        print('No body written')
+                f.write(self.suffix)
+        
+        return write_if_changed(Path(self.path) / self.name, write)
+
+    @staticmethod
+    def save_many(incfiles: list | dict, max_workers: int = 8, **kwargs) -> dict:
+        """Write many .inc files at the same time, see IncFile.save. Files with unchanged content keep their modification time
+
+        Args:
+            incfiles (list | dict): The IncFiles to write, or a dictionary with them as values
+            max_workers (int, optional): Amount of files written at the same time. Defaults to 8.
+            **kwargs: Passed to IncFile.save, e.g. precision or gdx
+
+        Returns:
+            dict: Whether each file was written, with the file paths as keys
+        """
+        if type(incfiles) is dict:
+            incfiles = list(incfiles.values())
+        
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(incfile.save, **kwargs) for incfile in incfiles]
+            results = [future.result() for future in futures]
+        
+        # The names are read after saving, which adds the .inc extension
+        written = {str(Path(incfile.path) / incfile.name) : result for incfile, result in zip(incfiles, results)}
+
+        print('Wrote %d of %d .inc files, %d were unchanged'%(sum(written.values()), len(written), len(written) - sum(written.values())))
+        return written
+
+    def _save_gdx(self, parts: list, system_directory: str | None = None) -> bool:
+        """Write the DataFrames of the body to a .gdx file, and an .inc file that declares the symbols and loads them from it"""
+        import gams.transfer as gt
+        
+        container = gt.Container(system_directory=system_directory)
+        stub = ''
+        text = self.prefix
+        for part in parts:
+            if type(part) is str:
+                text += part
+                continue
+            
+            # The DataFrame holds the data of the last declared symbol
+            declaration = find_declaration(text)
+            if declaration is None:
+                raise ValueError('Could not find the TABLE or PARAMETER declaration of a DataFrame in the body of %s'%self.name)
+            start, _, symbol, domains, explanatory_text = declaration
+            records = table_to_records(part, domains)
+            if len(domains) != len(records.columns) - 1:
+                raise ValueError('The labels of the DataFrame for %s in %s have %d elements, but %s has %d domains'%(
+                    symbol, self.name, len(records.columns) - 1, symbol, len(domains)))
+            gt.Parameter(container, symbol, domain=domains, records=records, description=explanatory_text.strip('\'"'))
+            
+            # Keep what came before the declaration, except the ; ending the previous table
+            stub += re.sub(r'^\s*;', '', text[:start]) 
+            stub += "PARAMETER %s%s %s;\n"%(symbol, '(%s)'%', '.join(domains) if len(domains) > 0 else '', explanatory_text)
+            text = ''
+        
+        gdx_file = Path(self.path) / self.name.replace('.inc', '.gdx')
+        gdx_written = write_if_changed(gdx_file, lambda tmp: container.write(str(tmp.absolute())))
+        
+        def write(tmp: Path):
+            with open(tmp, 'w') as f:
+                f.write(stub)
+                # The .gdx file is found next to this .inc file, wherever the Balmorel folder is moved
+                f.write('$setNames "%system.incName%" gdx_folder . .\n')
+                f.write('$GDXIN "%%gdx_folder%%%s"\n'%gdx_file.name)
+                f.write("$LOAD %s\n"%' '.join(container.listSymbols()))
+                f.write("$GDXIN\n")
+                # The rest, e.g. assignments using the loaded symbols
+                f.write(re.sub(r'^\s*;', '', text + self.suffix))
+        
+        inc_written = write_if_changed(Path(self.path) / self.name, write)
+        return gdx_written or inc_written
  
 class Balmorel:
     """A class that recognises the Balmorel folder structure, can be used to run scenarios or results
@@ -402,21 +838,24 @@ class Balmorel:
         
         # Get full path
         self.path = Path(model_folder)
-        directories = [file.name for file in self.path.iterdir() if file.is_dir()]
         
-        if 'base' not in directories:
-            raise Exception(f"Incorrect Balmorel folder, couldn't find base in {self.path}")
+        # Index of the folders, only listing folders again that changed since the last time
+        self.index = ScenarioIndex(self.path)
         
-        # Get scenario folders
-        scenarios = [SC for SC in self.path.iterdir() if SC.is_dir() and SC.name != 'simex' and SC.name[0] != '.']
+        if 'base' not in self.index.directories:
+            raise Exception(f"Incorrect Balmorel folder, couldn't find base in {self.path}")
         
         # Check validity of scenario folders and make list of scenarios
         self.scenarios = []
         self.input_data = {}
-        for SC in scenarios:
-            if (SC / 'model/Balmorel.gms').exists() and ((SC / 'model/cplex.op4').exists() or (SC / 'model/cplex.op2').exists()):
-                self.scenarios.append(SC.name)
+        self.input_changes = {}
+        self.inputs = InputStore()
+        self._parsed_incfiles = {}
+        for SC in self.index.scenario_folders:
+            if self.index.has_model(SC):
+                self.scenarios.append(SC)
             else:
+                SC = self.path / SC
                 print(f'Folder {SC} not added to scenario as the necessary {SC}/model/Balmorel.gms and/or {SC}/model/cplex.op4 or {SC}/model/cplex.op2 did not exist')
 
     def locate_results(self, suffix_naming_only: bool = False):
@@ -431,82 +870,190 @@ class Balmorel:
         self.scenario_names = []
         self.scfolder_to_scname = {}
         self.scname_to_scfolder = {}
+        self.index.refresh()
         for SC in self.scenarios:
             path = self.path / f'{SC}/model'
-            mainresults_files = pd.Series([file.name for file in path.iterdir()])
-            mainresults_files = mainresults_files[(mainresults_files.str.find('MainResults') != -1) & (mainresults_files.str.find('.gdx') != -1)]
-            self.files += list(mainresults_files)
+            mainresults_files = self.index.results(SC)
+            self.files += mainresults_files
             self.paths += [path]*len(mainresults_files)
             if len(mainresults_files) == 1 and not suffix_naming_only:
                 self.scenario_names += [SC]
                 self.scfolder_to_scname[SC] = [SC]
                 self.scname_to_scfolder[SC] = SC
             else:
-                mainresults_files = (
-                    mainresults_files
-                    .str.replace('MainResults_', '')
-                    .str.replace('.gdx', '')
-                )
-                self.scenario_names += list(mainresults_files)
-                self.scfolder_to_scname[SC] = list(mainresults_files)
+                mainresults_files = [file.replace('MainResults_', '').replace('.gdx', '') for file in mainresults_files]
+                self.scenario_names += mainresults_files
+                self.scfolder_to_scname[SC] = mainresults_files
                 
                 for scenario_name in mainresults_files:
                     self.scname_to_scfolder[scenario_name] = SC 
 
-    def collect_results(self, suffix_naming_only: bool = False):
+    def collect_results(self, suffix_naming_only: bool = False, **kwargs):
         """
         Collects results
+
+        suffix_naming_only (bool): Defaults to False, will only name scenarios after its suffix'es if True
+        **kwargs: Passed to MainResults, e.g. lazy = True and max_workers = 8 to extract symbols from many scenarios in parallel
         """
 
         self.locate_results(suffix_naming_only=suffix_naming_only)
 
-        self.results = MainResults(files=self.files, paths=self.paths, scenario_names=self.scenario_names, system_directory=self._gams_system_directory)
+        self.results = MainResults(files=self.files, paths=self.paths, scenario_names=self.scenario_names, system_directory=self._gams_system_directory, **kwargs)
             
     def run(self, scenario: str, cmd_line_options: dict = {}):
         
+        report, error = self._run_job(scenario, cmd_line_options)
+        if report['Status'] == 'Failed':
+            raise error
+        elif report['Status'] == 'Execution error':
+            print('Execution error! Check output, division by zero in OUTPUT_SUMMARY can happen and may not be a problem')
+        
+        # Check feasibility
+        if report['Feasible'] is None:
+            raise FileNotFoundError(f'Couldnt find the listing file {scenario}.lst')
+        elif not report['Feasible']:
+            raise Exception('Model run infeasible!')
+        
+        # Raise error from before
+        if error is not None:
+            raise error
+        
+        return report['Report']
+    
+    def run_many(self, scenarios: list | None = None, 
+                 cmd_line_options: dict = {},
+                 max_parallel: int | None = None,
+                 threads_per_job: int = 1) -> pd.DataFrame:
+        """Runs several scenarios at the same time, each in its own model folder. A failing or infeasible
+        scenario does not stop the others
+
+        Args:
+            scenarios (list, optional): The scenarios to run. Defaults to all scenarios.
+            cmd_line_options (dict, optional): Command line options (defines) for all scenarios. Defaults to {}.
+            max_parallel (int, optional): The maximum amount of scenarios running at the same time. Defaults to the amount of CPU cores divided by threads_per_job.
+            threads_per_job (int, optional): Threads each GAMS job may use, e.g. for the solver. Defaults to 1.
+
+        Returns:
+            pd.DataFrame: Status, wall time in seconds, feasibility, objective value, error message and RunReport of each scenario
+        """
+        if scenarios is None:
+            scenarios = self.scenarios
+        elif type(scenarios) is str:
+            scenarios = [scenarios]
+        for scenario in scenarios:
+            if scenario not in self.scenarios:
+                raise KeyError('%s scenario wasnt found.\nRun this Balmorel(...) class again if you just created the %s scenario.'%(scenario, scenario))
+        if max_parallel is None:
+            max_parallel = max(1, (os.cpu_count() or 1) // threads_per_job)
+        
+        # The GAMS jobs run as separate processes, so threads are enough to wait for them
+        reports = {}
+        with ThreadPoolExecutor(max_workers=max(1, min(max_parallel, len(scenarios)))) as pool:
+            futures = {pool.submit(self._run_job, scenario, cmd_line_options, threads_per_job) : scenario 
+                       for scenario in scenarios}
+            for future in as_completed(futures):
+                try:
+                    report, error = future.result()
+                except Exception as e:
+                    report = {'Scenario' : futures[future], 'Status' : 'Failed', 'Seconds' : 0.0, 'Feasible' : None, 
+                              'Objective' : None, 'Error' : str(e), 'Report' : None}
+                reports[futures[future]] = report
+                print('%s: %s after %0.0f seconds'%(futures[future], report['Status'], report['Seconds']))
+        
+        return pd.DataFrame([reports[scenario] for scenario in scenarios], 
+                            columns=['Scenario', 'Status', 'Seconds', 'Feasible', 'Objective', 'Error', 'Report'])
+    
+    def run_async(self, scenario: str, cmd_line_options: dict = {}, 
+                  threads: int | None = None) -> 'RunHandle':
+        """Starts a scenario in the background and returns immediately
+
+        Args:
+            scenario (str): The scenario to run
+            cmd_line_options (dict, optional): Command line options (defines). Defaults to {}.
+            threads (int, optional): Threads the GAMS job may use. Defaults to the GAMS default.
+
+        Returns:
+            RunHandle: Can be used to follow, wait for or cancel the run, and can be awaited in asyncio
+        """
+        if scenario not in self.scenarios:
+            raise KeyError('%s scenario wasnt found.\nRun this Balmorel(...) class again if you just created the %s scenario.'%(scenario, scenario))
+        
+        handle = RunHandle(scenario)
+        executor = ThreadPoolExecutor(max_workers=1)
+        handle._future = executor.submit(handle._run, self, cmd_line_options, threads)
+        executor.shutdown(wait=False)
+        return handle
+    
+    def _run_job(self, scenario: str, cmd_line_options: dict = {}, threads: int | None = None,
+                 handle: 'RunHandle | None' = None) -> tuple[dict, Exception | None]:
+        """Runs Balmorel in the model folder of a scenario without raising errors. 
+        The GAMS log is written to the handle, if given
+
+        Returns:
+            tuple[dict, Exception | None]: A report of the run and the error it raised, if any
+        """
+        start = time.perf_counter()
+        
         # Working directory
         wk_dir = os.path.join(self.path, '%s/model'%scenario)
         
-        # Add options
-        ws = gams.GamsWorkspace(working_directory=wk_dir, system_directory=self._gams_system_directory)
-        opt = ws.add_options()
-        for key in cmd_line_options.keys():
-            opt.defines[key] = cmd_line_options[key]
-        
-        # Run Balmorel
+        error = None
         try:
+            # Add options
+            ws = gams.GamsWorkspace(working_directory=wk_dir, system_directory=self._gams_system_directory)
+            opt = ws.add_options()
+            for key in cmd_line_options.keys():
+                opt.defines[key] = cmd_line_options[key]
+            if threads is not None:
+                opt.threads = threads
+            
+            # Run Balmorel
             job = ws.add_job_from_file(os.path.join(wk_dir, 'Balmorel'), job_name=scenario)
-            job.run(opt)
+            if handle is None:
+                job.run(opt)
+            elif handle._start(job):
+                job.run(opt, output=handle)
+            status = 'Finished'
         except gams.GamsExceptionExecution as e:
-            exec_error = e
-            print('Execution error! Check output, division by zero in OUTPUT_SUMMARY can happen and may not be a problem')
+            error = e
+            status = 'Execution error'
+        except Exception as e:
+            error = e
+            status = 'Failed'
         
-        # Check feasibility
-        with open(os.path.join(wk_dir, '%s.lst'%scenario), 'r') as f:
-            output = pd.Series(f.readlines())
-
-        output = output[(output.str.find('LP status') != -1) | (output.str.find('MIP status') != -1)] # Find all status
-        all_feasible = output[output.str.find('infeasible') != -1].empty # Check if none are infeasible
-        if not(all_feasible):
-            raise Exception('Model run infeasible!')
+        # A run cancelled before or while running, which GAMS may report as an execution error
+        if handle is not None and handle.cancelled:
+            status = 'Cancelled'
         
-        # Raise error from before
-        if 'exec_error' in locals():
-            raise exec_error
+        # Check feasibility, reading the listing one line at a time
+        listing = os.path.join(wk_dir, '%s.lst'%scenario)
+        run_report = None
+        feasible = None
+        if os.path.exists(listing) and status != 'Cancelled':
+            run_report = parse_listing(listing)
+            feasible = run_report.feasible
+            if not feasible and status == 'Finished':
+                status = 'Infeasible'
         
+        report = {'Scenario' : scenario, 'Status' : status, 'Seconds' : time.perf_counter() - start,
+                  'Feasible' : feasible, 'Objective' : None if run_report is None else run_report.objective,
+                  'Error' : None if error is None else str(error), 'Report' : run_report}
+        return report, error
         
     def load_incfiles(self, 
                       scenario: str = 'base', 
                       use_provided_read_files: bool = True,
                       read_file: str = 'Balmorel_ReadData',
                       overwrite: bool = False):
-        """Will load .inc files from the specific scenario
+        """Will load .inc files from the specific scenario. The %scenario%_input_data.gdx file from a previous 
+        .load_incfiles execution is reused, unless the content of an .inc file in base/data or %scenario%/data 
+        or the read files changed since it was made
 
         Args:
             scenario (str, optional): The scenario that you . Defaults to 'base'.
             use_provided_read_files (bool, optional): Use provided Balmorel_ReadData.gms and Balmorelbb4_ReadData.inc. Defaults to True.
             read_file (str, optional): The name of the read file to be executed. Defaults to Balmorel_ReadData
-            overwrite (bool, optional): Will overwrite an existing %scenario%_input_data.gdx file from a previous .load_incfiles execution 
+            overwrite (bool, optional): Will overwrite an existing %scenario%_input_data.gdx file from a previous .load_incfiles execution, even if no files changed
             
         Raises:
             KeyError: _description_
@@ -515,83 +1062,356 @@ class Balmorel:
         if scenario not in self.scenarios:
             raise KeyError('%s scenario wasnt found.\nRun this Balmorel(...) class again if you just created the %s scenario.'%(scenario, scenario))
         
-        
-        # Path to the GAMS system directory
-        model_folder = self.path / scenario / 'model'
-
         # Path to input .gdx file of scenario
-        input_gdx = model_folder / ('%s_input_data.gdx'%scenario)
+        input_gdx = self.path / scenario / 'model' / ('%s_input_data.gdx'%scenario)
         
-        if input_gdx.exists() and not(overwrite):
+        job = self._prepare_input_gdx(scenario, use_provided_read_files, read_file, overwrite)
+        if job is None:
             ws = gams.GamsWorkspace(system_directory=self._gams_system_directory)
-            db = ws.add_database_from_gdx(str((model_folder / ('%s_input_data.gdx'%scenario)).absolute()))
+            db = ws.add_database_from_gdx(str(input_gdx.absolute()))
             self.input_data[scenario] = db
             print(
                 '-'*20,
-                '\nLoaded existing input data - pass "overwrite = True" if you changed data since last incfile loading\n',
+                '\nLoaded existing input data - no .inc files changed since it was made\n',
                 'Loaded .gdx file:\n', 
                 input_gdx,
                 '\n',
                 '-'*20,
             )
-            
         else:
-            # Are you using the provided 'ReadData'-Balmorel files or a custom one?
-            use_provided_read_files = True
-            if use_provided_read_files:
-                pkgdir = sys.modules['pybalmorel'].__path__[0]
-                print('-'*150, '\npkgdir\n', pkgdir, '\n', '-'*150)
-                # Copy Balmorel_ReadData and Balmorelbb4_ReadData 
-                # into the model folder if there isn't one already
-                for file in ['Balmorel_ReadData.gms', 'Balmorelbb4_ReadData.inc']:
-                    if not (model_folder / file).exists():
-                        shutil.copyfile(Path(pkgdir) / file, model_folder / file)
-                        print(Path(model_folder) / file)
-
-            # Initialize GAMS Workspace
-            ws = gams.GamsWorkspace(working_directory=model_folder, 
-                                    system_directory=self._gams_system_directory)
-
-            # Set options
-            opt = ws.add_options()
-            opt.gdx = '%s_input_data.gdx'%scenario # Setting the output gdx name (note, could be overwritten by the cmd line options, which is intended)        
-            
-            # Load the GAMS model
-            model_db = ws.add_job_from_file(str((model_folder / read_file).absolute()), job_name=scenario)
+            # Store the database (will take some minutes)
+            self.input_data[scenario] = job.get_out_db()
 
-            # Run the GAMS file
-            model_db.run(opt)
+    def _prepare_input_gdx(self, scenario: str, 
+                           use_provided_read_files: bool = True,
+                           read_file: str = 'Balmorel_ReadData',
+                           overwrite: bool = False) -> gams.GamsJob | None:
+        """Creates the %scenario%_input_data.gdx file, if it does not exist, any of its input files changed or overwrite is True
 
-            # Store the database (will take some minutes)
-            self.input_data[scenario] = model_db.get_out_db()
+        Returns:
+            gams.GamsJob | None: The job that created the .gdx file, or None if the existing file is up to date
+        """
+        
+        # Path to the GAMS system directory
+        model_folder = self.path / scenario / 'model'
+
+        # Path to input .gdx file of scenario
+        input_gdx = model_folder / ('%s_input_data.gdx'%scenario)
+        
+        # Are you using the provided 'ReadData'-Balmorel files or a custom one?
+        use_provided_read_files = True
+        if use_provided_read_files:
+            pkgdir = sys.modules['pybalmorel'].__path__[0]
+            # Copy Balmorel_ReadData and Balmorelbb4_ReadData 
+            # into the model folder if there isn't one already
+            for file in ['Balmorel_ReadData.gms', 'Balmorelbb4_ReadData.inc']:
+                if not (model_folder / file).exists():
+                    shutil.copyfile(Path(pkgdir) / file, model_folder / file)
+                    print(Path(model_folder) / file)
+        
+        # Check if any input changed since the .gdx file was made
+        manifest_file = model_folder / ('%s_input_data_manifest.json'%scenario)
+        previous_manifest = read_json(manifest_file)
+        manifest = build_manifest(self._input_files(scenario, read_file), previous_manifest)
+        if not input_gdx.exists():
+            changes = None
+        elif manifest_file.exists():
+            changes = compare_manifests(previous_manifest, manifest)
+        else:
+            # Made before manifests were stored, compare with the modification time of the .gdx file instead
+            changes = {'added' : [], 'removed' : [], 
+                       'changed' : sorted(file for file, entry in manifest.items() if entry['mtime'] > input_gdx.stat().st_mtime)}
+        self.input_changes[scenario] = changes
+        changed = changes is None or any(len(files) > 0 for files in changes.values())
+        
+        if not(overwrite) and not(changed):
+            if not manifest_file.exists() or manifest != previous_manifest:
+                write_atomically(manifest_file, lambda tmp: tmp.write_text(json.dumps(manifest, indent=1)))
+            return None
+        
+        if changes is not None and changed:
+            print('-'*20, '\n%s input data will be created again, since these files changed:'%scenario)
+            for change, files in changes.items():
+                for file in files:
+                    print('%s: %s'%(change.capitalize(), file))
+            print('-'*20)
+        
+        # Initialize GAMS Workspace
+        ws = gams.GamsWorkspace(working_directory=model_folder, 
+                                system_directory=self._gams_system_directory)
 
-    def get_input(self, symbol: str, cols: list | None = None) -> pd.DataFrame:
+        # Set options
+        opt = ws.add_options()
+        opt.gdx = '%s_input_data.gdx'%scenario # Setting the output gdx name (note, could be overwritten by the cmd line options, which is intended)        
+        
+        # Load the GAMS model
+        model_db = ws.add_job_from_file(str((model_folder / read_file).absolute()), job_name=scenario)
+
+        # Run the GAMS file
+        model_db.run(opt)
+        
+        # Remember the input the .gdx file was made from
+        write_atomically(manifest_file, lambda tmp: tmp.write_text(json.dumps(manifest, indent=1)))
+        
+        return model_db
+
+    def load_many_incfiles(self, scenarios: list | None = None,
+                           use_provided_read_files: bool = True,
+                           read_file: str = 'Balmorel_ReadData',
+                           overwrite: bool = False,
+                           max_parallel: int | None = None,
+                           engine: str | None = None) -> pd.DataFrame:
+        """Loads the .inc files of several scenarios, creating their %scenario%_input_data.gdx files at the same time. 
+        The symbols are stored as dataframes in .inputs instead of GamsDatabases in .input_data, and symbols with 
+        the same content as in base, or another loaded scenario, are only stored once. get_input reads from both
+
+        Args:
+            scenarios (list, optional): The scenarios to load. Defaults to all scenarios.
+            use_provided_read_files (bool, optional): Use provided Balmorel_ReadData.gms and Balmorelbb4_ReadData.inc. Defaults to True.
+            read_file (str, optional): The name of the read file to be executed. Defaults to Balmorel_ReadData
+            overwrite (bool, optional): Create the .gdx files again, even if no files changed. Defaults to False.
+            max_parallel (int, optional): The maximum amount of GAMS jobs and readers at the same time. Defaults to the amount of CPU cores.
+            engine (str, optional): 'transfer' or 'gams', see symbol_to_df. Defaults to 'transfer' if available.
+
+        Returns:
+            pd.DataFrame: Status, wall time in seconds, amount of symbols, symbols shared with base and error message of each scenario
+        """
+        if scenarios is None:
+            scenarios = self.scenarios
+        elif type(scenarios) is str:
+            scenarios = [scenarios]
+        for scenario in scenarios:
+            if scenario not in self.scenarios:
+                raise KeyError('%s scenario wasnt found.\nRun this Balmorel(...) class again if you just created the %s scenario.'%(scenario, scenario))
+        if max_parallel is None:
+            max_parallel = os.cpu_count() or 1
+        
+        # Base is loaded too, as the other scenarios are compared with it
+        to_load = list(dict.fromkeys((['base'] if 'base' in self.scenarios else []) + list(scenarios)))
+        reports = {scenario : {'Scenario' : scenario, 'Status' : None, 'Seconds' : 0.0, 
+                               'Symbols' : None, 'Shared' : None, 'Error' : None} for scenario in to_load}
+        
+        # The GAMS jobs run as separate processes, so threads are enough to wait for them
+        def prepare(scenario: str):
+            start = time.perf_counter()
+            try:
+                job = self._prepare_input_gdx(scenario, use_provided_read_files, read_file, overwrite)
+                reports[scenario]['Status'] = 'Loaded existing' if job is None else 'Created'
+            except Exception as e:
+                reports[scenario]['Status'] = 'Failed'
+                reports[scenario]['Error'] = str(e)
+            reports[scenario]['Seconds'] += time.perf_counter() - start
+        
+        with ThreadPoolExecutor(max_workers=max(1, min(max_parallel, len(to_load)))) as pool:
+            list(pool.map(prepare, to_load))
+        
+        # Read the symbols in parallel processes, base first so the others only send symbols that differ from it 
+        loaded = [scenario for scenario in to_load if reports[scenario]['Status'] != 'Failed']
+        files = {scenario : str(self.path / scenario / 'model' / ('%s_input_data.gdx'%scenario)) for scenario in loaded}
+        batches = [[scenario] for scenario in loaded[:1]] + [loaded[1:]]
+        for batch in [batch for batch in batches if len(batch) > 0]:
+            # Only symbols of scenarios outside the batch are certain to stay stored while it is read
+            known_hashes = set().union(*[self.inputs.hashes(scenario) for scenario in self.inputs.scenarios if scenario not in batch])
+            with ProcessPoolExecutor(max_workers=max(1, min(max_parallel, len(batch)))) as pool:
+                futures = {pool.submit(gdx_to_dfs, files[scenario], known_hashes, engine, self._gams_system_directory) : (scenario, time.perf_counter()) 
+                           for scenario in batch}
+                for future in as_completed(futures):
+                    scenario, start = futures[future]
+                    try:
+                        dfs = future.result()
+                    except Exception as e:
+                        reports[scenario]['Status'] = 'Failed'
+                        reports[scenario]['Error'] = str(e)
+                        continue
+                    self.inputs.put(scenario, dfs)
+                    reports[scenario]['Seconds'] += time.perf_counter() - start
+                    reports[scenario]['Symbols'] = len(dfs)
+                    if 'base' in self.inputs:
+                        reports[scenario]['Shared'] = len(self.inputs.shared(scenario, 'base'))
+                    print('%s: %s, %d symbols'%(scenario, reports[scenario]['Status'], len(dfs)))
+        
+        return pd.DataFrame([reports[scenario] for scenario in to_load], 
+                            columns=['Scenario', 'Status', 'Seconds', 'Symbols', 'Shared', 'Error'])
+
+    def parse_incfiles(self, scenarios: list | None = None,
+                       max_parallel: int | None = None) -> pd.DataFrame:
+        """Reads the .inc files of several scenarios without GAMS, see utils.parse_incfile. A .inc file in %scenario%/data 
+        replaces the one with the same name in base/data, as in Balmorel. The files are parsed in parallel processes, 
+        only once if they did not change, and the symbols are stored in .inputs like load_many_incfiles does. 
+        Symbols that are only calculated by Balmorel, or defined through $include's, are not found
+
+        Args:
+            scenarios (list, optional): The scenarios to parse. Defaults to all scenarios.
+            max_parallel (int, optional): The maximum amount of processes parsing files. Defaults to the amount of CPU cores.
+
+        Returns:
+            pd.DataFrame: Status, wall time in seconds, amount of symbols, symbols shared with base and error message of each scenario
+        """
+        if scenarios is None:
+            scenarios = self.scenarios
+        elif type(scenarios) is str:
+            scenarios = [scenarios]
+        for scenario in scenarios:
+            if scenario not in self.scenarios:
+                raise KeyError('%s scenario wasnt found.\nRun this Balmorel(...) class again if you just created the %s scenario.'%(scenario, scenario))
+        
+        # Base is parsed too, as the other scenarios are compared with it
+        to_parse = list(dict.fromkeys((['base'] if 'base' in self.scenarios else []) + list(scenarios)))
+        files = {}
+        for scenario in to_parse:
+            scenario_files = {}
+            for data_folder in dict.fromkeys([self.path / 'base' / 'data', self.path / scenario / 'data']):
+                if data_folder.exists():
+                    scenario_files.update({file.name : file for file in data_folder.iterdir() if file.suffix.lower() == '.inc' and file.is_file()})
+            files[scenario] = [scenario_files[name] for name in sorted(scenario_files)]
+        
+        # Each file is parsed once, also if several scenarios use it, and again only if it changed
+        for key in [key for key in self._parsed_incfiles if not Path(key[0]).exists()]:
+            del self._parsed_incfiles[key]
+        start = time.perf_counter()
+        failed = {}
+        parsed = parse_incfiles(list(dict.fromkeys(file for scenario in to_parse for file in files[scenario])), 
+                                max_workers=max_parallel, cache=self._parsed_incfiles, errors=failed)
+        seconds = time.perf_counter() - start
+        
+        reports = []
+        for scenario in to_parse:
+            dfs = {}
+            errors = []
+            for file in files[scenario]:
+                if file.absolute() in failed:
+                    errors.append('%s: %s'%(file.name, failed[file.absolute()]))
+                else:
+                    dfs.update(parsed[file.absolute()])
+            self.inputs.put(scenario, {symbol : (symbol_hash(df), df) for symbol, df in dfs.items()})
+            reports.append({'Scenario' : scenario, 'Status' : 'Parsed' if len(errors) == 0 else 'Parsed with errors', 
+                            'Seconds' : seconds, 'Symbols' : len(dfs), 
+                            'Shared' : len(self.inputs.shared(scenario, 'base')) if 'base' in self.inputs else None,
+                            'Error' : '\n'.join(errors) if len(errors) > 0 else None})
+            print('%s: %s, %d symbols'%(scenario, reports[-1]['Status'], len(dfs)))
+        
+        return pd.DataFrame(reports, columns=['Scenario', 'Status', 'Seconds', 'Symbols', 'Shared', 'Error'])
+
+    def diff_inputs(self, sc_a: str = 'base', sc_b: str | None = None,
+                    symbols: list | None = None,
+                    max_parallel: int | None = None,
+                    parse: bool = False) -> tuple[pd.DataFrame, dict]:
+        """Compares the input symbols of two scenarios. The content hashes of the symbols are compared first, 
+        and records are only compared for the symbols that differ. Scenarios that were not loaded 
+        with load_many_incfiles are loaded with it first
+
+        Args:
+            sc_a (str, optional): The first scenario. Defaults to 'base'.
+            sc_b (str): The second scenario
+            symbols (list, optional): Only compare these symbols. Defaults to all symbols.
+            max_parallel (int, optional): Passed to load_many_incfiles. Defaults to the amount of CPU cores.
+            parse (bool, optional): Read scenarios that were not loaded with parse_incfiles instead, without GAMS. Defaults to False.
+
+        Returns:
+            tuple[pd.DataFrame, dict]: A summary with the status and amount of records, added, removed and changed records 
+            of each symbol, and the records that differ of each changed symbol, see utils.diff_frames
+        """
+        if sc_b is None:
+            raise ValueError('Provide the scenario to compare %s with'%sc_a)
+        missing = [SC for SC in dict.fromkeys([sc_a, sc_b]) if SC not in self.inputs]
+        if len(missing) > 0 and parse:
+            self.parse_incfiles(missing, max_parallel=max_parallel)
+        elif len(missing) > 0:
+            self.load_many_incfiles(missing, max_parallel=max_parallel)
+        
+        if symbols is None:
+            symbols = list(dict.fromkeys(self.inputs.symbols(sc_a) + self.inputs.symbols(sc_b)))
+        
+        summary = []
+        deltas = {}
+        for symbol in symbols:
+            hash_a = self.inputs.hash(sc_a, symbol)
+            hash_b = self.inputs.hash(sc_b, symbol)
+            records_a = 0 if hash_a is None else len(self.inputs.get(sc_a, symbol))
+            records_b = 0 if hash_b is None else len(self.inputs.get(sc_b, symbol))
+            if hash_a == hash_b:
+                status = 'same'
+                counts = {'added' : 0, 'removed' : 0, 'changed' : 0}
+            elif hash_a is None or hash_b is None:
+                status = 'only in %s'%(sc_a if hash_b is None else sc_b)
+                counts = {'added' : records_b, 'removed' : records_a, 'changed' : 0}
+            else:
+                status = 'changed'
+                deltas[symbol] = diff_frames(self.inputs.get(sc_a, symbol), self.inputs.get(sc_b, symbol), (sc_a, sc_b))
+                counts = deltas[symbol]['Change'].value_counts()
+            summary.append((symbol, status, records_a, records_b, 
+                            int(counts.get('added', 0)), int(counts.get('removed', 0)), int(counts.get('changed', 0))))
+        
+        summary = pd.DataFrame(summary, columns=['Symbol', 'Status', 'Records %s'%sc_a, 'Records %s'%sc_b, 
+                                                 'Added', 'Removed', 'Changed'])
+        return summary, deltas
+
+    def _input_files(self, scenario: str, read_file: str = 'Balmorel_ReadData') -> list:
+        """The .inc files in base/data and %scenario%/data and the read files, that the input data of a scenario is made from"""
+        files = []
+        for data_folder in dict.fromkeys([self.path / 'base' / 'data', self.path / scenario / 'data']):
+            if data_folder.exists():
+                files += sorted(file for file in data_folder.iterdir() if file.suffix.lower() == '.inc' and file.is_file())
+        model_folder = self.path / scenario / 'model'
+        for file in [read_file if read_file.endswith('.gms') else read_file + '.gms', 'Balmorelbb4_ReadData.inc']:
+            if (model_folder / file).exists():
+                files.append(model_folder / file)
+        return files
+
+    def input_metadata(self, scenario: str) -> pd.DataFrame:
+        """Lists the input symbols of a scenario with their type, domains, amount of records and explanatory text, 
+        from the %scenario%_input_data.gdx file created by load_incfiles, without reading any records
+
+        Args:
+            scenario (str): The scenario
+
+        Returns:
+            pd.DataFrame: Symbol metadata, indexed by symbol name
+        """
+        input_gdx = self.path / scenario / 'model' / ('%s_input_data.gdx'%scenario)
+        if input_gdx.exists():
+            return symbol_metadata(input_gdx, self._gams_system_directory)
+        elif scenario in self.input_data:
+            return symbol_metadata(self.input_data[scenario])
+        else:
+            raise FileNotFoundError(f"Input data not loaded for {scenario}! Run 'Balmorel.load_incfiles({scenario})' before this command")
+
+    def get_input(self, symbol: str, cols: list | None = None,
+                  filters: dict | None = None) -> pd.DataFrame:
         """Get a certain input from the loaded input file(s) into a pandas DataFrame
 
         Args:
             symbol (str): The desired input, e.g. DE_VAR_T
             cols (str, optional): Specify custom columns. Defaults to pre-defined formats or domain names.
+            filters (dict, optional): Only get records with these elements, e.g. {'Region' : 'DK1'}, using the output column names. 
+                Records are filtered while reading. Defaults to None.
 
         Returns:
             pd.DataFrame: The output DataFrame
         """
-        # Placeholder
-        df = pd.DataFrame()
-        
+        # Get inputs from each scenario
+        dfs = {}
         for SC in self.input_data.keys():
-            # Get results from each scenario
             try :
-                temp = symbol_to_df(self.input_data[SC], symbol, cols)
-                temp['Scenario'] = SC 
-                # Put scenario in first column
-                temp = temp.loc[:, ['Scenario'] + list(temp.columns[:-1])]
-                # Save
-                df = pd.concat((df, temp), ignore_index=True)
+                dfs[SC] = symbol_to_df(self.input_data[SC], symbol, cols, filters=filters)
             
             except ValueError :
                 print(f'{SC} doesn\'t have any value in the table {symbol}')
-            
-        return df  
+        
+        # and from the scenarios loaded with load_many_incfiles
+        for SC in self.inputs.scenarios:
+            if SC in dfs:
+                continue
+            elif self.inputs.hash(SC, symbol) is None:
+                print(f'{SC} doesn\'t have any value in the table {symbol}')
+                continue
+            df = self.inputs.get(SC, symbol)
+            if cols is not None:
+                df = df.set_axis(cols, axis=1)
+            dfs[SC] = filter_df(df, filters) if filters else df
+        
+        # Put scenario in first column and concatenate once
+        return concat_scenarios({SC : df for SC, df in dfs.items() if len(df.columns) > 0})
 
     def temporal_aggregation(self, 
                              scenario: str, 
@@ -602,7 +1422,8 @@ class Balmorel:
                              symbols_to_aggregate: dict | str = 'auto',
                              incfile_symbol_relation: dict = {},
                              excluded_incfiles: list = [],
-                             overwrite: bool = False):
+                             overwrite: bool = False,
+                             gdx: bool = False):
         """
         Do temporal aggregation of scenario, using tsam.
         If symbols_to_aggregate is 'auto' (default setting), the 
@@ -634,6 +1455,7 @@ class Balmorel:
                                         '/base/data/TRANSPORT_DE_VAR_T.inc']}
            excluded_incfiles (list): A list of .inc files to exclude when saving .inc files
            overwrite (bool): whether to use existing loaded data or overwrite and load again
+           gdx (bool): write the aggregated data to .gdx files, loaded by small .inc files, instead of text tables in the .inc files
         """
 
         from .timeagg import TimeAgg
@@ -652,7 +1474,107 @@ class Balmorel:
         self.ts.cluster(seasons, terms, method, representation, weights_per_region, weights_per_area)
 
         # Prepare and save incfiles
-        self.ts.save_incfiles(scenario, excluded_incfiles=excluded_incfiles)
+        self.ts.save_incfiles(scenario, excluded_incfiles=excluded_incfiles, gdx=gdx)
+
+
+class RunHandle:
+    """A Balmorel run in the background, returned by Balmorel.run_async. 
+    Awaiting it in asyncio returns the report of the run, like wait(). The solver statuses found in the 
+    GAMS log so far are collected in log_report
+
+    Args:
+        scenario (str): The scenario that is running
+        log_lines (int, optional): The amount of GAMS log lines to remember. Defaults to 1000.
+    """
+    def __init__(self, scenario: str, log_lines: int = 1000):
+        self.scenario = scenario
+        self.report = None
+        self.error = None
+        self.cancelled = False
+        self._job = None
+        self._interrupted = False
+        self._future = None
+        self.log_report = RunReport()
+        self._log = deque(maxlen=log_lines)
+        self._unfinished_line = ''
+        self._lock = threading.Lock()
+        self._state_lock = threading.Lock()
+
+    def _run(self, model: 'Balmorel', cmd_line_options: dict, threads: int | None) -> dict:
+        self.report, self.error = model._run_job(self.scenario, cmd_line_options, threads, handle=self)
+        return self.report
+
+    def _start(self, job: gams.GamsJob) -> bool:
+        """Registers the job that is about to run. Returns False if the run was cancelled, and the job must not be started"""
+        with self._state_lock:
+            if self.cancelled:
+                return False
+            self._job = job
+            return True
+
+    def status(self) -> str:
+        """'Running', 'Cancelling' or the status of the finished run, e.g. 'Finished', 'Infeasible' or 'Cancelled'"""
+        if self._future.done():
+            return self.report['Status'] if self.report is not None else 'Failed'
+        return 'Cancelling' if self.cancelled else 'Running'
+
+    def done(self) -> bool:
+        """Whether the run has ended"""
+        return self._future.done()
+
+    def wait(self, timeout: float | None = None) -> dict:
+        """Wait for the run to end
+
+        Args:
+            timeout (float, optional): Seconds to wait before raising a TimeoutError. Defaults to waiting until the run ends.
+
+        Returns:
+            dict: Status, wall time in seconds, feasibility, objective value, error message and RunReport of the run
+        """
+        return self._future.result(timeout)
+
+    def cancel(self) -> bool:
+        """Interrupt the run, or make sure it is not started. Returns False if it already ended"""
+        with self._state_lock:
+            if self._future is not None and self._future.done():
+                return False
+            self.cancelled = True
+            job = self._job
+        
+        # A job that is starting has no process to interrupt yet, it is interrupted when it writes to the log
+        if job is not None and job.interrupt():
+            self._interrupted = True
+        return True
+
+    def log_tail(self, lines: int = 20) -> list:
+        """The last lines of the GAMS log"""
+        with self._lock:
+            tail = list(self._log)
+            if self._unfinished_line != '':
+                tail.append(self._unfinished_line)
+        return tail[-lines:]
+
+    def write(self, text: str):
+        """Receives the GAMS log while running"""
+        with self._lock:
+            lines = (self._unfinished_line + text).split('\n')
+            self._unfinished_line = lines.pop()
+            self._log.extend(lines)
+            for line in lines:
+                self.log_report.read_line(line)
+        
+        # The process of a run that was cancelled while it started
+        if self.cancelled and not self._interrupted:
+            self._interrupted = self._job.interrupt()
+
+    def flush(self):
+        pass
+
+    def __await__(self):
+        return asyncio.wrap_future(self._future).__await__()
+
+    def __repr__(self):
+        return f'RunHandle({self.scenario}, {self.status()})'
 
 
 @dataclass
@@ -0,0 +1,53 @@
+"""
+Command line tools
+
+Exports symbols from MainResults files to partitioned Parquet or Feather datasets, e.g.:
+pybalmorel-export Balmorel/*/model/MainResults*.gdx -s G_CAP_YCRAF PRO_YCRAGF -o results --workers 4
+"""
+#%% ------------------------------- ###
+###        0. Script Settings       ###
+### ------------------------------- ###
+
+import argparse
+from pathlib import Path
+
+#%% ------------------------------- ###
+###            1. Export            ###
+### ------------------------------- ###
+
+def export(argv: list | None = None):
+    """Command line entry point of MainResults.export"""
+    parser = argparse.ArgumentParser(prog='pybalmorel-export',
+                                     description='Export symbols from MainResults files to columnar datasets partitioned by scenario and year')
+    parser.add_argument('files', nargs='+', help='The MainResults gdx files')
+    parser.add_argument('-s', '--symbols', nargs='+', required=True, help='The symbols to export, e.g. G_CAP_YCRAF PRO_YCRAGF')
+    parser.add_argument('-o', '--output', required=True, help='The folder to export to')
+    parser.add_argument('-n', '--scenario-names', nargs='+', default=None, help='Names of the scenarios, defaults to the suffixes of the file names')
+    parser.add_argument('-f', '--format', choices=['parquet', 'feather'], default='parquet', help='File format, defaults to parquet')
+    parser.add_argument('-c', '--compression', default='zstd', help="Compression, e.g. zstd, snappy, lz4 or none, defaults to zstd")
+    parser.add_argument('-p', '--partition-by', nargs='*', default=['Scenario', 'Year'], help='Columns to partition by, defaults to Scenario Year')
+    parser.add_argument('-w', '--workers', type=int, default=1, help='Amount of processes exporting at the same time, defaults to 1')
+    parser.add_argument('--result-type', choices=['balmorel', 'optiflow'], default='balmorel', help='Type of the results, defaults to balmorel')
+    parser.add_argument('--system-directory', default=None, help='GAMS system directory, GAMS will try to find it if not given')
+    args = parser.parse_args(argv)
+
+    # Imported here, so --help is fast
+    from .classes import MainResults
+
+    files = [Path(file) for file in args.files]
+    res = MainResults(files=[file.name for file in files], paths=[str(file.parent) for file in files],
+                      scenario_names=args.scenario_names, system_directory=args.system_directory,
+                      result_type=args.result_type, lazy=True)
+    report = res.export(args.symbols, args.output, file_format=args.format, partition_by=args.partition_by,
+                        compression=None if args.compression.lower() == 'none' else args.compression,
+                        max_workers=args.workers)
+    print(report.to_string(index=False))
+
+    missing = [symbol for symbol in args.symbols if symbol not in list(report.Symbol)]
+    if len(missing) > 0:
+        print('No records found for %s'%', '.join(missing))
+
+    return 1 if report.Error.notna().any() else 0
+
+if __name__ == '__main__':
+    raise SystemExit(export())
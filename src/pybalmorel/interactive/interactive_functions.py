@@ -43,6 +43,10 @@ def interactive_bar_chart(MainResults_instance, plot_style: str = 'light'):
         mainresults_symbol_columns=optiflow_mainresults_symbol_columns
     elif result_type=='balmorel':
         mainresults_symbol_columns=balmorel_mainresults_symbol_columns
+    
+    # Only show tables that exist in the loaded results
+    available_symbols = MainResults_instance.available_symbols()
+    mainresults_symbol_columns = {symbol : columns for symbol, columns in mainresults_symbol_columns.items() if symbol in available_symbols}
 
     """ Buttons definition """
     
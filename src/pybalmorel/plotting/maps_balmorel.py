@@ -28,6 +28,7 @@ from gams import GamsWorkspace
 from typing import Tuple
 import geopandas as gpd
 import cartopy.crs as ccrs
+from ..cache import ScenarioIndex
 
 
 def plot_map(path_to_result: str, 
@@ -144,17 +145,18 @@ def plot_map(path_to_result: str,
             
     elif path_to_result[-4:] == r'\...':
         path_to_result = path_to_result[:-4]
-        for subdir in pd.Series(os.listdir(path_to_result.rstrip(r'\...'))):  
+        index = ScenarioIndex(path_to_result.rstrip(r'\...'))
+        for subdir in index.directories:  
             subpath = os.path.join(path_to_result, subdir, 'model')
-            if os.path.isdir(subpath):
-                if os.path.exists(subpath + '/MainResults_%s_Iter%s.gdx'%(scenario, iter)): 
+            if index.has_model_folder(subdir):
+                if 'MainResults_%s_Iter%s.gdx'%(scenario, iter) in index.results(subdir): 
                     path_to_result = subpath
                     print('Found %s_Iter%s in %s'%(scenario, iter, path_to_result))
                     scenario = scenario + '_Iter%s'%iter
                     found_scenario = True
                     break
                     
-                elif os.path.exists(subpath + '/MainResults_%s.gdx'%scenario):
+                elif 'MainResults_%s.gdx'%scenario in index.results(subdir):
                     path_to_result = subpath
                     print('Found %s in %s'%(scenario, path_to_result))
                     found_scenario = True
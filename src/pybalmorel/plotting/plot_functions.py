@@ -68,7 +68,8 @@ def plot_bar_chart(df: pd.core.frame.DataFrame, filter: dict, series: Union[str,
         temp = df.pivot_table(index=series,
                         columns=categories,
                         values='Value',
-                        aggfunc='sum').fillna(0)
+                        aggfunc='sum',
+                        observed=True).fillna(0)
         
         # Ordering the index
         order_list = []
@@ -11,7 +11,7 @@ Created on 28.05.2022
 import pandas as pd
 import numpy as np
 from gams import GamsException
-from typing import Tuple
+from typing import Tuple, List
 from matplotlib.figure import Figure
 from matplotlib.axes import Axes
 import matplotlib.pyplot as plt
@@ -65,20 +65,21 @@ def plot_profile(MainResults,
 
     ### Try to load the non-iteration scenario suffix first
     db = MainResults.db[scenario]
+    read_options = {'engine' : MainResults.engine, 'system_directory' : getattr(MainResults, '_gams_system_directory', None)}
 
-    fProd = symbol_to_df(db, "PRO_YCRAGFST", cols=['Y', 'C', 'RRR', 'AAA', 'G', 'Fuel', 'SSS', 'TTT', 'COMMODITY', 'Technology', 'UNITS', 'Val'])
+    fProd = symbol_to_df(db, "PRO_YCRAGFST", cols=['Y', 'C', 'RRR', 'AAA', 'G', 'Fuel', 'SSS', 'TTT', 'COMMODITY', 'Technology', 'UNITS', 'Val'], **read_options)
     
     if commodity == 'ELECTRICITY':
-        fPrice  = symbol_to_df(db, "EL_PRICE_YCRST", cols=['Y', 'C', 'RRR', 'SSS', 'TTT', 'UNITS', 'Val']) 
-        fDem  = symbol_to_df(db, "EL_DEMAND_YCRST", cols=['Y', 'C', 'RRR', 'SSS', 'TTT', 'VARIABLE_CATEGORY', 'UNIT', 'Val'])  
-        fBal  = symbol_to_df(db, "EL_BALANCE_YCRST", cols=['Y', 'C', 'RRR', 'Technology', 'SSS', 'TTT', 'UNIT', 'Val'])  
+        fPrice  = symbol_to_df(db, "EL_PRICE_YCRST", cols=['Y', 'C', 'RRR', 'SSS', 'TTT', 'UNITS', 'Val'], **read_options) 
+        fDem  = symbol_to_df(db, "EL_DEMAND_YCRST", cols=['Y', 'C', 'RRR', 'SSS', 'TTT', 'VARIABLE_CATEGORY', 'UNIT', 'Val'], **read_options)  
+        fBal  = symbol_to_df(db, "EL_BALANCE_YCRST", cols=['Y', 'C', 'RRR', 'Technology', 'SSS', 'TTT', 'UNIT', 'Val'], **read_options)  
         fBal = fBal[fBal.Technology == 'EXPORT3RD']
     elif commodity == 'HYDROGEN':
-        fPrice  = symbol_to_df(db, "H2_PRICE_YCRST", cols=['Y', 'C', 'RRR', 'SSS', 'TTT', 'UNITS', 'Val']) 
-        fDem  = symbol_to_df(db, "H2_DEMAND_YCRST", cols=['Y', 'C', 'RRR', 'SSS', 'TTT', 'VARIABLE_CATEGORY', 'UNIT', 'Val'])  
+        fPrice  = symbol_to_df(db, "H2_PRICE_YCRST", cols=['Y', 'C', 'RRR', 'SSS', 'TTT', 'UNITS', 'Val'], **read_options) 
+        fDem  = symbol_to_df(db, "H2_DEMAND_YCRST", cols=['Y', 'C', 'RRR', 'SSS', 'TTT', 'VARIABLE_CATEGORY', 'UNIT', 'Val'], **read_options)  
     elif commodity == 'HEAT':
-        fPrice  = symbol_to_df(db, "H_PRICE_YCRAST", cols=['Y', 'C', 'RRR', 'AAA', 'SSS', 'TTT', 'UNITS', 'Val']) 
-        fDem  = symbol_to_df(db, "H_DEMAND_YCRAST", cols=['Y', 'C', 'RRR', 'AAA', 'SSS', 'TTT', 'VARIABLE_CATEGORY', 'UNIT', 'Val'])  
+        fPrice  = symbol_to_df(db, "H_PRICE_YCRAST", cols=['Y', 'C', 'RRR', 'AAA', 'SSS', 'TTT', 'UNITS', 'Val'], **read_options) 
+        fDem  = symbol_to_df(db, "H_DEMAND_YCRAST", cols=['Y', 'C', 'RRR', 'AAA', 'SSS', 'TTT', 'VARIABLE_CATEGORY', 'UNIT', 'Val'], **read_options)  
 
     ### ----------------------------- ###
     ###           Parameters          ###
@@ -91,27 +92,27 @@ def plot_profile(MainResults,
             country = region.upper()
             # Load transmission
             if commodity == 'ELECTRICITY':
-                fFlow = symbol_to_df(db, "X_FLOW_YCRST", cols=['Y', 'C', 'IRRRE', 'IRRRI', 'SSS', 'TTT', 'UNITS', 'Val'])
+                fFlow = symbol_to_df(db, "X_FLOW_YCRST", cols=['Y', 'C', 'IRRRE', 'IRRRI', 'SSS', 'TTT', 'UNITS', 'Val'], **read_options)
             elif commodity == 'HYDROGEN':
-                fFlow = symbol_to_df(db, "XH2_FLOW_YCRST", cols=['Y', 'C', 'IRRRE', 'IRRRI', 'SSS', 'TTT', 'UNITS', 'Val'])
+                fFlow = symbol_to_df(db, "XH2_FLOW_YCRST", cols=['Y', 'C', 'IRRRE', 'IRRRI', 'SSS', 'TTT', 'UNITS', 'Val'], **read_options)
             elif commodity == 'HEAT':
-                fFlow = symbol_to_df(db, "XH_FLOW_YCAST", cols=['Y', 'C', 'IRRRE', 'IRRRI', 'SSS', 'TTT', 'UNITS', 'Val'])
+                fFlow = symbol_to_df(db, "XH_FLOW_YCAST", cols=['Y', 'C', 'IRRRE', 'IRRRI', 'SSS', 'TTT', 'UNITS', 'Val'], **read_options)
             else:
                 pass
         elif region in fProd.RRR.unique():
             CorRorA = 'R'
             # Load transmission
             if commodity == 'ELECTRICITY':
-                fFlow = symbol_to_df(db, "X_FLOW_YCRST", cols=['Y', 'C', 'IRRRE', 'IRRRI', 'SSS', 'TTT', 'UNITS', 'Val'])
+                fFlow = symbol_to_df(db, "X_FLOW_YCRST", cols=['Y', 'C', 'IRRRE', 'IRRRI', 'SSS', 'TTT', 'UNITS', 'Val'], **read_options)
             elif commodity == 'HYDROGEN':
-                fFlow = symbol_to_df(db, "XH2_FLOW_YCRST", cols=['Y', 'C', 'IRRRE', 'IRRRI', 'SSS', 'TTT', 'UNITS', 'Val'])
+                fFlow = symbol_to_df(db, "XH2_FLOW_YCRST", cols=['Y', 'C', 'IRRRE', 'IRRRI', 'SSS', 'TTT', 'UNITS', 'Val'], **read_options)
             elif commodity == 'HEAT':
-                fFlow = symbol_to_df(db, "XH_FLOW_YCAST", cols=['Y', 'C', 'IRRRE', 'IRRRI', 'SSS', 'TTT', 'UNITS', 'Val'])
+                fFlow = symbol_to_df(db, "XH_FLOW_YCAST", cols=['Y', 'C', 'IRRRE', 'IRRRI', 'SSS', 'TTT', 'UNITS', 'Val'], **read_options)
             else:
                 pass   
         elif region in fProd.AAA.unique():
             CorRorA = 'A'
-            fFlow = symbol_to_df(db, "XH_FLOW_YCAST", cols=['Y', 'C', 'IRRRE', 'IRRRI', 'SSS', 'TTT', 'UNITS', 'Val'])
+            fFlow = symbol_to_df(db, "XH_FLOW_YCAST", cols=['Y', 'C', 'IRRRE', 'IRRRI', 'SSS', 'TTT', 'UNITS', 'Val'], **read_options)
         elif region.upper() == 'ALL':
             region = 'All'
             CorRorA = 'All'
@@ -154,7 +155,7 @@ def plot_profile(MainResults,
     df_placeholder = pd.DataFrame(index=t_index)
 
     # Create production dataframe
-    fPr = fProd[idx].pivot_table(values='Val', index=['SSS', 'TTT'], columns=[columns],aggfunc='sum')
+    fPr = fProd[idx].pivot_table(values='Val', index=['SSS', 'TTT'], columns=[columns],aggfunc='sum', observed=True)
     fPr = df_placeholder.join(fPr, how='left')
     fPr.fillna(0, inplace=True)
     
@@ -200,13 +201,13 @@ def plot_profile(MainResults,
 
     ### Electricity Demand and price
     if CorRorA == 'C':
-        fP = fPrice.groupby(['Y', 'C', 'SSS', 'TTT'], as_index=False)
+        fP = fPrice.groupby(['Y', 'C', 'SSS', 'TTT'], as_index=False, observed=True)
         fP = fP.aggregate({'Val' : price_agg_func}) # For aggregation of electricity price, max or average? (maybe max if nodal representation of a market?)
         fP = fP[fP.C == country]    
         
         if commodity == 'ELECTRICITY':
             fBal = fBal[(fBal.C == country) & (fBal.Y == year)].pivot_table(values='Val', index=['SSS', 'TTT'], aggfunc='sum').fillna(0)
-        fD = fDem.groupby(['Y', 'C', 'VARIABLE_CATEGORY', 'SSS', 'TTT'], as_index=False)
+        fD = fDem.groupby(['Y', 'C', 'VARIABLE_CATEGORY', 'SSS', 'TTT'], as_index=False, observed=True)
         fD = fD.aggregate({'Val' : np.sum}) 
         dems = fD[(fD['Y']==year) & (fD['C'] == country)]
         fD = fDem[fDem.C == country] 
@@ -221,11 +222,11 @@ def plot_profile(MainResults,
         fP = fPrice[fPrice['AAA'] == region]    
         fD = fDem[fDem['AAA'] == region] 
     elif CorRorA == 'All':
-        fP = fPrice.groupby(['Y', 'C', 'SSS', 'TTT'], as_index=False)
+        fP = fPrice.groupby(['Y', 'C', 'SSS', 'TTT'], as_index=False, observed=True)
         fP = fP.aggregate({'Val' : price_agg_func}) # For aggregation of electricity price, max or average? (maybe max if nodal representation of a market?)        
         if commodity == 'ELECTRICITY':
             fBal = fBal[(fBal.Y == year)].pivot_table(values='Val', index=['SSS', 'TTT'], aggfunc='sum').fillna(0)
-        fD = fDem.groupby(['Y', 'C', 'VARIABLE_CATEGORY', 'SSS', 'TTT'], as_index=False)
+        fD = fDem.groupby(['Y', 'C', 'VARIABLE_CATEGORY', 'SSS', 'TTT'], as_index=False, observed=True)
         fD = fD.aggregate({'Val' : 'sum'}) 
         dems = fD[(fD['Y']==year)]
 
@@ -360,20 +361,21 @@ def plot_profiles(MainResults,
 
     ### Try to load the non-iteration scenario suffix first
     db = MainResults.db[scenario]
+    read_options = {'engine' : MainResults.engine, 'system_directory' : getattr(MainResults, '_gams_system_directory', None)}
 
-    fProd = symbol_to_df(db, "PRO_YCRAGFST", cols=['Y', 'C', 'RRR', 'AAA', 'G', 'Fuel', 'SSS', 'TTT', 'COMMODITY', 'Technology', 'UNITS', 'Val'])
+    fProd = symbol_to_df(db, "PRO_YCRAGFST", cols=['Y', 'C', 'RRR', 'AAA', 'G', 'Fuel', 'SSS', 'TTT', 'COMMODITY', 'Technology', 'UNITS', 'Val'], **read_options)
     
     if commodity == 'ELECTRICITY':
-        fPrice  = symbol_to_df(db, "EL_PRICE_YCRST", cols=['Y', 'C', 'RRR', 'SSS', 'TTT', 'UNITS', 'Val']) 
-        fDem  = symbol_to_df(db, "EL_DEMAND_YCRST", cols=['Y', 'C', 'RRR', 'SSS', 'TTT', 'VARIABLE_CATEGORY', 'UNIT', 'Val'])  
-        fBal  = symbol_to_df(db, "EL_BALANCE_YCRST", cols=['Y', 'C', 'RRR', 'Technology', 'SSS', 'TTT', 'UNIT', 'Val'])  
+        fPrice  = symbol_to_df(db, "EL_PRICE_YCRST", cols=['Y', 'C', 'RRR', 'SSS', 'TTT', 'UNITS', 'Val'], **read_options) 
+        fDem  = symbol_to_df(db, "EL_DEMAND_YCRST", cols=['Y', 'C', 'RRR', 'SSS', 'TTT', 'VARIABLE_CATEGORY', 'UNIT', 'Val'], **read_options)  
+        fBal  = symbol_to_df(db, "EL_BALANCE_YCRST", cols=['Y', 'C', 'RRR', 'Technology', 'SSS', 'TTT', 'UNIT', 'Val'], **read_options)  
         fBal = fBal[fBal.Technology == 'EXPORT3RD']
     elif commodity == 'HYDROGEN':
-        fPrice  = symbol_to_df(db, "H2_PRICE_YCRST", cols=['Y', 'C', 'RRR', 'SSS', 'TTT', 'UNITS', 'Val']) 
-        fDem  = symbol_to_df(db, "H2_DEMAND_YCRST", cols=['Y', 'C', 'RRR', 'SSS', 'TTT', 'VARIABLE_CATEGORY', 'UNIT', 'Val'])  
+        fPrice  = symbol_to_df(db, "H2_PRICE_YCRST", cols=['Y', 'C', 'RRR', 'SSS', 'TTT', 'UNITS', 'Val'], **read_options) 
+        fDem  = symbol_to_df(db, "H2_DEMAND_YCRST", cols=['Y', 'C', 'RRR', 'SSS', 'TTT', 'VARIABLE_CATEGORY', 'UNIT', 'Val'], **read_options)  
     elif commodity == 'HEAT':
-        fPrice  = symbol_to_df(db, "H_PRICE_YCRAST", cols=['Y', 'C', 'RRR', 'AAA', 'SSS', 'TTT', 'UNITS', 'Val']) 
-        fDem  = symbol_to_df(db, "H_DEMAND_YCRAST", cols=['Y', 'C', 'RRR', 'AAA', 'SSS', 'TTT', 'VARIABLE_CATEGORY', 'UNIT', 'Val'])  
+        fPrice  = symbol_to_df(db, "H_PRICE_YCRAST", cols=['Y', 'C', 'RRR', 'AAA', 'SSS', 'TTT', 'UNITS', 'Val'], **read_options) 
+        fDem  = symbol_to_df(db, "H_DEMAND_YCRAST", cols=['Y', 'C', 'RRR', 'AAA', 'SSS', 'TTT', 'VARIABLE_CATEGORY', 'UNIT', 'Val'], **read_options)  
 
     ### ----------------------------- ###
     ###           Parameters          ###
@@ -386,27 +388,27 @@ def plot_profiles(MainResults,
             country = region.upper()
             # Load transmission
             if commodity == 'ELECTRICITY':
-                fFlow = symbol_to_df(db, "X_FLOW_YCRST", cols=['Y', 'C', 'IRRRE', 'IRRRI', 'SSS', 'TTT', 'UNITS', 'Val'])
+                fFlow = symbol_to_df(db, "X_FLOW_YCRST", cols=['Y', 'C', 'IRRRE', 'IRRRI', 'SSS', 'TTT', 'UNITS', 'Val'], **read_options)
             elif commodity == 'HYDROGEN':
-                fFlow = symbol_to_df(db, "XH2_FLOW_YCRST", cols=['Y', 'C', 'IRRRE', 'IRRRI', 'SSS', 'TTT', 'UNITS', 'Val'])
+                fFlow = symbol_to_df(db, "XH2_FLOW_YCRST", cols=['Y', 'C', 'IRRRE', 'IRRRI', 'SSS', 'TTT', 'UNITS', 'Val'], **read_options)
             elif commodity == 'HEAT':
-                fFlow = symbol_to_df(db, "XH_FLOW_YCAST", cols=['Y', 'C', 'IRRRE', 'IRRRI', 'SSS', 'TTT', 'UNITS', 'Val'])
+                fFlow = symbol_to_df(db, "XH_FLOW_YCAST", cols=['Y', 'C', 'IRRRE', 'IRRRI', 'SSS', 'TTT', 'UNITS', 'Val'], **read_options)
             else:
                 pass
         elif region in fProd.RRR.unique():
             CorRorA = 'R'
             # Load transmission
             if commodity == 'ELECTRICITY':
-                fFlow = symbol_to_df(db, "X_FLOW_YCRST", cols=['Y', 'C', 'IRRRE', 'IRRRI', 'SSS', 'TTT', 'UNITS', 'Val'])
+                fFlow = symbol_to_df(db, "X_FLOW_YCRST", cols=['Y', 'C', 'IRRRE', 'IRRRI', 'SSS', 'TTT', 'UNITS', 'Val'], **read_options)
             elif commodity == 'HYDROGEN':
-                fFlow = symbol_to_df(db, "XH2_FLOW_YCRST", cols=['Y', 'C', 'IRRRE', 'IRRRI', 'SSS', 'TTT', 'UNITS', 'Val'])
+                fFlow = symbol_to_df(db, "XH2_FLOW_YCRST", cols=['Y', 'C', 'IRRRE', 'IRRRI', 'SSS', 'TTT', 'UNITS', 'Val'], **read_options)
             elif commodity == 'HEAT':
-                fFlow = symbol_to_df(db, "XH_FLOW_YCAST", cols=['Y', 'C', 'IRRRE', 'IRRRI', 'SSS', 'TTT', 'UNITS', 'Val'])
+                fFlow = symbol_to_df(db, "XH_FLOW_YCAST", cols=['Y', 'C', 'IRRRE', 'IRRRI', 'SSS', 'TTT', 'UNITS', 'Val'], **read_options)
             else:
                 pass   
         elif region in fProd.AAA.unique():
             CorRorA = 'A'
-            fFlow = symbol_to_df(db, "XH_FLOW_YCAST", cols=['Y', 'C', 'IRRRE', 'IRRRI', 'SSS', 'TTT', 'UNITS', 'Val'])
+            fFlow = symbol_to_df(db, "XH_FLOW_YCAST", cols=['Y', 'C', 'IRRRE', 'IRRRI', 'SSS', 'TTT', 'UNITS', 'Val'], **read_options)
         elif region.upper() == 'ALL':
             region = 'All'
             CorRorA = 'All'
@@ -449,7 +451,7 @@ def plot_profiles(MainResults,
     df_placeholder = pd.DataFrame(index=t_index)
 
     # Create production dataframe
-    fPr = fProd[idx].pivot_table(values='Val', index=['SSS', 'TTT'], columns=[columns],aggfunc='sum')
+    fPr = fProd[idx].pivot_table(values='Val', index=['SSS', 'TTT'], columns=[columns],aggfunc='sum', observed=True)
     fPr = df_placeholder.join(fPr, how='left')
     fPr.fillna(0, inplace=True)
     
@@ -495,13 +497,13 @@ def plot_profiles(MainResults,
 
     ### Electricity Demand and price
     if CorRorA == 'C':
-        fP = fPrice.groupby(['Y', 'C', 'SSS', 'TTT'], as_index=False)
+        fP = fPrice.groupby(['Y', 'C', 'SSS', 'TTT'], as_index=False, observed=True)
         fP = fP.aggregate({'Val' : price_agg_func}) # For aggregation of electricity price, max or average? (maybe max if nodal representation of a market?)
         fP = fP[fP.C == country]    
         
         if commodity == 'ELECTRICITY':
             fBal = fBal[(fBal.C == country) & (fBal.Y == year)].pivot_table(values='Val', index=['SSS', 'TTT'], aggfunc='sum').fillna(0)
-        fD = fDem.groupby(['Y', 'C', 'VARIABLE_CATEGORY', 'SSS', 'TTT'], as_index=False)
+        fD = fDem.groupby(['Y', 'C', 'VARIABLE_CATEGORY', 'SSS', 'TTT'], as_index=False, observed=True)
         fD = fD.aggregate({'Val' : np.sum}) 
         dems = fD[(fD['Y']==year) & (fD['C'] == country)]
         fD = fDem[fDem.C == country] 
@@ -516,11 +518,11 @@ def plot_profiles(MainResults,
         fP = fPrice[fPrice['AAA'] == region]    
         fD = fDem[fDem['AAA'] == region] 
     elif CorRorA == 'All':
-        fP = fPrice.groupby(['Y', 'C', 'SSS', 'TTT'], as_index=False)
+        fP = fPrice.groupby(['Y', 'C', 'SSS', 'TTT'], as_index=False, observed=True)
         fP = fP.aggregate({'Val' : price_agg_func}) # For aggregation of electricity price, max or average? (maybe max if nodal representation of a market?)        
         if commodity == 'ELECTRICITY':
             fBal = fBal[(fBal.Y == year)].pivot_table(values='Val', index=['SSS', 'TTT'], aggfunc='sum').fillna(0)
-        fD = fDem.groupby(['Y', 'C', 'VARIABLE_CATEGORY', 'SSS', 'TTT'], as_index=False)
+        fD = fDem.groupby(['Y', 'C', 'VARIABLE_CATEGORY', 'SSS', 'TTT'], as_index=False, observed=True)
         fD = fD.aggregate({'Val' : 'sum'}) 
         dems = fD[(fD['Y']==year)]
 
@@ -131,18 +131,19 @@ class TimeAgg:
         RRRAAA = (
             self.parent.get_input("RRRAAA")
             .query(f'Scenario=="{scenario}"')
-            .pivot_table(index="AAA", values="RRR", aggfunc="max")
+            .astype({"RRR": str})
+            .pivot_table(index="AAA", values="RRR", aggfunc="max", observed=True)
         )
         DE = (
             self.parent.get_input("DE")
             .query(f'Scenario=="{scenario}" and YYY in @Y')
-            .pivot_table(index="RRR", values="Value", aggfunc="sum")
+            .pivot_table(index="RRR", values="Value", aggfunc="sum", observed=True)
         )
 
         ## Get regions for later - assuming all regions have exogenous electricity demand
         DH = self.parent.get_input("DH").query(f'Scenario=="{scenario}" and YYY in @Y')
         DH["RRR"] = DH["AAA"].map(RRRAAA["RRR"])
-        DH = DH.pivot_table(index="RRR", values="Value", aggfunc="sum")
+        DH = DH.pivot_table(index="RRR", values="Value", aggfunc="sum", observed=True)
         HYDROGEN_DH2 = self.parent.get_input("HYDROGEN_DH2").query(
             f'Scenario=="{scenario}" and YYY in @Y'
         )
@@ -152,7 +153,7 @@ class TimeAgg:
             if region in DE.index
         ]
         HYDROGEN_DH2 = HYDROGEN_DH2.query("CCCRRRAAA in @hydrogen_regions").pivot_table(
-            index="CCCRRRAAA", values="Value", aggfunc="sum"
+            index="CCCRRRAAA", values="Value", aggfunc="sum", observed=True
         )
         HYDROGEN_DH2.index.name = "RRR"
         SUBTECHGROUPKPOT = self.parent.get_input("SUBTECHGROUPKPOT").query(
@@ -165,7 +166,7 @@ class TimeAgg:
         ]
         SUBTECHGROUPKPOT = SUBTECHGROUPKPOT.query(
             "CCCRRRAAA in @subtech_regions"
-        ).pivot_table(index="CCCRRRAAA", values="Value", aggfunc="sum")
+        ).pivot_table(index="CCCRRRAAA", values="Value", aggfunc="sum", observed=True)
         SUBTECHGROUPKPOT.index.name = "RRR"
 
         # Calculate weight per region
@@ -228,10 +229,11 @@ class TimeAgg:
             f"Run 'Balmorel.load_incfiles({scenario})' before this command"
         )
 
-        # Get a list of all symbols in this scenario
-        db = self.parent.input_data[scenario]
+        # Get a list of all symbols in this scenario from the metadata of the input data
+        metadata = self.parent.input_metadata(scenario)
+        metadata = metadata[metadata.Type != "Alias"]
         symbol_list = [
-            symbol.name for symbol in db if symbol.name not in excluded_symbols
+            symbol for symbol in metadata.index if symbol not in excluded_symbols
         ]
 
         # Categorise symbols
@@ -239,7 +241,7 @@ class TimeAgg:
         symbols_incfiles = {}
         for symbol in symbol_list:
             # Only look at symbols with domains (e.g.: not CCCRRRAAA)
-            domains = [domain.name for domain in db[symbol].domains if domain != "*"]
+            domains = [domain for domain in metadata.loc[symbol, "Domains"] if domain != "*"]
 
             # Use ripgrep to search for symbol in .inc files
             incfiles_containing_symbol = search_in_incfiles(
@@ -305,7 +307,7 @@ class TimeAgg:
 
         # Standardise
         df = df.pivot_table(
-            index=time_domains, columns=domains, values="Value", fill_value=0
+            index=time_domains, columns=domains, values="Value", fill_value=0, observed=True
         )
 
         # Check if symbol has only constant values
@@ -542,7 +544,7 @@ class TimeAgg:
                     incfiles[incfile] = IncFile(
                         name=filename,
                         path=str(self.new_scenario_path),
-                        body=symbol_data.to_string(),
+                        body=[symbol_data],
                         prefix=prefix,
                         suffix=suffix,
                     )
@@ -555,9 +557,7 @@ class TimeAgg:
                     filename, path, prefix, suffix, domains, filename_eq_symbol = (
                         prepare_incfile(incfile, symbol, domains, explanatory_text)
                     )
-                    incfiles[incfile].body += "\n"
-                    incfiles[incfile].body += "\n;\n" + prefix
-                    incfiles[incfile].body += symbol_data.to_string()
+                    incfiles[incfile].body += ["\n;\n" + prefix, symbol_data]
 
             # Make first related .inc file the one to save data to, if no .inc file had a name equal to symbol name
             incfiles_to_save = [
@@ -571,7 +571,7 @@ class TimeAgg:
                     f"More than one .inc file will contain data for symbol {symbol}, but only one should!"
                 )
 
-    def save_incfiles(self, scenario: str, excluded_incfiles: list = []):
+    def save_incfiles(self, scenario: str, excluded_incfiles: list = [], gdx: bool = False):
         from . import IncFile  # deferred to avoid circular import with classes.py
 
         self.new_scenario_path = Path(
@@ -593,6 +593,7 @@ class TimeAgg:
 
         # Save aggregated files
         incfiles = self.incfiles_to_save
+        to_save = []
         for incfile in incfiles:
             # Don't save excluded .inc files
             if incfiles[incfile].name in excluded_incfiles:
@@ -600,14 +601,13 @@ class TimeAgg:
 
             # Only write data to one of the .inc files that symbols relate to
             if incfiles[incfile].sn_eq_ifn:
-                incfiles[incfile].save()
+                to_save.append(incfiles[incfile])
             # Write the rest as empty files (typically addon files)
             else:
                 # Empty file (addon files already included in previously written .inc file)
-                with open(
-                    incfiles[incfile].path + "/" + incfiles[incfile].name, "w"
-                ) as f:
-                    f.write("")
+                to_save.append(
+                    IncFile(name=incfiles[incfile].name, path=incfiles[incfile].path)
+                )
 
         # Finally save S and T
         bodies = {
@@ -619,13 +619,20 @@ class TimeAgg:
             ),
         }
         for incfile in ["S", "T"]:
-            f = IncFile(
-                name=incfile,
-                path=str(self.new_scenario_path),
-                prefix=f"SET {incfile}({incfile * 3}) '{self.parent.input_data[scenario][incfile].text}'\n/\n",
-                body=bodies[incfile],
-                suffix="\n/;",
-            ).save()
+            to_save.append(
+                IncFile(
+                    name=incfile,
+                    path=str(self.new_scenario_path),
+                    prefix=f"SET {incfile}({incfile * 3}) '{self.parent.input_data[scenario][incfile].text}'\n/\n",
+                    body=bodies[incfile],
+                    suffix="\n/;",
+                )
+            )
+
+        # Write all at once, leaving unchanged files untouched
+        IncFile.save_many(
+            to_save, gdx=gdx, system_directory=self.parent._gams_system_directory
+        )
 
     def plot_clustering(self, symbol: list, filename: str):
         """Compare input data and clustered representation"""
@@ -2,20 +2,60 @@
 Functions
 """
 
+import re
+import os
 import gams
+import gams.core.gdx as gdxcc
+import time
+import shutil
+import hashlib
+import numpy as np
 import pandas as pd
+from pathlib import Path
+from contextlib import contextmanager
+from bisect import bisect_right
+from itertools import product
+from dataclasses import dataclass, field
+from concurrent.futures import ProcessPoolExecutor
 from .formatting import balmorel_symbol_columns, optiflow_symbol_columns
 
+try:
+    import gams.transfer as gt
+except ImportError:
+    gt = None
+
 preformatted_columns = {
     'balmorel' : balmorel_symbol_columns,
     'optiflow' : optiflow_symbol_columns
 }
 
+# Engines that symbol_to_df can use to read symbols
+engines = ['transfer', 'gams']
+
+# Symbol metadata of gdx files, with the size and modification time of the file when it was read
+_metadata_index = {}
+
+# Aggregation functions that symbol_to_df can reduce symbols with, and the records reduced at a time
+aggfuncs = ['sum', 'min', 'max', 'mean', 'count']
+default_chunk_rows = 2**20
+
+class SymbolNotFoundError(ValueError):
+    """Raised when a symbol is not in a gdx file, so a scenario without it can be skipped"""
+
 #%% ------------------------------- ###
 ###       1. GAMS Interface         ###
 ### ------------------------------- ###
 
 ### 1.1 Try to find 
+def get_domain_names(db, symbol: str) -> list:
+    """Domain names of a symbol in a GamsDatabase, a gams.transfer Container or a dictionary of symbols pointing to their domains"""
+    if isinstance(db, gams.GamsDatabase):
+        return db[symbol].domains_as_strings
+    elif isinstance(db, dict):
+        return list(db[symbol])
+    else:
+        return db[symbol].domain_names
+
 def create_parameter_columns(df: pd.DataFrame,
                              db: gams.GamsDatabase,
                              symbol: str,
@@ -29,7 +69,7 @@ def create_parameter_columns(df: pd.DataFrame,
                 df.columns = mainresult_symbol_columns[symbol] + ['Value']
             except KeyError:
                 # If no standard format exists, just use columns from GAMS
-                df.columns = db[symbol].domains_as_strings + ['Value']
+                df.columns = get_domain_names(db, symbol) + ['Value']
     else:
         df.columns = cols          
         
@@ -48,7 +88,7 @@ def create_variable_columns(df: pd.DataFrame,
                 df.columns = mainresult_symbol_columns[symbol] + ['Value', 'Marginal', 'Lower', 'Upper', 'Scale']
             except KeyError:
                 # If no standard format exists, just use columns from GAMS
-                df.columns = db[symbol].domains_as_strings + ['Value', 'Marginal', 'Lower', 'Upper', 'Scale']
+                df.columns = get_domain_names(db, symbol) + ['Value', 'Marginal', 'Lower', 'Upper', 'Scale']
     else:
         df.columns = cols          
         
@@ -67,37 +107,213 @@ def create_set_columns(df: pd.DataFrame,
                 df.columns = mainresult_symbol_columns[symbol]
             except KeyError:
                 # If no standard format exists, just use columns from GAMS
-                df.columns = db[symbol].domains_as_strings
+                df.columns = get_domain_names(db, symbol)
     else:
         df.columns = cols  
         
     return df
 
+def dimension_columns(db, symbol: str, dimension: int,
+                      mainresult_symbol_columns: dict,
+                      cols: list | None) -> list:
+    """The names of the dimension columns that create_*_columns will give a symbol, without reading its records"""
+    if cols is not None:
+        return list(cols[:dimension])
+    elif symbol in mainresult_symbol_columns and len(mainresult_symbol_columns[symbol]) == dimension:
+        return list(mainresult_symbol_columns[symbol])
+    elif symbol in mainresult_symbol_columns and len(mainresult_symbol_columns[symbol]) + 1 == dimension:
+        return list(mainresult_symbol_columns[symbol]) + ['Unit']
+    else:
+        return list(get_domain_names(db, symbol))
+
+def filter_positions(names: list, symbol: str, filters: dict) -> dict:
+    """Positions of the filtered dimensions, pointing to the set of elements to keep
+
+    Args:
+        names (list): The dimension columns of the symbol
+        symbol (str): The symbol, used in the error message
+        filters (dict): Column names pointing to one element or a list of elements to keep
+
+    Returns:
+        dict: Dimension positions pointing to the elements to keep, as strings
+    """
+    positions = {}
+    for col, values in filters.items():
+        if col not in names:
+            raise KeyError("%s is not a dimension of %s, choose from %s"%(col, symbol, ', '.join(names)))
+        if isinstance(values, str) or not hasattr(values, '__iter__'):
+            values = [values]
+        positions[names.index(col)] = set(str(value) for value in values)
+    return positions
+
+def filter_df(df: pd.DataFrame, filters: dict | None) -> pd.DataFrame:
+    """Keeps the rows of an extracted symbol that match the filters, see symbol_to_df"""
+    if not filters or len(df.columns) == 0:
+        return df
+    positions = filter_positions(list(df.columns), 'the table', filters)
+    mask = np.ones(len(df), dtype=bool)
+    for position, values in positions.items():
+        mask &= df.iloc[:, position].isin(list(values)).to_numpy()
+    return df.loc[mask].reset_index(drop=True)
+
+def keep_positions(names: list, symbol: str, keep: list) -> list:
+    """Positions of the kept dimensions"""
+    for col in keep:
+        if col not in names:
+            raise KeyError("%s is not a dimension of %s, choose from %s"%(col, symbol, ', '.join(names)))
+    return [names.index(col) for col in keep]
+
+def check_aggfunc(aggfunc: str):
+    """Raises a ValueError if symbols cannot be aggregated with aggfunc"""
+    if aggfunc not in aggfuncs:
+        raise ValueError("Unknown aggfunc '%s', choose from %s"%(aggfunc, ', '.join(aggfuncs)))
+
+def aggregate_chunks(chunks, keep: list, aggfunc: str = 'sum') -> pd.DataFrame:
+    """
+    Aggregates the Value column of a symbol over the columns that are not kept, one chunk of records at a time. 
+    Only the aggregated groups are held in memory between chunks. Symbols without a Value column (sets) are 
+    reduced to the unique combinations of the kept columns
+
+    Args:
+        chunks (iterable): DataFrames with the kept columns and the Value column
+        keep (list): The columns to keep. An empty list aggregates all records into one row
+        aggfunc (str, optional): How to aggregate the values, choose from 'sum', 'min', 'max', 'mean' or 'count'. Defaults to 'sum'.
+
+    Returns:
+        pd.DataFrame: The kept columns and the aggregated Value column
+    """
+    check_aggfunc(aggfunc)
+    
+    # The mean is combined from partial sums and counts
+    partial_aggfuncs = ['sum', 'count'] if aggfunc == 'mean' else [aggfunc]
+    combine_aggfuncs = {'sum' : 'sum', 'count' : 'sum', 'min' : 'min', 'max' : 'max'}
+    
+    result = None
+    is_set = False
+    for chunk in chunks:
+        if len(chunk) == 0:
+            continue
+        elif 'Value' not in chunk.columns:
+            is_set = True
+            keep_positions(list(chunk.columns), 'the table', keep)
+            partial = chunk.loc[:, keep].drop_duplicates()
+            result = partial if result is None else pd.concat([result, partial]).drop_duplicates()
+            continue
+        
+        keep_positions(list(chunk.columns), 'the table', keep)
+        if len(keep) == 0:
+            # A total of all records
+            partial = chunk['Value'].agg(partial_aggfuncs).to_frame().T
+        else:
+            partial = chunk.groupby(keep, observed=True, sort=False)['Value'].agg(partial_aggfuncs)
+        if result is not None and len(keep) == 0:
+            partial = pd.concat([result, partial]).agg({col : combine_aggfuncs[col] for col in partial.columns}).to_frame().T
+        elif result is not None:
+            partial = (pd.concat([result, partial])
+                       .groupby(level=list(range(len(keep))), observed=True, sort=False)
+                       .agg({col : combine_aggfuncs[col] for col in partial.columns}))
+        result = partial
+    
+    if result is None:
+        return pd.DataFrame()
+    elif is_set:
+        return result.reset_index(drop=True)
+    elif aggfunc == 'mean':
+        result['Value'] = result['sum'] / result['count']
+    else:
+        result['Value'] = result[aggfunc].astype('float64')
+    
+    return result.loc[:, ['Value']].reset_index(drop=len(keep) == 0)
+
+def aggregate_df(df: pd.DataFrame, keep: list, aggfunc: str = 'sum', chunk_rows: int | None = None) -> pd.DataFrame:
+    """Aggregates an extracted symbol over the columns that are not kept, see aggregate_chunks"""
+    if len(df.columns) == 0:
+        return df
+    keep_positions(list(df.columns), 'the table', keep)
+    columns = keep + (['Value'] if 'Value' in df.columns else [])
+    return aggregate_chunks(df_chunks(df.loc[:, columns], chunk_rows), keep, aggfunc)
+
+def df_chunks(df: pd.DataFrame, chunk_rows: int | None = None):
+    """Yields chunks of at most chunk_rows rows of a DataFrame"""
+    chunk_rows = chunk_rows if chunk_rows is not None else default_chunk_rows
+    for start in range(0, len(df), chunk_rows):
+        yield df.iloc[start:start + chunk_rows]
+
 ### 1.0 Converting a GDX file to a pandas dataframe
-def symbol_to_df(db: gams.GamsDatabase, symbol: str, 
+def default_engine() -> str:
+    """The columnar gams.transfer engine if it is installed, otherwise the record-by-record GAMS API"""
+    return 'transfer' if gt is not None else 'gams'
+
+def symbol_to_df(db: gams.GamsDatabase | str | Path, symbol: str, 
                  cols: list[str] | None = None, 
                  result_type: str = 'balmorel',
-                 print_explanatory_text: bool = False):
+                 print_explanatory_text: bool = False,
+                 engine: str | None = None,
+                 system_directory: str | None = None,
+                 filters: dict | None = None,
+                 keep: list | None = None,
+                 aggfunc: str = 'sum'):
     """
     Loads a symbol from a GDX database into a pandas dataframe
 
     Args:
-        db (GamsDatabase): The loaded gdx file
+        db (GamsDatabase, str, Path): The loaded gdx file, or the path to a gdx file
         symbol (string): The desired symbol in the gdx file
         cols (list): Your defined columns, will otherwise first try to find pybalmorel default column formats for the symbol or the raw columns from the gdx  
         result_type (str): Is it a normal MainResults or a Optiflow Mainresults? Choose either 'balmorel' or 'optiflow'
         print_explanatory_text (bool): Print the text describing the symbol?
+        engine (str, optional): 'transfer' reads the symbol columnar through gams.transfer, 'gams' iterates records through the GAMS API. Defaults to 'transfer' if available.
+        system_directory (str, optional): GAMS system directory, only used when db is a path. Will let GAMS find it if not specified.
+        filters (dict, optional): Only keep records where these columns, named as in the output, have one of the given elements, e.g. {'Year' : 2050, 'Region' : ['DK1', 'DK2']}. Records are filtered while reading.
+        keep (list, optional): Only keep these columns, named as in the output, and aggregate the Value column over the other dimensions while reading. 
+            The 'gams' engine reads gdx files a chunk at a time for this, so the memory use is bounded, while the 'transfer' engine reads all records of the symbol first. Defaults to None, which keeps all columns.
+        aggfunc (str, optional): How to aggregate the Value column if keep is given, choose from 'sum', 'min', 'max', 'mean' or 'count'. Defaults to 'sum'.
     """   
-    if not db[symbol].get_number_records() == 0:
+    if engine is None:
+        engine = default_engine()
+    if keep is not None:
+        check_aggfunc(aggfunc)
+    
+    if engine == 'transfer':
+        return _transfer_symbol_to_df(db, symbol, cols, result_type, print_explanatory_text, system_directory, filters, keep, aggfunc)
+    elif engine != 'gams':
+        raise ValueError("Unknown engine '%s', choose from %s"%(engine, ', '.join(engines)))
+    
+    if keep is not None:
+        # Reduce the records a chunk at a time
+        chunks = iter_symbol(db, symbol, default_chunk_rows, cols, result_type, system_directory, filters)
+        return aggregate_chunks(chunks, keep, aggfunc)
+    
+    if not isinstance(db, gams.GamsDatabase):
+        # Open the gdx file with the GAMS API
+        if system_directory is not None:
+            ws = gams.GamsWorkspace(system_directory=system_directory)
+        else:
+            ws = gams.GamsWorkspace()
+        db = ws.add_database_from_gdx(str(Path(db).absolute()))
+    
+    try:
+        records = db[symbol]
+    except gams.GamsException:
+        raise SymbolNotFoundError('%s is not in the gdx file'%symbol)
+    number_records = db[symbol].get_number_records()
+    if filters and number_records != 0:
+        # Skip records with other elements before their values are stored
+        names = dimension_columns(db, symbol, db[symbol].dimension, preformatted_columns[result_type.lower()], cols)
+        positions = filter_positions(names, symbol, filters)
+        records = [rec for rec in db[symbol] if all(rec.keys[i] in values for i, values in positions.items())]
+        number_records = len(records)
+    
+    if not number_records == 0:
         if type(db[symbol]) == gams.GamsParameter:
-            df = dict( (tuple(rec.keys), rec.value) for rec in db[symbol] )
+            df = dict( (tuple(rec.keys), rec.value) for rec in records )
             df = pd.DataFrame(df, index=['Value']).T.reset_index() # Convert to dataframe
             df = create_parameter_columns(df, db, symbol, preformatted_columns[result_type.lower()], cols)
         elif type(db[symbol]) == gams.GamsSet:
-            df = pd.DataFrame([tuple(rec.keys)  for rec in db[symbol] ])
+            df = pd.DataFrame([tuple(rec.keys)  for rec in records ])
             df = create_set_columns(df, db, symbol, preformatted_columns[result_type.lower()], cols)
         elif type(db[symbol]) == gams.GamsVariable or type(db[symbol]) == gams.GamsEquation:
-            df = dict( (tuple(rec.keys), rec.level) for rec in db[symbol] )
+            df = dict( (tuple(rec.keys), rec.level) for rec in records )
             df = pd.DataFrame(df, index=['Value', 'Marginal', 'Lower', 'Upper', 'Scale']).T.reset_index() # Convert to dataframe
             df = create_variable_columns(df, db, symbol, preformatted_columns[result_type.lower()], cols)
         else:
@@ -111,6 +327,586 @@ def symbol_to_df(db: gams.GamsDatabase, symbol: str,
     
     return df 
 
+def _transfer_symbol_to_df(db: gams.GamsDatabase | str | Path, symbol: str,
+                           cols: list[str] | None,
+                           result_type: str,
+                           print_explanatory_text: bool,
+                           system_directory: str | None,
+                           filters: dict | None = None,
+                           keep: list | None = None,
+                           aggfunc: str = 'sum'):
+    """symbol_to_df through gams.transfer, which reads all records of the symbol as arrays instead of one Python object per record. 
+    Filters and keep are applied after all records are read, so the memory use is not bounded by them"""
+    if gt is None:
+        raise ImportError("The 'transfer' engine requires gams.transfer, install it with: pip install gamsapi[transfer]")
+
+    # Read only the requested symbol
+    if isinstance(db, gams.GamsDatabase):
+        container = gt.Container(system_directory=db.workspace.system_directory)
+        source = db
+    else:
+        container = gt.Container(system_directory=system_directory)
+        source = str(Path(db).absolute())
+    try:
+        container.read(source, symbols=[symbol])
+    except ValueError as e:
+        if 'does not exist' in str(e):
+            raise SymbolNotFoundError('%s is not in the gdx file'%symbol) from e
+        raise
+    
+    gdx_symbol = container[symbol]
+    records = gdx_symbol.records
+    if records is not None and (filters or keep is not None):
+        names = dimension_columns(container, symbol, gdx_symbol.dimension, preformatted_columns[result_type.lower()], cols)
+    if records is not None and filters:
+        # Compare the categorical codes of the dimensions before any column is copied
+        mask = np.ones(len(records), dtype=bool)
+        for position, values in filter_positions(names, symbol, filters).items():
+            mask &= records.iloc[:, position].isin(list(values)).to_numpy()
+        records = records.loc[mask]
+    
+    if records is not None and len(records) != 0 and keep is not None:
+        # Reduce the records a chunk at a time, only copying the kept columns
+        value = {gt.Parameter : 'value', gt.Variable : 'level', gt.Equation : 'level'}.get(type(gdx_symbol))
+        positions = keep_positions(names, symbol, keep) + ([records.columns.get_loc(value)] if value is not None else [])
+        columns = keep + (['Value'] if value is not None else [])
+        chunks = (records.iloc[start:start + default_chunk_rows, positions].set_axis(columns, axis=1) 
+                  for start in range(0, len(records), default_chunk_rows))
+        df = aggregate_chunks(chunks, keep, aggfunc)
+    elif records is not None and len(records) != 0:
+        # The first columns are the dimensions, stored as categoricals by gams.transfer
+        dimensions = list(records.columns[:gdx_symbol.dimension])
+        if isinstance(gdx_symbol, gt.Parameter):
+            df = records.loc[:, dimensions + ['value']].astype({'value' : 'float64'})
+            df = create_parameter_columns(df, container, symbol, preformatted_columns[result_type.lower()], cols)
+        elif isinstance(gdx_symbol, gt.Set):
+            df = records.loc[:, dimensions]
+            df = create_set_columns(df, container, symbol, preformatted_columns[result_type.lower()], cols)
+        elif isinstance(gdx_symbol, (gt.Variable, gt.Equation)):
+            attributes = ['level', 'marginal', 'lower', 'upper', 'scale']
+            df = records.loc[:, dimensions + attributes].astype({attribute : 'float64' for attribute in attributes})
+            df = create_variable_columns(df, container, symbol, preformatted_columns[result_type.lower()], cols)
+        else:
+            raise TypeError('%s is not supported by symbol_to_df'%(str(type(gdx_symbol))))
+        df = df.reset_index(drop=True)
+    else:
+        print('Symbol contents are empty')
+        df = pd.DataFrame()
+    
+    if print_explanatory_text:
+        print(gdx_symbol.description)
+    
+    return df
+
+# Value columns of each symbol type, and the record attributes of the GAMS API they come from
+value_columns = {
+    'Set' : [],
+    'Parameter' : ['Value'],
+    'Variable' : ['Value', 'Marginal', 'Lower', 'Upper', 'Scale'],
+    'Equation' : ['Value', 'Marginal', 'Lower', 'Upper', 'Scale']
+}
+record_attributes = {
+    'Set' : [],
+    'Parameter' : ['value'],
+    'Variable' : ['level', 'marginal', 'lower', 'upper', 'scale'],
+    'Equation' : ['level', 'marginal', 'lower', 'upper', 'scale']
+}
+
+# Symbol types of the low-level GDX API
+gdx_types = {
+    gdxcc.GMS_DT_SET : 'Set',
+    gdxcc.GMS_DT_PAR : 'Parameter',
+    gdxcc.GMS_DT_VAR : 'Variable',
+    gdxcc.GMS_DT_EQU : 'Equation'
+}
+
+# GDX special values and what they are read as
+special_values = {
+    gdxcc.GMS_SV_UNDEF : np.nan,
+    gdxcc.GMS_SV_NA : np.nan,
+    gdxcc.GMS_SV_PINF : np.inf,
+    gdxcc.GMS_SV_MINF : -np.inf,
+    gdxcc.GMS_SV_EPS : -0.0
+}
+
+def iter_symbol(db: gams.GamsDatabase | str | Path, symbol: str,
+                chunk_rows: int = default_chunk_rows,
+                cols: list[str] | None = None,
+                result_type: str = 'balmorel',
+                system_directory: str | None = None,
+                filters: dict | None = None):
+    """
+    Reads a symbol from a GDX database in chunks, so symbols that do not fit in memory can be processed.
+    Gdx files are read record by record with the low-level GDX API, without loading the rest of the file
+
+    Args:
+        db (GamsDatabase, str, Path): The loaded gdx file, or the path to a gdx file
+        symbol (str): The desired symbol in the gdx file
+        chunk_rows (int, optional): The maximum amount of records in each chunk. Defaults to 2**20.
+        cols (list, optional): Your defined columns, will otherwise use the same columns as symbol_to_df
+        result_type (str, optional): Is it a normal MainResults or a Optiflow Mainresults? Choose either 'balmorel' or 'optiflow'
+        system_directory (str, optional): GAMS system directory, only used when db is a path. Will let GAMS find it if not specified.
+        filters (dict, optional): Only keep records with these elements, see symbol_to_df. Defaults to None.
+
+    Yields:
+        pd.DataFrame: Chunks of the symbol, with categorical dimensions and float values
+    """
+    if chunk_rows < 1:
+        raise ValueError('chunk_rows must be a positive integer')
+    if isinstance(db, gams.GamsDatabase):
+        yield from _iter_gams_symbol(db, symbol, chunk_rows, cols, result_type, filters)
+    else:
+        yield from _iter_gdx_symbol(db, symbol, chunk_rows, cols, result_type, system_directory, filters)
+
+def _chunk_to_df(rows: list, names: list, values: list, map_special_values: bool = False) -> pd.DataFrame:
+    """DataFrame of a chunk of records, stored as tuples of the dimensions and values"""
+    df = pd.DataFrame(rows, columns=names + values)
+    df = df.astype({col : 'category' for col in names} | {col : 'float64' for col in values})
+    if map_special_values:
+        for col in values:
+            df[col] = df[col].replace(special_values)
+    return df
+
+def _iter_gams_symbol(db: gams.GamsDatabase, symbol: str, chunk_rows: int,
+                      cols: list[str] | None, result_type: str, filters: dict | None):
+    """iter_symbol for a loaded gdx file, iterating the records of the GAMS API"""
+    try:
+        gams_symbol = db[symbol]
+    except gams.GamsException:
+        raise SymbolNotFoundError('%s is not in the gdx file'%symbol)
+    symbol_type = type(gams_symbol).__name__.replace('Gams', '')
+    if symbol_type not in value_columns:
+        raise TypeError('%s is not supported by iter_symbol'%(str(type(gams_symbol))))
+    
+    names = dimension_columns(db, symbol, gams_symbol.dimension, preformatted_columns[result_type.lower()], cols)
+    values = list(cols[len(names):]) if cols is not None else value_columns[symbol_type]
+    positions = filter_positions(names, symbol, filters) if filters else {}
+    
+    rows = []
+    for rec in gams_symbol:
+        keys = rec.keys
+        if positions and not all(keys[i] in elements for i, elements in positions.items()):
+            continue
+        rows.append(tuple(keys) + tuple(getattr(rec, attribute) for attribute in record_attributes[symbol_type]))
+        if len(rows) == chunk_rows:
+            yield _chunk_to_df(rows, names, values)
+            rows = []
+    if len(rows) > 0:
+        yield _chunk_to_df(rows, names, values)
+
+@contextmanager
+def _open_gdx(file: str | Path, system_directory: str | None):
+    """Opens a gdx file for reading with the low-level GDX API, and closes it again"""
+    if system_directory is None:
+        system_directory = gams.GamsWorkspace().system_directory
+    
+    handle = gdxcc.new_gdxHandle_tp()
+    rc, message = gdxcc.gdxCreateD(handle, system_directory, gdxcc.GMS_SSSIZE)
+    if not rc:
+        raise Exception('Could not load the GDX library: %s'%message)
+    try:
+        rc, error = gdxcc.gdxOpenRead(handle, str(Path(file).absolute()))
+        if not rc:
+            raise FileNotFoundError('Could not open %s, GDX error %d'%(str(file), error))
+        yield handle
+    finally:
+        gdxcc.gdxClose(handle)
+        gdxcc.gdxFree(handle)
+
+def _iter_gdx_symbol(file: str | Path, symbol: str, chunk_rows: int,
+                     cols: list[str] | None, result_type: str,
+                     system_directory: str | None, filters: dict | None):
+    """iter_symbol for a gdx file, reading the records with the low-level GDX API"""
+    with _open_gdx(file, system_directory) as handle:
+        rc, symbol_number = gdxcc.gdxFindSymbol(handle, symbol)
+        if not rc:
+            raise SymbolNotFoundError('%s is not in %s'%(symbol, str(file)))
+        _, _, dimension, gdx_type = gdxcc.gdxSymbolInfo(handle, symbol_number)
+        _, domains = gdxcc.gdxSymbolGetDomainX(handle, symbol_number)
+        symbol_type = gdx_types.get(gdx_type)
+        if symbol_type is None:
+            raise TypeError('Symbols of GDX type %d are not supported by iter_symbol'%gdx_type)
+        
+        names = dimension_columns({symbol : domains}, symbol, dimension, preformatted_columns[result_type.lower()], cols)
+        values = list(cols[len(names):]) if cols is not None else value_columns[symbol_type]
+        value_indices = list(range(len(record_attributes[symbol_type])))
+        positions = filter_positions(names, symbol, filters) if filters else {}
+        
+        rows = []
+        _, number_records = gdxcc.gdxDataReadStrStart(handle, symbol_number)
+        for _ in range(number_records):
+            _, keys, record_values, _ = gdxcc.gdxDataReadStr(handle)
+            if positions and not all(keys[i] in elements for i, elements in positions.items()):
+                continue
+            rows.append(tuple(keys) + tuple(record_values[i] for i in value_indices))
+            if len(rows) == chunk_rows:
+                yield _chunk_to_df(rows, names, values, map_special_values=True)
+                rows = []
+        gdxcc.gdxDataReadDone(handle)
+        if len(rows) > 0:
+            yield _chunk_to_df(rows, names, values, map_special_values=True)
+
+def _timed_symbol_to_df(db: gams.GamsDatabase | str, symbol: str, result_type: str, 
+                        engine: str | None, system_directory: str | None, filters: dict | None = None,
+                        keep: list | None = None, aggfunc: str = 'sum'):
+    """symbol_to_df that also returns the time it took and an error message, if the symbol is not in the gdx file"""
+    start = time.perf_counter()
+    try:
+        df = symbol_to_df(db, symbol, result_type=result_type, engine=engine, system_directory=system_directory, 
+                          filters=filters, keep=keep, aggfunc=aggfunc)
+        error = None
+    except SymbolNotFoundError as e:
+        df = None
+        error = str(e)
+    return df, time.perf_counter() - start, error
+
+def symbol_to_dfs(dbs: dict, symbol: str,
+                  result_type: str = 'balmorel',
+                  engine: str | None = None,
+                  system_directory: str | None = None,
+                  max_workers: int = 1,
+                  filters: dict | None = None,
+                  keep: list | None = None,
+                  aggfunc: str = 'sum') -> tuple[dict, pd.DataFrame]:
+    """
+    Loads a symbol from several GDX databases or files into pandas dataframes, in parallel processes if max_workers > 1
+
+    Args:
+        dbs (dict): Names pointing to loaded gdx files or paths to gdx files. Must be paths if max_workers > 1
+        symbol (str): The desired symbol in the gdx files
+        result_type (str): Is it a normal MainResults or a Optiflow Mainresults? Choose either 'balmorel' or 'optiflow'
+        engine (str, optional): 'transfer' or 'gams', see symbol_to_df. Defaults to 'transfer' if available.
+        system_directory (str, optional): GAMS system directory, only used when reading from paths.
+        max_workers (int, optional): Amount of processes reading files at the same time. Defaults to 1.
+        filters (dict, optional): Only keep records with these elements, see symbol_to_df. Defaults to None.
+        keep (list, optional): Only keep these columns and aggregate the rest away while reading, see symbol_to_df. Defaults to None.
+        aggfunc (str, optional): How to aggregate if keep is given. Defaults to 'sum'.
+
+    Returns:
+        tuple[dict, pd.DataFrame]: The dataframes per name, for the files that contained the symbol, 
+        and a report of the time used on, the records found in and errors from each file
+    """
+    if keep is not None:
+        check_aggfunc(aggfunc)
+    if max_workers > 1 and len(dbs) > 1:
+        if any(isinstance(db, gams.GamsDatabase) for db in dbs.values()):
+            raise TypeError('Loaded GamsDatabases cannot be shared between processes, provide paths to the gdx files instead')
+        with ProcessPoolExecutor(max_workers=min(max_workers, len(dbs))) as pool:
+            futures = {name : pool.submit(_timed_symbol_to_df, str(db), symbol, result_type, engine, system_directory, filters, keep, aggfunc) 
+                       for name, db in dbs.items()}
+            outputs = {name : future.result() for name, future in futures.items()}
+    else:
+        outputs = {name : _timed_symbol_to_df(db, symbol, result_type, engine, system_directory, filters, keep, aggfunc) 
+                   for name, db in dbs.items()}
+    
+    dfs = {name : df for name, (df, seconds, error) in outputs.items() if df is not None}
+    report = pd.DataFrame([(name, symbol, seconds, 0 if df is None else len(df), error) 
+                           for name, (df, seconds, error) in outputs.items()],
+                          columns=['Name', 'Symbol', 'Seconds', 'Records', 'Error'])
+    
+    return dfs, report
+
+def symbol_hash(df: pd.DataFrame) -> str:
+    """Content hash of the columns and records of a dataframe. Categorical columns hash the same as the strings they hold"""
+    content_hash = hashlib.blake2b(digest_size=16)
+    content_hash.update('\t'.join(map(str, df.columns)).encode())
+    if len(df) > 0:
+        content_hash.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return content_hash.hexdigest()
+
+def diff_frames(df_a: pd.DataFrame, df_b: pd.DataFrame, names: tuple = ('a', 'b')) -> pd.DataFrame:
+    """
+    Records that were added, removed or changed between two dataframes of the same symbol. 
+    The records are aligned on the dimension columns, i.e. the columns that are not values
+
+    Args:
+        df_a (pd.DataFrame): The symbol in the first scenario
+        df_b (pd.DataFrame): The symbol in the second scenario
+        names (tuple, optional): Names of the scenarios, used as suffixes of the value columns. Defaults to ('a', 'b').
+
+    Returns:
+        pd.DataFrame: The dimension columns, the value columns of both scenarios and a Change column 
+        saying if the record was 'added', 'removed' or 'changed'
+    """
+    all_values = set(value_columns['Variable'])
+    values = [col for col in df_a.columns if col in all_values and col in df_b.columns]
+    dims = [col for col in df_a.columns if col not in all_values and col in df_b.columns]
+    
+    # Align the records on shared categories, so the merge compares integer codes
+    aligned = concat_scenarios({names[0] : df_a[dims + values], names[1] : df_b[dims + values]})
+    a = aligned.loc[aligned['Scenario'] == names[0]].drop(columns='Scenario')
+    b = aligned.loc[aligned['Scenario'] == names[1]].drop(columns='Scenario')
+    df = a.merge(b, on=dims, how='outer', suffixes=tuple('_%s'%name for name in names), indicator=True)
+    
+    change = pd.Series(pd.NA, index=df.index, dtype='object')
+    change[df['_merge'] == 'left_only'] = 'removed'
+    change[df['_merge'] == 'right_only'] = 'added'
+    both = (df['_merge'] == 'both').to_numpy()
+    differs = np.zeros(len(df), dtype=bool)
+    for col in values:
+        value_a = df['%s_%s'%(col, names[0])].to_numpy(dtype='float64')
+        value_b = df['%s_%s'%(col, names[1])].to_numpy(dtype='float64')
+        differs |= ~((value_a == value_b) | (np.isnan(value_a) & np.isnan(value_b)))
+    change[both & differs] = 'changed'
+    
+    df = df.drop(columns='_merge').assign(Change=change)
+    return df.loc[df['Change'].notna()].reset_index(drop=True)
+
+def integer_keys(df: pd.DataFrame, columns: list) -> np.ndarray:
+    """Integer codes of the combinations of elements in the columns, numbered from 0 without gaps"""
+    keys = np.zeros(len(df), dtype='int64')
+    for col in columns:
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            codes, n = df[col].cat.codes.to_numpy(dtype='int64'), len(df[col].cat.categories) + 1
+        else:
+            codes, uniques = pd.factorize(df[col], use_na_sentinel=True)
+            n = len(uniques) + 1
+        # Renumber after each column, so the keys stay small no matter the amount of columns
+        keys = pd.factorize(keys * n + codes + 1)[0]
+    return keys
+
+def scenario_deltas(df: pd.DataFrame, baseline: str, value: str = 'Value', 
+                    fill_value: float | None = 0.0) -> pd.DataFrame:
+    """
+    Absolute and relative differences of the values of each scenario from a baseline scenario, 
+    aligned on the columns that are not values through integer keys instead of a wide pivot table
+
+    Args:
+        df (pd.DataFrame): A result with a Scenario column, e.g. from MainResults.get_result
+        baseline (str): The scenario to compare with
+        value (str, optional): The value column. Defaults to 'Value'.
+        fill_value (float, optional): Value of records missing in a scenario, as Balmorel does not store zeros. 
+            Missing records are left out if None. Defaults to 0.0.
+
+    Returns:
+        pd.DataFrame: The records of the other scenarios with the Value, Baseline, Delta and Relative columns
+    """
+    all_values = set(value_columns['Variable'])
+    dims = [col for col in df.columns if col != 'Scenario' and col not in all_values]
+    scenarios = pd.Categorical(df['Scenario'])
+    if baseline not in scenarios.categories:
+        raise KeyError(f'{baseline} is not in the Scenario column')
+    
+    keys = integer_keys(df, dims)
+    scenario_codes = scenarios.codes
+    baseline_code = scenarios.categories.get_loc(baseline)
+    values = df[value].to_numpy(dtype='float64')
+    
+    # The baseline value of each key
+    is_baseline = scenario_codes == baseline_code
+    baseline_rows = np.flatnonzero(is_baseline)
+    baseline_values = np.full(keys.max() + 1 if len(keys) > 0 else 0, np.nan if fill_value is None else fill_value)
+    baseline_values[keys[baseline_rows]] = values[baseline_rows]
+    
+    # Rows of the other scenarios, plus the baseline rows missing in each of them
+    rows = [np.flatnonzero(~is_baseline)]
+    row_scenarios = [scenario_codes[rows[0]]]
+    row_values = [values[rows[0]]]
+    if fill_value is not None:
+        for code in np.unique(scenario_codes[~is_baseline]):
+            missing = baseline_rows[~np.isin(keys[baseline_rows], keys[scenario_codes == code])]
+            rows.append(missing)
+            row_scenarios.append(np.full(len(missing), code))
+            row_values.append(np.full(len(missing), fill_value))
+    rows = np.concatenate(rows)
+    
+    result = df.iloc[rows][dims].reset_index(drop=True)
+    result.insert(0, 'Scenario', pd.Categorical.from_codes(np.concatenate(row_scenarios), categories=scenarios.categories))
+    result[value] = np.concatenate(row_values)
+    result['Baseline'] = baseline_values[keys[rows]]
+    result['Delta'] = result[value] - result['Baseline']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        result['Relative'] = np.where(result['Baseline'] != 0, result['Delta'] / result['Baseline'].abs(), np.nan)
+    
+    return result.sort_values('Scenario', kind='stable', ignore_index=True)
+
+def gdx_to_dfs(file: str | Path, known_hashes: set | None = None,
+               engine: str | None = None,
+               system_directory: str | None = None) -> dict:
+    """
+    Loads all sets, parameters, variables and equations with records from a gdx file and hashes them. 
+    Symbols with a known hash are not returned, so they are not sent between processes
+
+    Args:
+        file (str, Path): Path to the gdx file
+        known_hashes (set, optional): Hashes of symbols that are loaded already. Defaults to None.
+        engine (str, optional): 'transfer' or 'gams', see symbol_to_df. Defaults to 'transfer' if available.
+        system_directory (str, optional): GAMS system directory. Will let GAMS find it if not specified.
+
+    Returns:
+        dict: Symbols pointing to their hash and dataframe, or None if the hash was known
+    """
+    if known_hashes is None:
+        known_hashes = set()
+    metadata = symbol_metadata(file, system_directory)
+    metadata = metadata[(metadata['Type'] != 'Alias') & (metadata['Records'] > 0)]
+    dfs = {}
+    for symbol in metadata.index:
+        df = symbol_to_df(file, symbol, engine=engine, system_directory=system_directory)
+        df_hash = symbol_hash(df)
+        dfs[symbol] = (df_hash, None if df_hash in known_hashes else df)
+    return dfs
+
+def export_symbol(db: gams.GamsDatabase | str | Path, scenario: str, symbol: str,
+                  directory: str | Path,
+                  file_format: str = 'parquet',
+                  partition_by: list | None = None,
+                  compression: str | None = 'zstd',
+                  result_type: str = 'balmorel',
+                  system_directory: str | None = None,
+                  chunk_rows: int = default_chunk_rows) -> tuple[int, float, str | None]:
+    """
+    Writes a symbol of a scenario to a columnar dataset in directory/symbol, partitioned in folders 
+    like Scenario=SC1/Year=2050. The symbol is read and written a chunk at a time, and an existing 
+    export of the scenario is replaced, also in partitions the scenario no longer has records in
+
+    Args:
+        db (GamsDatabase, str, Path): The loaded gdx file, or the path to a gdx file
+        scenario (str): Name of the scenario, stored in the Scenario column
+        symbol (str): The desired symbol in the gdx file
+        directory (str, Path): The dataset folder
+        file_format (str, optional): 'parquet' or 'feather'. Defaults to 'parquet'.
+        partition_by (list, optional): Columns to partition by, the ones the symbol does not have are skipped. Defaults to ['Scenario', 'Year'] if None.
+        compression (str, optional): Compression of the files, e.g. 'zstd', 'lz4' or None. Defaults to 'zstd'.
+        result_type (str, optional): 'balmorel' or 'optiflow'. Defaults to 'balmorel'.
+        system_directory (str, optional): GAMS system directory, only used when db is a path.
+        chunk_rows (int, optional): The maximum amount of records read and written at a time. Defaults to 2**20.
+
+    Returns:
+        tuple[int, float, str | None]: The amount of records written, the time it took and an error message, if any
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+    except ImportError:
+        raise ImportError("Exporting requires pyarrow, install it with: pip install pybalmorel[export]")
+    if partition_by is None:
+        partition_by = ['Scenario', 'Year']
+    formats = {'parquet' : ds.ParquetFileFormat(), 'feather' : ds.IpcFileFormat()}
+    if file_format not in formats:
+        raise ValueError("Unknown file format '%s', choose from %s"%(file_format, ', '.join(formats)))
+    
+    start = time.perf_counter()
+    records = 0
+    try:
+        # Replace an existing export of the scenario. Its files are named after it, so other scenarios 
+        # exported to the same folder at the same time are left alone
+        symbol_directory = Path(directory) / symbol
+        if (symbol_directory / f'Scenario={scenario}').exists():
+            shutil.rmtree(symbol_directory / f'Scenario={scenario}')
+        if symbol_directory.exists():
+            exported = re.compile(r'%s-\d+-\d+\.(%s)$'%(re.escape(scenario), '|'.join(formats)))
+            for file in [file for file in symbol_directory.rglob('*') if exported.match(file.name)]:
+                file.unlink()
+        
+        file_options = formats[file_format].make_write_options(compression=compression)
+        for i, chunk in enumerate(iter_symbol(db, symbol, chunk_rows, result_type=result_type, system_directory=system_directory)):
+            chunk = chunk.copy(deep=False)
+            chunk.insert(0, 'Scenario', scenario)
+            partitions = [col for col in partition_by if col in chunk.columns]
+            chunk = chunk.astype({col : str for col in partitions})
+            ds.write_dataset(pa.Table.from_pandas(chunk, preserve_index=False), symbol_directory, 
+                             format=formats[file_format], file_options=file_options,
+                             partitioning=partitions if len(partitions) > 0 else None, partitioning_flavor='hive',
+                             basename_template=f'{scenario}-{i}-{{i}}.{file_format}',
+                             existing_data_behavior='overwrite_or_ignore')
+            records += len(chunk)
+        error = None
+    except (ValueError, KeyError) as e:
+        error = str(e)
+    return records, time.perf_counter() - start, error
+
+def concat_scenarios(dfs: dict) -> pd.DataFrame:
+    """
+    Concatenates dataframes of a symbol from several scenarios in one go. The scenario names
+    are inserted as a categorical first column, and all string columns become categoricals
+    with the same categories in every scenario, so they stay categorical after concatenation
+
+    Args:
+        dfs (dict): Scenario names pointing to the dataframes of each scenario
+
+    Returns:
+        pd.DataFrame: The concatenated dataframe
+    """
+    if len(dfs) == 0:
+        return pd.DataFrame()
+    
+    # Find the categories of each string column across all scenarios
+    categories = {}
+    for df in dfs.values():
+        for col in df.columns:
+            if isinstance(df[col].dtype, pd.CategoricalDtype):
+                values = df[col].cat.categories
+            elif pd.api.types.is_object_dtype(df[col]) or pd.api.types.is_string_dtype(df[col]):
+                values = pd.Index(df[col].unique())
+            else:
+                continue
+            categories[col] = values if col not in categories else categories[col].union(values, sort=False)
+    
+    pieces = []
+    scenarios = pd.Index(list(dfs.keys())).unique()
+    for SC, df in dfs.items():
+        # Shallow copy, the data of each scenario is only copied once by pd.concat
+        piece = df.copy(deep=False)
+        for col, col_categories in categories.items():
+            if col not in piece.columns:
+                continue
+            elif isinstance(piece[col].dtype, pd.CategoricalDtype):
+                piece[col] = piece[col].cat.set_categories(col_categories)
+            else:
+                piece[col] = pd.Categorical(piece[col], categories=col_categories)
+        piece.insert(0, 'Scenario', pd.Categorical.from_codes(np.full(len(piece), scenarios.get_loc(SC)), 
+                                                              categories=scenarios))
+        pieces.append(piece)
+    
+    return pd.concat(pieces, ignore_index=True)
+
+def symbol_metadata(db: gams.GamsDatabase | str | Path, 
+                    system_directory: str | None = None) -> pd.DataFrame:
+    """
+    Lists the symbols of a GDX database with their type, domains, amount of records and explanatory text.
+    Gdx files are read with the low-level GDX API without reading any records, and the index of each 
+    file is remembered until the file changes
+
+    Args:
+        db (GamsDatabase, str, Path): The loaded gdx file, or the path to a gdx file
+        system_directory (str, optional): GAMS system directory, only used when db is a path.
+
+    Returns:
+        pd.DataFrame: Symbol metadata, indexed by symbol name
+    """
+    metadata = {}
+    if isinstance(db, gams.GamsDatabase):
+        for gdx_symbol in db:
+            metadata[gdx_symbol.name] = {'Type' : type(gdx_symbol).__name__.replace('Gams', ''),
+                                         'Domains' : gdx_symbol.domains_as_strings,
+                                         'Records' : gdx_symbol.number_records,
+                                         'Text' : gdx_symbol.text}
+    else:
+        # Check if the file was indexed already
+        file = Path(db).absolute()
+        stat = file.stat()
+        if str(file) in _metadata_index:
+            size, mtime, df = _metadata_index[str(file)]
+            if size == stat.st_size and mtime == stat.st_mtime:
+                return df.copy()
+        
+        with _open_gdx(file, system_directory) as handle:
+            _, symbol_count, _ = gdxcc.gdxSystemInfo(handle)
+            for symbol_number in range(1, symbol_count + 1):
+                _, name, _, gdx_type = gdxcc.gdxSymbolInfo(handle, symbol_number)
+                _, number_records, _, text = gdxcc.gdxSymbolInfoX(handle, symbol_number)
+                _, domains = gdxcc.gdxSymbolGetDomainX(handle, symbol_number)
+                metadata[name] = {'Type' : gdx_types.get(gdx_type, 'Alias'),
+                                  'Domains' : list(domains),
+                                  'Records' : number_records,
+                                  'Text' : text}
+        df = pd.DataFrame.from_dict(metadata, orient='index', columns=['Type', 'Domains', 'Records', 'Text'])
+        _metadata_index[str(file)] = (stat.st_size, stat.st_mtime, df)
+        return df.copy()
+
+    return pd.DataFrame.from_dict(metadata, orient='index', columns=['Type', 'Domains', 'Records', 'Text'])
+
 def read_lines(name, file_path, make_space=True):
    
     if make_space:
@@ -145,3 +941,600 @@ def prepare_incfile(filepath: str, symbol_name: str, domains: list | str, explan
 
     return filename, path, prefix, suffix, domains, filename_eq_symbol
 
+
+#%% ------------------------------- ###
+###          2. Run Reports         ###
+### ------------------------------- ###
+
+# Lines of the solve summary in GAMS listings, and the fields they are stored in
+_solve_summary_patterns = [
+    (re.compile(r'^\s*MODEL\s+(\S+)\s+OBJECTIVE\s+(\S+)'), ['Model', 'Objective variable']),
+    (re.compile(r'^\s*TYPE\s+(\S+)\s+DIRECTION\s+(\S+)'), ['Type', 'Direction']),
+    (re.compile(r'^\s*SOLVER\s+(\S+)\s+FROM LINE\s+(\d+)'), ['Solver', 'Line']),
+    (re.compile(r'^\*\*\*\* SOLVER STATUS\s+(.+?)\s*$'), ['Solver status']),
+    (re.compile(r'^\*\*\*\* MODEL STATUS\s+(.+?)\s*$'), ['Model status']),
+    (re.compile(r'^\*\*\*\* OBJECTIVE VALUE\s+(\S+)'), ['Objective']),
+    (re.compile(r'^\s*RESOURCE USAGE, LIMIT\s+(\S+)'), ['Seconds']),
+    (re.compile(r'^\s*ITERATION COUNT, LIMIT\s+(\S+)'), ['Iterations']),
+]
+_numeric_fields = {'Objective' : float, 'Seconds' : float, 'Iterations' : int, 'Line' : int}
+
+@dataclass
+class RunReport:
+    """
+    The solves of a Balmorel run, read from the GAMS listing (.lst) or log one line at a time
+
+    Args:
+        solves (list): The solve summary of each solve, with model, type, solver, statuses, objective value, solver time in seconds and iteration count
+        status_lines (list): Solution status lines from the solver log, e.g. 'LP status(1): optimal'
+    """
+    solves: list = field(default_factory=list)
+    status_lines: list = field(default_factory=list)
+
+    def read_line(self, line: str):
+        """Update the report with a line of the listing or log"""
+        if 'S O L V E      S U M M A R Y' in line:
+            self.solves.append({})
+        elif 'LP status' in line or 'MIP status' in line:
+            self.status_lines.append(line.strip())
+        elif len(self.solves) > 0:
+            for pattern, fields in _solve_summary_patterns:
+                match = pattern.match(line)
+                if match is not None:
+                    for name, value in zip(fields, match.groups()):
+                        try:
+                            self.solves[-1][name] = _numeric_fields[name](value) if name in _numeric_fields else value
+                        except ValueError:
+                            self.solves[-1][name] = None
+                    break
+
+    @property
+    def feasible(self) -> bool:
+        """False if any solve was infeasible"""
+        return not (any('infeasible' in line.lower() for line in self.status_lines) or
+                    any('infeasible' in str(solve.get('Model status', '')).lower() for solve in self.solves))
+
+    @property
+    def objective(self) -> float | None:
+        """The objective value of the last solve"""
+        for solve in reversed(self.solves):
+            if solve.get('Objective') is not None:
+                return solve['Objective']
+        return None
+
+    def to_frame(self) -> pd.DataFrame:
+        """The solve summaries as a DataFrame"""
+        return pd.DataFrame(self.solves, columns=['Model', 'Type', 'Solver', 'Direction', 'Solver status', 
+                                                  'Model status', 'Objective', 'Seconds', 'Iterations'])
+
+def parse_listing(file: str | Path) -> RunReport:
+    """
+    Reads the solves of a GAMS listing (.lst) or log file, one line at a time so large files are not loaded into memory
+
+    Args:
+        file (str, Path): The listing or log file
+
+    Returns:
+        RunReport: The solves found in the file
+    """
+    report = RunReport()
+    with open(file, 'r', errors='replace') as f:
+        for line in f:
+            report.read_line(line)
+    return report
+
+
+#%% ------------------------------- ###
+###       3. Writing .inc Files     ###
+### ------------------------------- ###
+
+def format_values(values: pd.Series, precision: int = 10) -> list:
+    """Format a column of a table for GAMS, numbers with the given significant digits and missing values as blanks"""
+    fmt = f'%.{precision}g'
+    if pd.api.types.is_numeric_dtype(values.dtype):
+        return ['' if value != value else fmt % value for value in values.astype('float64').tolist()]
+    
+    # Mixed columns, e.g. from pivot_table with fill_value = ''
+    strings = []
+    for value in values.tolist():
+        if isinstance(value, (int, float, np.number)) and not isinstance(value, bool):
+            strings.append('' if value != value else fmt % value)
+        else:
+            strings.append('' if pd.isna(value) else str(value))
+    return strings
+
+def write_table(f, df: pd.DataFrame, 
+                precision: int = 10,
+                chunk_rows: int = 10000,
+                max_line_length: int = 80000):
+    """
+    Writes a DataFrame as the body of a GAMS table, with the index as row labels and the columns as column labels.
+    Numbers are formatted a column at a time and the rows are written in chunks, without building the whole text in memory. 
+    Tables wider than max_line_length are split into blocks of columns, continued with '+' lines as GAMS expects, 
+    and rows without values in a block are left out
+
+    Args:
+        f (file): The open file to write to
+        df (pd.DataFrame): The table. Index and column levels are joined with ' . '
+        precision (int, optional): Significant digits of the numbers. Defaults to 10.
+        chunk_rows (int, optional): The amount of rows formatted into text at a time. Defaults to 10000.
+        max_line_length (int, optional): The maximum length of a line. Defaults to 80000, the limit of GAMS.
+    """
+    labels = [' . '.join(map(str, label)) if isinstance(label, tuple) else str(label) for label in df.index]
+    headers = [' . '.join(map(str, col)) if isinstance(col, tuple) else str(col) for col in df.columns]
+    label_width = max([len(label) for label in labels] + [1])
+    
+    # Format each column once and find its width
+    cells = [format_values(df.iloc[:, i], precision) for i in range(len(df.columns))]
+    widths = [max([len(header)] + [len(cell) for cell in col]) + 2 for header, col in zip(headers, cells)]
+    
+    # Split in blocks of columns that fit on a line
+    blocks = [[]]
+    line_length = label_width
+    for i, width in enumerate(widths):
+        if len(blocks[-1]) > 0 and line_length + width > max_line_length:
+            blocks.append([])
+            line_length = label_width
+        blocks[-1].append(i)
+        line_length += width
+    
+    for block_number, block in enumerate(blocks):
+        if len(block) == 0:
+            continue
+        # The header of the first block is the table header, the rest are continued with +
+        start = '+' if block_number > 0 else ''
+        f.write(start.ljust(label_width) + ''.join(headers[i].rjust(widths[i]) for i in block) + '\n')
+        
+        fmt = f'%-{label_width}s' + ''.join(f'%{widths[i]}s' for i in block) + '\n'
+        empty = ('',) * len(block)
+        for first_row in range(0, len(labels), chunk_rows):
+            rows = slice(first_row, first_row + chunk_rows)
+            f.write(''.join(fmt % ((label,) + row) for label, row in zip(labels[rows], zip(*[cells[i][rows] for i in block])) 
+                            if row != empty))
+
+# The declaration of a symbol in an .inc file, e.g. TABLE DE1(RRR,DEUSER,YYY) 'Annual electricity consumption (MWh)'
+_declaration_pattern = re.compile(r"^[ \t]*(TABLE|PARAMETERS?|SCALARS?)[ \t]+(\w+)[ \t]*(?:\(([^)]*)\))?[ \t]*('[^'\n]*'|\"[^\"\n]*\")?", 
+                                  re.IGNORECASE | re.MULTILINE)
+
+def find_declaration(text: str) -> tuple | None:
+    """
+    Finds the last declaration of a table or parameter in a text
+
+    Returns:
+        tuple | None: The position where the declaration starts, the keyword, name, domains and explanatory text with quotes, or None if there is no declaration
+    """
+    matches = list(_declaration_pattern.finditer(text))
+    if len(matches) == 0:
+        return None
+    match = matches[-1]
+    domains = [domain.strip() for domain in match.group(3).split(',')] if match.group(3) else []
+    return match.start(), match.group(1).upper(), match.group(2), domains, match.group(4) or ''
+
+def table_to_records(df: pd.DataFrame, domains: list) -> pd.DataFrame:
+    """
+    Converts the body of a GAMS table or parameter to records with one column per domain and a value column. 
+    Labels joined with ' . ' are split into their elements, and blank cells are left out
+
+    Args:
+        df (pd.DataFrame): The body, with the leading domains in the index and the last ones in the columns
+        domains (list): The domains of the symbol. If the index holds all of them, the label of a single column is not part of the records
+
+    Returns:
+        pd.DataFrame: The records, in the format of gams.transfer
+    """
+    def split_labels(labels) -> pd.DataFrame:
+        labels = [' . '.join(map(str, label)) if isinstance(label, tuple) else str(label) for label in labels]
+        return pd.Series(labels, dtype=str).str.split(r'\s*\.\s*', regex=True, expand=True)
+    
+    values = df.apply(pd.to_numeric, errors='coerce').to_numpy(dtype='float64')
+    rows = split_labels(df.index)
+    if len(df.columns) == 1 and len(rows.columns) == len(domains):
+        # A parameter listed in one column, e.g. with a Value header
+        columns = pd.DataFrame(index=range(1))
+    else:
+        columns = split_labels(df.columns)
+    
+    # One record per cell with a value
+    row_positions, column_positions = np.nonzero(~np.isnan(values))
+    records = pd.concat([rows.iloc[row_positions].reset_index(drop=True), 
+                         columns.iloc[column_positions].reset_index(drop=True)], axis=1, ignore_index=True)
+    if len(records.columns) == len(domains):
+        records.columns = domains
+    else:
+        records.columns = ['dim_%d'%(i + 1) for i in range(len(records.columns))]
+    records['value'] = values[row_positions, column_positions]
+    
+    return records
+
+def pivot_table(df: pd.DataFrame, index: list | str, columns: list | str | None = None,
+                values: str = 'Value', aggfunc: str = 'mean', fill_value=None) -> pd.DataFrame:
+    """
+    Same output as DataFrame.pivot_table with the default dropna=True, but placing the values in the table 
+    through sorted integer codes of the index and column elements. Records are only aggregated if some 
+    have the same index and column elements. Falls back to DataFrame.pivot_table for other than float values 
+    without missing values or other aggregation functions than 'sum', 'mean', 'min' and 'max'
+
+    Args:
+        df (pd.DataFrame): The records
+        index (list, str): Columns that become the index
+        columns (list, str, optional): Columns that become the columns. Defaults to None.
+        values (str, optional): The value column. Defaults to 'Value'.
+        aggfunc (str, optional): How to aggregate records with the same elements. Defaults to 'mean', as DataFrame.pivot_table.
+        fill_value (optional): Value of missing cells. Defaults to None.
+
+    Returns:
+        pd.DataFrame: The table
+    """
+    index = [index] if isinstance(index, str) else list(index)
+    columns = [] if columns is None else [columns] if isinstance(columns, str) else list(columns)
+    if (not isinstance(values, str) or df[values].dtype != 'float64' or df[values].isna().any() 
+        or aggfunc not in ['sum', 'mean', 'min', 'max'] or len(df) == 0 or len(index) == 0 
+        or df[index + columns].isna().any().any()):
+        return df.pivot_table(index=index, columns=columns if len(columns) > 0 else None, values=values, 
+                              aggfunc=aggfunc, fill_value=fill_value)
+    
+    def sorted_codes(names: list) -> tuple[np.ndarray, pd.Index] | None:
+        """Position of the elements of each record in the sorted unique combinations of the columns"""
+        factorized = [pd.factorize(df[name], sort=True) for name in names]
+        # Object columns become strings in pivot_table, categoricals stay categorical
+        levels = [pd.Index(uniques.to_numpy()) if uniques.dtype == object else pd.Index(uniques) for _, uniques in factorized]
+        if np.prod([float(len(level)) for level in levels]) > 2**62:
+            return None
+        
+        # Combine the codes in one integer, that sorts the same way as the combinations
+        key = np.zeros(len(df), dtype='int64')
+        for (codes, _), level in zip(factorized, levels):
+            key = key * len(level) + codes
+        present = np.zeros(int(np.prod([len(level) for level in levels])), dtype=bool)
+        present[key] = True
+        unique_keys = np.flatnonzero(present)
+        positions = (np.cumsum(present) - 1)[key]
+        
+        if len(names) == 1:
+            return positions, levels[0].take(unique_keys).rename(names[0])
+        codes = []
+        for level in reversed(levels):
+            codes.insert(0, unique_keys % len(level))
+            unique_keys = unique_keys // len(level)
+        return positions, pd.MultiIndex(levels=levels, codes=codes, names=names)
+    
+    rows = sorted_codes(index)
+    cols = sorted_codes(columns) if len(columns) > 0 else (np.zeros(len(df), dtype='int64'), pd.Index([values]))
+    if rows is None or cols is None or float(len(rows[1])) * len(cols[1]) > 2**62:
+        return df.pivot_table(index=index, columns=columns if len(columns) > 0 else None, values=values, 
+                              aggfunc=aggfunc, fill_value=fill_value)
+    (rows, row_labels), (cols, col_labels) = rows, cols
+    
+    # Aggregate only if elements repeat
+    data = df[values].to_numpy()
+    cells = rows * len(col_labels) + cols
+    size = len(row_labels) * len(col_labels)
+    counts = np.bincount(cells, minlength=size)
+    table = np.full(size, np.nan)
+    if counts.max() <= 1:
+        table[cells] = data
+    elif aggfunc in ['sum', 'mean']:
+        table = np.bincount(cells, weights=data, minlength=size)
+        if aggfunc == 'mean':
+            table = table / np.where(counts > 0, counts, 1)
+        table[counts == 0] = np.nan
+    else:
+        order = np.argsort(cells, kind='stable')
+        starts = np.flatnonzero(np.r_[True, np.diff(cells[order]) != 0])
+        table[cells[order][starts]] = (np.minimum if aggfunc == 'min' else np.maximum).reduceat(data[order], starts)
+    
+    table = pd.DataFrame(table.reshape(len(row_labels), len(col_labels)), index=row_labels, columns=col_labels)
+    if fill_value is not None:
+        table = table.fillna(fill_value)
+    return table
+
+def join_levels(labels: pd.Index) -> pd.Index:
+    """Joins the levels of a MultiIndex with ' . ', as GAMS expects multi-dimensional labels. The labels of each level are joined once per unique element"""
+    if not hasattr(labels, 'levels'):
+        return labels
+    joined = np.asarray(labels.levels[0].astype(str), dtype=object)[labels.codes[0]]
+    for level in range(1, labels.nlevels):
+        joined = joined + ' . ' + np.asarray(labels.levels[level].astype(str), dtype=object)[labels.codes[level]]
+    return pd.Index(joined, dtype=str, name=labels.names[0])
+
+
+#%% ------------------------------- ###
+###       4. Reading .inc Files     ###
+### ------------------------------- ###
+
+# Parts of a label, e.g. DK1 . RESE, 'DK1' . (RESE, OTHER) or T001*T168
+_element = r"""(?:'[^'\n]*'|"[^"\n]*"|\([^)]*\)|[^\s,/.()'"]+)"""
+_label_pattern = re.compile(r'%s(?:[ \t]*\.[ \t]*%s)*'%(_element, _element))
+_element_pattern = re.compile(_element)
+_keyword_pattern = re.compile(r'\s*(SETS?|PARAMETERS?|SCALARS?|TABLE|ALIAS|ACRONYMS?)\b', re.IGNORECASE)
+_symbol_pattern = re.compile(r"""[\s,]*(\w+)[ \t]*(?:\(([^)]*)\))?[ \t]*('[^'\n]*'|"[^"\n]*"|[^/\n'",]*)[ \t]*\s*(?:/((?:'[^'\n]*'|"[^"\n]*"|[^/'"])*)/)?""")
+_assignment_pattern = re.compile(r'\s*(\w+)\s*\(([^)]*)\)\s*=\s*(\w+)\s*\(([^)]*)\)\s*$')
+
+# Special values in .inc files and what they are read as, see special_values
+_special_values = {'eps' : -0.0, 'inf' : np.inf, '+inf' : np.inf, '-inf' : -np.inf, 'na' : np.nan, 'undf' : np.nan}
+
+def _expand_label(label: str) -> list:
+    """The element tuples of a label, expanding lists in parentheses and ranges like T001*T168"""
+    parts = []
+    for part in _element_pattern.findall(label):
+        if part[0] == '(':
+            elements = [element.strip().strip('\'"') for element in part[1:-1].split(',')]
+        else:
+            elements = [part.strip('\'"')]
+        expanded = []
+        for element in elements:
+            bounds = re.fullmatch(r'(.*?)(\d+)\*(.*?)(\d+)', element)
+            if bounds and bounds.group(1) == bounds.group(3):
+                width = len(bounds.group(2))
+                expanded += ['%s%0*d'%(bounds.group(1), width, number) 
+                             for number in range(int(bounds.group(2)), int(bounds.group(4)) + 1)]
+            else:
+                expanded.append(element)
+        parts.append(expanded)
+    return list(product(*parts))
+
+def _parse_value(value: str) -> float:
+    """A number of an .inc file, including special values like EPS and INF"""
+    try:
+        return float(value)
+    except ValueError:
+        if value.lower() in _special_values:
+            return _special_values[value.lower()]
+        raise ValueError("Could not read '%s' as a number"%value)
+
+def _split_statements(text: str) -> list:
+    """Strips comments and dollar control lines from the text of an .inc file and splits it in statements ending with ;"""
+    lines = []
+    in_text_block = False
+    for line in text.splitlines():
+        command = line.strip().lower()
+        if in_text_block:
+            in_text_block = not command.startswith('$offtext')
+        elif command.startswith('$ontext'):
+            in_text_block = True
+        elif not line.startswith('*') and not command.startswith('$'):
+            # Without comments at the end of the line
+            lines.append(line.split('!!')[0])
+    
+    text = '\n'.join(lines)
+    statements = []
+    start = 0
+    for match in re.finditer(r"""'[^'\n]*'|"[^"\n]*"|;""", text):
+        if match.group(0) == ';':
+            statements.append(text[start:match.start()])
+            start = match.end()
+    statements.append(text[start:])
+    return [statement for statement in statements if statement.strip() != '']
+
+def _parse_list(data: str, is_set: bool, is_scalar: bool) -> pd.DataFrame:
+    """Records of a set, parameter or scalar listed between slashes, separated by commas or lines"""
+    records = []
+    for item in re.findall(r"""(?:'[^'\n]*'|"[^"\n]*"|\([^)]*\)|[^,\n'"(])+""", data):
+        item = item.strip()
+        if item == '':
+            continue
+        if is_scalar:
+            # Scalars only have a value
+            records.append((_parse_value(item),))
+            continue
+        label = _label_pattern.match(item)
+        if label is None:
+            raise ValueError("Could not read the element '%s'"%item)
+        rest = item[label.end():].strip()
+        if is_set:
+            # Anything after the elements is explanatory text
+            records += _expand_label(label.group(0))
+        elif rest != '':
+            value = _parse_value(rest.split()[0])
+            records += [elements + (value,) for elements in _expand_label(label.group(0))]
+    
+    records = pd.DataFrame(records)
+    if not is_set and len(records.columns) > 0:
+        records = records.rename(columns={records.columns[-1] : 'Value'})
+    return records
+
+def _label_columns(labels: list, positions: np.ndarray) -> list:
+    """The elements of the labels at the positions, as one categorical per dimension"""
+    elements = pd.DataFrame([label[0] for label in labels])
+    columns = []
+    for dimension in elements.columns:
+        codes, uniques = pd.factorize(elements[dimension])
+        columns.append(pd.Categorical.from_codes(codes[positions], uniques))
+    return columns
+
+def _parse_table(body: str) -> pd.DataFrame:
+    """
+    Records of a GAMS table, where each value belongs to the column label it is written under. Blocks continued with + are combined. 
+    The values of a block are found and placed under their column labels at once, as positions in an array of the characters
+    """
+    lines = [line.expandtabs() for line in body.splitlines() if line.strip() != '']
+    row_labels, column_labels = [], []
+    rows, columns, values = [], [], []
+    
+    # The first line and lines starting with + are headers of a block of columns
+    header_lines = [i for i, line in enumerate(lines) if i == 0 or line.lstrip().startswith('+')]
+    for block_start, block_end in zip(header_lines, header_lines[1:] + [len(lines)]):
+        header = lines[block_start].replace('+', ' ', 1) if block_start > 0 else lines[block_start]
+        matches = list(_label_pattern.finditer(header))
+        header_starts = np.array([match.start() for match in matches])
+        header_ends = np.array([match.end() for match in matches])
+        first_column = len(column_labels)
+        column_labels += [_expand_label(match.group(0)) for match in matches]
+        
+        # Blank out the row labels, leaving the values at their positions
+        first_row = len(row_labels)
+        cells = []
+        for line in lines[block_start + 1:block_end]:
+            label = _label_pattern.match(line, len(line) - len(line.lstrip()))
+            if label is None:
+                raise ValueError("Could not read the row '%s'"%line.strip())
+            row_labels.append(_expand_label(label.group(0)))
+            cells.append(' ' * label.end() + line[label.end():])
+        if len(cells) == 0:
+            continue
+        width = max(len(line) for line in cells) + 1
+        text = ''.join(line.ljust(width) for line in cells).encode('latin-1', errors='replace')
+        
+        # Values start where a character follows a blank and end where a blank follows a character
+        edges = np.diff((np.frombuffer(text, dtype=np.uint8).reshape(len(cells), width) > 32).astype(np.int8), axis=1, prepend=0)
+        token_rows, token_starts = np.nonzero(edges == 1)
+        token_ends = np.nonzero(edges == -1)[1]
+        
+        # The column label the value overlaps the most, of the first two labels ending after the value starts
+        first = np.searchsorted(header_ends, token_starts, side='right')
+        overlaps = []
+        for candidate in [first, first + 1]:
+            valid = candidate < len(matches)
+            candidate = np.minimum(candidate, max(len(matches) - 1, 0))
+            overlaps.append(np.where(valid, np.minimum(token_ends, header_ends[candidate] if len(matches) > 0 else 0) 
+                                            - np.maximum(token_starts, header_starts[candidate] if len(matches) > 0 else 0), 0))
+        column = np.where(overlaps[1] > overlaps[0], first + 1, first)
+        tokens = text.split()
+        if (np.maximum(*overlaps) <= 0).any():
+            position = int(np.argmax(np.maximum(*overlaps) <= 0))
+            raise ValueError("The value '%s' in row '%s' is not under a column label"%(tokens[position].decode('latin-1'), 
+                                                                                      ' . '.join(row_labels[first_row + token_rows[position]][0])))
+        
+        try:
+            block_values = np.array(tokens).astype('float64')
+        except ValueError:
+            block_values = np.array([_parse_value(token.decode('latin-1')) for token in tokens], dtype='float64')
+        rows.append(token_rows + first_row)
+        columns.append(column + first_column)
+        values.append(block_values)
+    
+    if len(values) == 0:
+        return pd.DataFrame()
+    rows, columns, values = np.concatenate(rows), np.concatenate(columns), np.concatenate(values)
+    
+    if all(len(label) == 1 for label in row_labels + column_labels):
+        records = _label_columns(row_labels, rows) + _label_columns(column_labels, columns)
+        records = pd.DataFrame(dict(enumerate(records + [values])))
+    else:
+        # Labels with lists in parentheses give a record per combination
+        records = pd.DataFrame([row + col + (value,) for row_number, column_number, value in zip(rows, columns, values)
+                                for row in row_labels[row_number] for col in column_labels[column_number]])
+    return records.rename(columns={records.columns[-1] : 'Value'})
+
+def _records_to_df(records: pd.DataFrame, symbol: str, domains: list, is_set: bool, result_type: str) -> pd.DataFrame:
+    """A dataframe of parsed records, with the same columns as symbol_to_df would give the symbol"""
+    df = records.set_axis(list(range(len(domains))) + ([] if is_set else ['Value']), axis=1)
+    df = df.astype({column : 'category' for column in range(len(domains))})
+    if is_set:
+        return create_set_columns(df, {symbol : domains}, symbol, preformatted_columns[result_type.lower()], None)
+    else:
+        df['Value'] = df['Value'].astype('float64')
+        return create_parameter_columns(df, {symbol : domains}, symbol, preformatted_columns[result_type.lower()], None)
+
+def parse_incfile(file: str | Path, result_type: str = 'balmorel') -> dict:
+    """
+    Reads the sets, parameters, scalars and tables of an .inc file without GAMS. Supports elements listed between slashes, 
+    labels joined with ' . ', lists in parentheses, ranges like T001*T168, tables continued with '+' blocks and assignments 
+    that only reorder the domains of a symbol in the same file, e.g. DE(YYY,RRR,DEUSER) = DE1(RRR,DEUSER,YYY). 
+    Other statements, dollar control options and $include's are skipped
+
+    Args:
+        file (str, Path): Path to the .inc file
+        result_type (str, optional): The column names to use, see symbol_to_df. Defaults to 'balmorel'.
+
+    Returns:
+        dict: Symbols with records pointing to their dataframe, with columns as symbol_to_df would name them
+    """
+    parsed = {}
+    with open(file, errors='replace') as f:
+        statements = _split_statements(f.read())
+    for statement in statements:
+        keyword = _keyword_pattern.match(statement)
+        assignment = _assignment_pattern.match(statement)
+        if keyword is not None and keyword.group(1).upper() in ['ALIAS', 'ACRONYM', 'ACRONYMS']:
+            continue
+        elif keyword is not None:
+            is_set = keyword.group(1).upper().startswith('SET')
+            is_scalar = keyword.group(1).upper().startswith('SCALAR')
+            position = keyword.end()
+            while position < len(statement) and statement[position:].strip(' \t\n,') != '':
+                match = _symbol_pattern.match(statement, position)
+                if match is None or match.end() == position:
+                    raise ValueError('Could not read the declaration at "%s" in %s'%(statement[position:].strip()[:50], file))
+                position = match.end()
+                symbol = match.group(1)
+                domains = [domain.strip() for domain in match.group(2).split(',')] if match.group(2) else []
+                
+                if keyword.group(1).upper() == 'TABLE':
+                    # The table starts on the line after the declaration
+                    rest = statement[match.end(3):]
+                    records = _parse_table(rest[rest.index('\n') + 1:] if '\n' in rest else '')
+                elif match.group(4) is not None:
+                    records = _parse_list(match.group(4), is_set, is_scalar)
+                else:
+                    continue
+                
+                # Symbols declared without domains have the universe as domains
+                if len(domains) == 0 and len(records) > 0:
+                    domains = ['*'] * (len(records.columns) - (0 if is_set else 1))
+                parsed[symbol] = (domains, is_set, records)
+                if keyword.group(1).upper() == 'TABLE':
+                    break
+        elif assignment is not None and assignment.group(3) in parsed:
+            # Only assignments reordering the domains of another symbol
+            target = [domain.strip() for domain in assignment.group(2).split(',')]
+            source = [domain.strip() for domain in assignment.group(4).split(',')]
+            domains, is_set, records = parsed[assignment.group(3)]
+            if sorted(target) == sorted(source) and len(set(source)) == len(source) and len(source) == len(domains):
+                order = [source.index(domain) for domain in target] + ([] if is_set else [len(source)])
+                parsed[assignment.group(1)] = (target, is_set, records.iloc[:, order])
+    
+    return {symbol : _records_to_df(records, symbol, domains, is_set, result_type) 
+            for symbol, (domains, is_set, records) in parsed.items() if len(records) > 0}
+
+def parse_incfiles(files: list, result_type: str = 'balmorel', max_workers: int | None = None,
+                   cache: dict | None = None, errors: dict | None = None) -> dict:
+    """
+    Parses .inc files in parallel processes with parse_incfile
+
+    Args:
+        files (list): Paths to the .inc files
+        result_type (str, optional): The column names to use, see symbol_to_df. Defaults to 'balmorel'.
+        max_workers (int, optional): The maximum amount of processes. Defaults to the amount of CPU cores.
+        cache (dict, optional): Files parsed before, that are reused if their size and modification time did not change. 
+            The files parsed now are added to it. Defaults to None, which parses all files.
+        errors (dict, optional): Files that could not be parsed are left out and stored here with the error message, 
+            instead of raising a ValueError. Defaults to None.
+
+    Returns:
+        dict: The files pointing to their symbols and dataframes
+    """
+    # The files are stat'ed before parsing, so a file changed while parsing is parsed again next time
+    stats = {Path(file).absolute() : Path(file).absolute().stat() for file in files}
+    parsed = {}
+    to_parse = []
+    for file, stat in stats.items():
+        entry = None if cache is None else cache.get((str(file), result_type.lower()))
+        if entry is not None and entry[0] == stat.st_size and entry[1] == stat.st_mtime_ns:
+            parsed[file] = entry[2]
+        else:
+            to_parse.append(file)
+    
+    def parsed_file(file: Path, parse):
+        try:
+            parsed[file] = parse()
+        except Exception as e:
+            if errors is None:
+                raise ValueError('Could not parse %s: %s'%(file, e)) from e
+            errors[file] = str(e)
+            return
+        if cache is not None:
+            cache[(str(file), result_type.lower())] = (stats[file].st_size, stats[file].st_mtime_ns, parsed[file])
+    
+    if len(to_parse) > 1:
+        max_workers = max(1, min(max_workers or os.cpu_count() or 1, len(to_parse)))
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            futures = {file : pool.submit(parse_incfile, file, result_type) for file in to_parse}
+            for file, future in futures.items():
+                parsed_file(file, future.result)
+    else:
+        for file in to_parse:
+            parsed_file(file, lambda: parse_incfile(file, result_type))
+    
+    # Copies, so the cached dataframes are not changed by the caller
+    return {file : {symbol : df.copy() for symbol, df in parsed[file].items()} for file in stats if file in parsed}
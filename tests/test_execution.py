@@ -11,7 +11,16 @@ Created on 03.10.2024
 ###        0. Script Settings       ###
 ### ------------------------------- ###
 
-from pybalmorel import Balmorel
+from pybalmorel import Balmorel, classes
+from pybalmorel.cache import ScenarioIndex
+from pybalmorel.utils import symbol_hash
+from types import SimpleNamespace
+import threading
+import time
+import asyncio
+import gams
+import os
+import pandas as pd
 
 
 # %% ------------------------------- ###
@@ -27,3 +36,211 @@ def test_Balmorel():
 
     assert scenarios == ["base", "valid_scenario"]
 
+
+def test_Balmorel_index():
+    # The folder index is stored outside the Balmorel folder and reused by the next instance
+    model = Balmorel("examples/Balmorel")
+    assert model.index._index_file.exists() and model.path.resolve() not in model.index._index_file.resolve().parents
+    assert sorted(Balmorel("examples/Balmorel").scenarios) == ["base", "valid_scenario"]
+
+
+def test_scenario_index(tmp_path, monkeypatch):
+    (tmp_path / "Balmorel" / "base" / "model").mkdir(parents=True)
+    for file in ["Balmorel.gms", "cplex.op4", "MainResults_base.gdx"]:
+        (tmp_path / "Balmorel" / "base" / "model" / file).touch()
+    index = ScenarioIndex(tmp_path / "Balmorel", index_directory=tmp_path / "index")
+    assert index.has_model("base") and index.results("base") == ["MainResults_base.gdx"]
+
+    # Unchanged folders are not listed again, neither by a refresh nor by a new index
+    scanned = []
+    scandir = os.scandir
+    monkeypatch.setattr(os, "scandir", lambda path: scanned.append(path) or scandir(path))
+    index.refresh()
+    ScenarioIndex(tmp_path / "Balmorel", index_directory=tmp_path / "index")
+    assert scanned == []
+
+    # A new result file is found by listing its model folder only
+    (tmp_path / "Balmorel" / "base" / "model" / "MainResults_base2.gdx").touch()
+    index.refresh()
+    assert len(scanned) == 1 and index.results("base") == ["MainResults_base.gdx", "MainResults_base2.gdx"]
+
+
+
+class StubJob:
+    """Stands in for a GamsJob, writing a log and optionally waiting until it is interrupted"""
+
+    def __init__(self, behaviour):
+        self.behaviour = behaviour
+        self.started = threading.Event()
+        self.interrupted = threading.Event()
+        self.runs = 0
+
+    def run(self, opt, output=None):
+        self.runs += 1
+        self.started.set()
+        output.write("--- Starting execution\n--- Solving")
+        if self.behaviour == "fail":
+            raise RuntimeError("No license")
+        elif self.behaviour == "wait":
+            self.interrupted.wait(10)
+            raise gams.GamsExceptionExecution("Interrupted", 3)
+
+    def interrupt(self):
+        # Like GamsJob.interrupt, there is nothing to interrupt before the process started
+        if not self.started.is_set():
+            return False
+        self.interrupted.set()
+        return True
+
+
+def stub_workspace(monkeypatch, job, release=None):
+    """Replaces GamsWorkspace in pybalmorel.classes, returning the given job. Creating it waits for release, if given"""
+
+    class StubWorkspace:
+        def __init__(self, working_directory=None, system_directory=None):
+            if release is not None:
+                release.wait(10)
+
+        def add_options(self):
+            return SimpleNamespace(defines={}, threads=None)
+
+        def add_job_from_file(self, file, job_name=None):
+            return job
+
+    monkeypatch.setattr(classes.gams, "GamsWorkspace", StubWorkspace)
+
+
+def test_run_async(monkeypatch):
+    model = Balmorel("examples/Balmorel")
+
+    # A run that finishes
+    job = StubJob("finish")
+    stub_workspace(monkeypatch, job)
+    handle = model.run_async("base")
+    report = handle.wait(10)
+    assert report["Status"] == "Finished" and handle.status() == "Finished" and handle.done()
+    assert handle.log_tail() == ["--- Starting execution", "--- Solving"]
+    assert not handle.cancel()
+
+    # Awaiting the handle gives the same report
+    assert asyncio.run(asyncio.wait_for(model.run_async("base"), 10))["Status"] == "Finished"
+
+    # A failing run is reported, not raised
+    stub_workspace(monkeypatch, StubJob("fail"))
+    handle = model.run_async("base")
+    report = handle.wait(10)
+    assert report["Status"] == "Failed" and report["Error"] == "No license"
+
+    # Cancelled before GAMS started
+    job = StubJob("finish")
+    release = threading.Event()
+    stub_workspace(monkeypatch, job, release)
+    handle = model.run_async("base")
+    assert handle.status() == "Running" and handle.cancel() and handle.status() == "Cancelling"
+    release.set()
+    assert handle.wait(10)["Status"] == "Cancelled" and job.runs == 0
+
+    # Cancelled while running
+    job = StubJob("wait")
+    stub_workspace(monkeypatch, job)
+    handle = model.run_async("base")
+    assert job.started.wait(10) and handle.cancel()
+    assert handle.wait(10)["Status"] == "Cancelled" and handle.status() == "Cancelled" and job.runs == 1
+
+    # Cancelled while the job is about to start, the process is interrupted as soon as it writes to the log
+    job = StubJob("wait")
+    stub_workspace(monkeypatch, job)
+    cancelled = []
+    start = classes.RunHandle._start
+
+    def start_and_cancel(self, job):
+        started = start(self, job)
+        cancelled.append(self.cancel())
+        return started
+
+    monkeypatch.setattr(classes.RunHandle, "_start", start_and_cancel)
+    handle = model.run_async("base")
+    assert handle.wait(10)["Status"] == "Cancelled" and cancelled == [True] and job.interrupted.is_set()
+
+    # A run cancelled before its job is registered never starts it
+    job = StubJob("wait")
+    stub_workspace(monkeypatch, job)
+    monkeypatch.setattr(classes.RunHandle, "_start", lambda self, job: self.cancel() and start(self, job))
+    handle = model.run_async("base")
+    assert handle.wait(10)["Status"] == "Cancelled" and job.runs == 0
+
+
+def test_run_many(monkeypatch):
+    model = Balmorel("examples/Balmorel")
+    running = []
+    calls = []
+    lock = threading.Lock()
+
+    def run_job(self, scenario, cmd_line_options={}, threads=None, handle=None):
+        with lock:
+            running.append(scenario)
+            calls.append((scenario, len(running), threads))
+        time.sleep(0.2)
+        with lock:
+            running.remove(scenario)
+        if scenario == "base":
+            raise RuntimeError("GAMS not found")
+        return {"Scenario": scenario, "Status": "Infeasible", "Seconds": 0.2, "Feasible": False,
+                "Objective": None, "Error": None, "Report": None}, None
+
+    monkeypatch.setattr(Balmorel, "_run_job", run_job)
+
+    # A failing scenario does not stop the infeasible one, and both are reported in the given order
+    report = model.run_many(["valid_scenario", "base"], max_parallel=1, threads_per_job=4)
+    assert list(report.columns) == ["Scenario", "Status", "Seconds", "Feasible", "Objective", "Error", "Report"]
+    assert report.Scenario.tolist() == ["valid_scenario", "base"]
+    assert report.Status.tolist() == ["Infeasible", "Failed"] and report.Error[1] == "GAMS not found"
+    assert all(parallel == 1 and threads == 4 for _, parallel, threads in calls)
+
+    # Running at the same time
+    calls.clear()
+    model.run_many(["valid_scenario", "base"], max_parallel=2)
+    assert max(parallel for _, parallel, _ in calls) == 2
+
+
+def test_load_many_incfiles(monkeypatch):
+    inputs = {
+        "base": {
+            "CCC": pd.DataFrame({"CCC": ["DENMARK", "NORWAY"]}),
+            "GKFX": pd.DataFrame({"RRR": ["DK1", "DK2"], "Value": [10.0, 20.0]}),
+        },
+        "valid_scenario": {
+            "CCC": pd.DataFrame({"CCC": ["DENMARK", "NORWAY"]}),
+            "GKFX": pd.DataFrame({"RRR": ["DK1", "DK3"], "Value": [15.0, 30.0]}),
+        },
+    }
+    sent = {}
+
+    def stub_gdx_to_dfs(file, known_hashes=None, engine=None, system_directory=None):
+        scenario = os.path.basename(file).replace("_input_data.gdx", "")
+        dfs = {}
+        for symbol, df in inputs[scenario].items():
+            df_hash = symbol_hash(df)
+            dfs[symbol] = (df_hash, None if df_hash in known_hashes else df)
+        sent[scenario] = [symbol for symbol, (df_hash, df) in dfs.items() if df is not None]
+        return dfs
+
+    # The GAMS jobs are skipped and the gdx files are read in threads, so the stub can be replaced
+    monkeypatch.setattr(Balmorel, "_prepare_input_gdx", lambda self, *args: None)
+    monkeypatch.setattr(classes, "gdx_to_dfs", stub_gdx_to_dfs)
+    monkeypatch.setattr(classes, "ProcessPoolExecutor", classes.ThreadPoolExecutor)
+
+    model = Balmorel("examples/Balmorel")
+    report = model.load_many_incfiles("valid_scenario").set_index("Scenario")
+    assert report.loc["base", "Status"] == "Loaded existing" and report.loc["base", "Symbols"] == 2
+    assert report.loc["valid_scenario", "Shared"] == 1
+
+    # Base is read first, so the scenario does not send the symbol it shares with base
+    assert sent == {"base": ["CCC", "GKFX"], "valid_scenario": ["GKFX"]}
+    assert model.inputs.get("valid_scenario", "CCC") is model.inputs.get("base", "CCC")
+
+    summary, deltas = model.diff_inputs("base", "valid_scenario")
+    summary = summary.set_index("Symbol")
+    assert summary.loc["CCC", "Status"] == "same" and summary.loc["GKFX", "Status"] == "changed"
+    assert summary.loc["GKFX", ["Added", "Removed", "Changed"]].tolist() == [1, 1, 1]
+    assert list(deltas) == ["GKFX"]
@@ -10,7 +10,10 @@ Created on 03.10.2024
 ###        0. Script Settings       ###
 ### ------------------------------- ###
 
-from pybalmorel import MainResults
+from pybalmorel import MainResults, classes
+from pybalmorel.cli import export
+import pandas as pd
+import pytest
 import os
 
 
@@ -26,6 +29,17 @@ assert gams_system_directory is not None, (
 )
 
 
+def example_results(**kwargs):
+    """The two example scenarios, named SC1 and SC2"""
+    return MainResults(
+        files=["MainResults_Example1.gdx", "MainResults_Example2.gdx"],
+        paths="examples/files",
+        scenario_names=["SC1", "SC2"],
+        system_directory=gams_system_directory,
+        **kwargs,
+    )
+
+
 def test_MainResults():
 
     # Loading one scenario
@@ -118,3 +132,174 @@ def test_MainResults():
     assert "electricity_map.png" in os.listdir(
         "tests/output"
     ) and "hydrogen_map.png" in os.listdir("tests/output")
+
+
+def test_MainResults_categories():
+    # The scenarios and the other text columns are concatenated as categoricals
+    df = example_results().get_result("G_CAP_YCRAF")
+    assert df.Scenario.dtype == "category" and df.Technology.dtype == "category"
+    assert list(df.Scenario.cat.categories) == ["SC1", "SC2"]
+
+
+def test_MainResults_lazy():
+    df = example_results().get_result("G_CAP_YCRAF")
+
+    # Lazy loading only reads symbols when they are asked for
+    res = example_results(lazy=True)
+    assert res.resident_symbols == {"SC1": [], "SC2": []}
+    assert "G_CAP_YCRAF" in res.available_symbols()
+    lazy_df = res.get_result("G_CAP_YCRAF")
+    assert len(lazy_df) == len(df)
+    assert res.resident_symbols["SC2"] == ["G_CAP_YCRAF"]
+    assert (res.memory_usage().Bytes > 0).all()
+
+
+def test_MainResults_parallel():
+    df = example_results().get_result("G_CAP_YCRAF")
+
+    # Extracting from several files in parallel
+    res = example_results(lazy=True, max_workers=2)
+    parallel_df = res.get_result("G_CAP_YCRAF")
+    assert len(parallel_df) == len(df)
+    assert list(res.load_report.Name) == ["SC1", "SC2"]
+
+
+def test_MainResults_cache():
+    res = example_results(lazy=True, cache_size=2**30)
+
+    # Repeated calls are served from the cache, and the scenarios are part of the key
+    res.get_result("G_CAP_YCRAF")
+    res.get_result("G_CAP_YCRAF")
+    res.get_result("G_CAP_YCRAF", scenarios=["SC2"])
+    assert res.cache.info()["hits"] == 1 and res.cache.info()["misses"] == 2
+
+    # Filters are part of the key too
+    res.get_result("G_CAP_YCRAF", filters={"Region": "DK1"})
+    assert res.cache.info()["hits"] == 1
+
+    # The cache is off by default
+    res = example_results(lazy=True)
+    res.get_result("G_CAP_YCRAF")
+    res.get_result("G_CAP_YCRAF")
+    assert res.cache.info()["hits"] == 0
+
+
+def test_MainResults_filters():
+    res = example_results(lazy=True)
+    df = res.get_result("G_CAP_YCRAF")
+
+    # Filters are applied while reading
+    filtered_df = res.get_result("G_CAP_YCRAF", filters={"Scenario": "SC1", "Region": "DK1"})
+    assert list(filtered_df.Scenario.unique()) == ["SC1"] and list(filtered_df.Region.unique()) == ["DK1"]
+    assert len(filtered_df) == len(df[(df.Scenario == "SC1") & (df.Region == "DK1")])
+
+
+def test_MainResults_aggregation():
+    res = example_results(lazy=True)
+    df = res.get_result("G_CAP_YCRAF")
+
+    # Aggregating over the columns that are not kept
+    aggregated_df = res.get_result("G_CAP_YCRAF", keep=["Year", "Region", "Technology"], aggfunc="max")
+    assert list(aggregated_df.columns) == ["Scenario", "Year", "Region", "Technology", "Value"]
+    assert aggregated_df.Value.max() == df.Value.max()
+
+    # Only keeping the scenarios gives one total per scenario
+    total_df = res.get_result("G_CAP_YCRAF", keep=["Scenario"])
+    assert list(total_df.columns) == ["Scenario", "Value"] and list(total_df.Scenario) == ["SC1", "SC2"]
+    assert total_df.Value.tolist() == df.groupby("Scenario", observed=True).Value.sum().tolist()
+
+
+def test_MainResults_iter_result():
+    res = example_results(lazy=True)
+    df = res.get_result("G_CAP_YCRAF")
+
+    # Iterating through a result in chunks
+    chunks = list(res.iter_result("G_CAP_YCRAF", chunk_rows=50))
+    assert sum(len(chunk) for chunk in chunks) == len(df)
+    assert list(chunks[0].columns) == list(df.columns)
+
+
+def test_MainResults_compare():
+    res = example_results(lazy=True)
+
+    # Comparing with a baseline scenario
+    compared_df = res.compare("G_CAP_YCRAF", baseline="SC1", by=["Year", "Technology"])
+    assert list(compared_df.Scenario.unique()) == ["SC2"]
+    assert (compared_df.Delta == compared_df.Value - compared_df.Baseline).all()
+
+
+def test_MainResults_disk_cache():
+    pytest.importorskip("pyarrow")
+
+    # The first session extracts the symbol and stores it
+    res = MainResults(
+        files="MainResults_Example1.gdx",
+        paths="examples/files",
+        system_directory=gams_system_directory,
+        lazy=True,
+        cache_dir="tests/output/cache",
+    )
+    df1 = res.get_result("PRO_YCRAGF")
+    assert res.disk_cache.path("examples/files/MainResults_Example1.gdx", "PRO_YCRAGF").exists()
+
+    # The next session reads the stored symbol
+    res = MainResults(
+        files="MainResults_Example1.gdx",
+        paths="examples/files",
+        system_directory=gams_system_directory,
+        lazy=True,
+        cache_dir="tests/output/cache",
+    )
+    df2 = res.get_result("PRO_YCRAGF")
+    assert df1.equals(df2) and len(res.load_report) == 0
+
+    # Clearing the cache removes the stored symbols
+    res.disk_cache.clear()
+    assert not res.disk_cache.path("examples/files/MainResults_Example1.gdx", "PRO_YCRAGF").exists()
+
+
+def test_MainResults_share():
+    pytest.importorskip("pyarrow")
+    res = example_results(lazy=True)
+    df = res.get_result("PRO_YCRAGF")
+
+    # Worker processes can read exported symbols through memory maps
+    store = res.share("PRO_YCRAGF", "tests/output/shared")
+    assert len(store.get("PRO_YCRAGF")) == len(df)
+    assert len(store.get("PRO_YCRAGF", scenarios=["SC2"])) == (df.Scenario == "SC2").sum()
+    store.clear()
+
+
+def test_MainResults_export():
+    pytest.importorskip("pyarrow")
+    res = example_results(lazy=True)
+    df = res.get_result("PRO_YCRAGF")
+
+    # Exporting to a dataset partitioned by scenario and year
+    report = res.export("PRO_YCRAGF", "tests/output/export")
+    assert report.Records.sum() == len(df) and report.Error.isna().all()
+    assert any(os.scandir("tests/output/export/PRO_YCRAGF/Scenario=SC1"))
+
+
+def test_export_cli(monkeypatch, capsys):
+    calls = {}
+
+    class StubResults:
+        def __init__(self, **kwargs):
+            calls["init"] = kwargs
+
+        def export(self, symbols, directory, **kwargs):
+            calls["export"] = (symbols, directory, kwargs)
+            return pd.DataFrame({"Scenario": ["SC1"], "Symbol": ["G_CAP_YCRAF"], "Records": [10],
+                                 "Seconds": [0.1], "Error": [None]})
+
+    monkeypatch.setattr(classes, "MainResults", StubResults)
+    code = export(["results/MainResults_SC1.gdx", "-s", "G_CAP_YCRAF", "PRO_YCRAGF", "-o", "out",
+                   "-c", "none", "-p", "Scenario", "-w", "2"])
+    assert code == 0
+    assert calls["init"]["files"] == ["MainResults_SC1.gdx"] and calls["init"]["paths"] == ["results"]
+    assert calls["init"]["lazy"]
+    assert calls["export"] == (["G_CAP_YCRAF", "PRO_YCRAGF"], "out",
+                               {"file_format": "parquet", "partition_by": ["Scenario"],
+                                "compression": None, "max_workers": 2})
+    assert "No records found for PRO_YCRAGF" in capsys.readouterr().out
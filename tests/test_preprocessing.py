@@ -11,7 +11,11 @@ Created on 03.10.2024
 ### ------------------------------- ###
 
 from pybalmorel.classes import IncFile, Balmorel
+from pybalmorel.utils import symbol_to_df
+import gams.transfer as gt
 import pandas as pd
+import pytest
+from pathlib import Path
 import os
 
 
@@ -71,6 +75,150 @@ def test_IncFile():
     assert "DE2.inc" in os.listdir("tests/output")
 
 
+def test_IncFile_wide_table():
+    # Wide tables are split in blocks of columns, continued with +
+    DE = IncFile(
+        name="DE3",
+        prefix="TABLE   DE1(RRR,DEUSER,YYY)   'Annual electricity consumption (MWh)'\n",
+        suffix="\n;\nDE(YYY,RRR,DEUSER) = DE1(RRR,DEUSER,YYY);",
+        path="tests/output",
+        body=pd.DataFrame(index=["DK1 . RESE"], columns=[f"T{i:03d}" for i in range(1, 101)], data=[[1.5] * 100]),
+    )
+    DE.save(max_line_length=200)
+    with open("tests/output/DE3.inc") as f:
+        lines = f.read().splitlines()
+    assert max(len(line) for line in lines) <= 200 and lines[3].startswith("+")
+    assert lines[2].split() == ["DK1", ".", "RESE"] + ["1.5"] * (len(lines[1].split()))
+
+
+def test_IncFile_save_many(tmp_path):
+    incfiles = [IncFile(name=f"S{i}", prefix=f"SET S{i} /S01, S02/;", path=str(tmp_path)) for i in range(10)]
+    written = IncFile.save_many(incfiles, max_workers=4)
+    assert list(written) == [str(tmp_path / f"S{i}.inc") for i in range(10)] and all(written.values())
+    assert (tmp_path / "S3.inc").read_text() == "SET S3 /S01, S02/;"
+
+    # The files are written to temporary files that are renamed, and none are left behind
+    assert sorted(file.name for file in tmp_path.iterdir()) == sorted(f"S{i}.inc" for i in range(10))
+
+
+def test_IncFile_write_if_changed(tmp_path):
+    DE = IncFile(
+        name="DE5",
+        prefix="TABLE   DE1(RRR,DEUSER,YYY)   'Annual electricity consumption (MWh)'\n",
+        suffix="\n;",
+        path=str(tmp_path),
+        body=pd.DataFrame(index=["DK1 . RESE"], columns=[2030], data=[[17e6]]),
+    )
+    assert DE.save()
+    mtime = os.stat(tmp_path / "DE5.inc").st_mtime_ns
+
+    # Unchanged files are left untouched, also when saving many at once
+    assert not DE.save()
+    assert list(IncFile.save_many([DE]).values()) == [False]
+    assert os.stat(tmp_path / "DE5.inc").st_mtime_ns == mtime
+
+    # Changed files are written again
+    DE.body = pd.DataFrame(index=["DK1 . RESE"], columns=[2030], data=[[18e6]])
+    assert DE.save()
+    assert "18000000" in (tmp_path / "DE5.inc").read_text()
+
+
+def test_IncFile_gdx_stub(tmp_path, monkeypatch):
+    # The .inc file declares the symbol and loads it from the .gdx file next to it
+    symbols = {}
+
+    class StubContainer:
+        def __init__(self, system_directory=None):
+            pass
+
+        def write(self, file):
+            with open(file, "w") as f:
+                f.write(str(symbols))
+
+        def listSymbols(self):
+            return list(symbols)
+
+    def StubParameter(container, name, domain=None, records=None, description=""):
+        symbols[name] = (domain, records)
+
+    monkeypatch.setattr(gt, "Container", StubContainer)
+    monkeypatch.setattr(gt, "Parameter", StubParameter)
+    DE = IncFile(
+        name="DE6",
+        prefix="TABLE   DE1(RRR,DEUSER,YYY)   'Annual electricity consumption (MWh)'\n",
+        suffix="\n;\nDE(YYY,RRR,DEUSER) = DE1(RRR,DEUSER,YYY);",
+        path=str(tmp_path),
+        body=pd.DataFrame(index=["DK1 . RESE"], columns=[2030], data=[[17e6]]),
+    )
+    assert DE.save(gdx=True)
+    with open(tmp_path / "DE6.inc") as f:
+        assert f.read() == (
+            "PARAMETER DE1(RRR, DEUSER, YYY) 'Annual electricity consumption (MWh)';\n"
+            '$setNames "%system.incName%" gdx_folder . .\n'
+            '$GDXIN "%gdx_folder%DE6.gdx"\n'
+            "$LOAD DE1\n"
+            "$GDXIN\n"
+            "\nDE(YYY,RRR,DEUSER) = DE1(RRR,DEUSER,YYY);"
+        )
+    assert symbols["DE1"][0] == ["RRR", "DEUSER", "YYY"]
+    assert symbols["DE1"][1].values.tolist() == [["DK1", "RESE", "2030", 17e6]]
+
+    # Labels that do not match the domains are not written with another domain
+    DE.body = pd.DataFrame(index=["DK1"], columns=[2030], data=[[17e6]])
+    with pytest.raises(ValueError):
+        DE.save(gdx=True)
+
+
+def test_Balmorel_parse_incfiles(tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    for scenario in ["base", "sc1"]:
+        (tmp_path / scenario / "model").mkdir(parents=True)
+        (tmp_path / scenario / "data").mkdir()
+        (tmp_path / scenario / "model" / "Balmorel.gms").write_text("")
+        (tmp_path / scenario / "model" / "cplex.op4").write_text("")
+    (tmp_path / "base" / "data" / "CCC.inc").write_text("SET CCC / DENMARK, NORWAY /;")
+    (tmp_path / "base" / "data" / "YYY.inc").write_text("SET YYY / 2030, 2040 /;")
+    (tmp_path / "sc1" / "data" / "YYY.inc").write_text("SET YYY / 2050 /;")
+    (tmp_path / "sc1" / "data" / "X.inc").write_text("TABLE X(A,B)\n     C1\nR1    5       7\n;")
+
+    model = Balmorel(tmp_path)
+    report = model.parse_incfiles().set_index("Scenario")
+
+    # The scenario's YYY.inc replaces the one in base, and CCC.inc is read from base
+    assert model.inputs.get("base", "YYY")["*"].tolist() == ["2030", "2040"]
+    assert model.inputs.get("sc1", "YYY")["*"].tolist() == ["2050"]
+    assert model.inputs.shared("sc1", "base") == ["CCC"]
+    assert report.loc["base", "Status"] == "Parsed"
+    assert report.loc["sc1", "Status"] == "Parsed with errors"
+    assert report.loc["sc1", "Error"].startswith("X.inc: ")
+    assert report.loc["sc1", "Shared"] == 1
+
+    # Deleted files are dropped from the cache
+    (tmp_path / "sc1" / "data" / "YYY.inc").unlink()
+    model.parse_incfiles("sc1")
+    assert model.inputs.get("sc1", "YYY")["*"].tolist() == ["2030", "2040"]
+    assert all(Path(key[0]).exists() for key in model._parsed_incfiles)
+
+
+def test_IncFile_gdx():
+    # The data is written to DE4.gdx, and DE4.inc declares and loads it
+    DE = IncFile(
+        name="DE4",
+        prefix="TABLE   DE1(RRR,DEUSER,YYY)   'Annual electricity consumption (MWh)'\n",
+        suffix="\n;\nDE(YYY,RRR,DEUSER) = DE1(RRR,DEUSER,YYY);",
+        path="tests/output",
+        body=pd.DataFrame(index=["DK1 . RESE", "DK2 . RESE"], columns=[2030, 2040, 2050],
+                          data=[[17e6, 20e6, 25e6], [14e6, 17e6, 20e6]]),
+    )
+    DE.save(gdx=True, system_directory=gams_system_directory)
+
+    with open("tests/output/DE4.inc") as f:
+        stub = f.read()
+    assert "$LOAD DE1" in stub and "DE(YYY,RRR,DEUSER) = DE1(RRR,DEUSER,YYY);" in stub
+    df = symbol_to_df("tests/output/DE4.gdx", "DE1", system_directory=gams_system_directory)
+    assert len(df) == 6 and df.Value.sum() == 113e6
+
+
 def test_temporal_aggregation():
 
     if local_balmorel_dir is None:
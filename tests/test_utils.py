@@ -10,8 +10,13 @@ Created on 03.10.2024
 ###        0. Script Settings       ###
 ### ------------------------------- ###
 
-from pybalmorel.utils import symbol_to_df
+from pybalmorel.utils import symbol_to_df, iter_symbol, symbol_metadata, parse_listing, symbol_hash, diff_frames, scenario_deltas, concat_scenarios, table_to_records, pivot_table, parse_incfile, parse_incfiles
+from pybalmorel.cache import build_manifest, compare_manifests, InputStore
+from pybalmorel import cache, utils
+from pybalmorel.classes import IncFile
 import pandas as pd
+import pytest
+import threading
 import gams
 import os
 
@@ -35,6 +40,281 @@ def test_symbol_to_df_mainresults():
     assert type(f) == pd.DataFrame
     
 
+def test_symbol_to_df_engines():
+    ws = gams.GamsWorkspace(system_directory=gams_system_directory)
+    db = ws.add_database_from_gdx(os.path.abspath('examples/files/MainResults_Example1.gdx'))
+    
+    # The columnar and the record-by-record engine must give the same table
+    f1 = symbol_to_df(db, 'PRO_YCRAGF', engine='gams')
+    f2 = symbol_to_df(db, 'PRO_YCRAGF', engine='transfer')
+    assert list(f1.columns) == list(f2.columns)
+    assert f2.Value.dtype == 'float64' and f2.Year.dtype == 'category'
+    f1 = f1.astype({col : str for col in f1.columns[:-1]}).sort_values(list(f1.columns[:-1]), ignore_index=True)
+    f2 = f2.astype({col : str for col in f2.columns[:-1]}).sort_values(list(f2.columns[:-1]), ignore_index=True)
+    pd.testing.assert_frame_equal(f1, f2)
+    
+    # Reading directly from the file path
+    f3 = symbol_to_df('examples/files/MainResults_Example1.gdx', 'PRO_YCRAGF', system_directory=gams_system_directory)
+    assert len(f3) == len(f2)
+    
+    # Filtering while reading gives the same records with both engines
+    filters = {'Year' : 2050, 'Region' : ['DK1', 'DK2']}
+    f4 = symbol_to_df(db, 'PRO_YCRAGF', engine='gams', filters=filters)
+    f5 = symbol_to_df(db, 'PRO_YCRAGF', engine='transfer', filters=filters)
+    expected = f2[(f2.Year == '2050') & f2.Region.isin(['DK1', 'DK2'])]
+    assert len(f4) == len(f5) == len(expected) > 0
+    
+    # Aggregating while reading gives the same totals with both engines
+    f6 = symbol_to_df(db, 'PRO_YCRAGF', engine='gams', keep=['Year', 'Technology'])
+    f7 = symbol_to_df(db, 'PRO_YCRAGF', engine='transfer', keep=['Year', 'Technology'])
+    assert list(f7.columns) == ['Year', 'Technology', 'Value']
+    assert len(f6) == len(f7) == len(f2.groupby(['Year', 'Technology'], observed=True))
+    assert abs(f6.Value.sum() - f2.Value.sum()) < 1e-6 and abs(f7.Value.sum() - f2.Value.sum()) < 1e-6
+    
+    # Reading in chunks, from the loaded database and from the file
+    for source in [db, 'examples/files/MainResults_Example1.gdx']:
+        chunks = list(iter_symbol(source, 'PRO_YCRAGF', chunk_rows=100, system_directory=gams_system_directory))
+        assert all(len(chunk) <= 100 for chunk in chunks)
+        assert list(chunks[0].columns) == list(f2.columns)
+        assert sum(len(chunk) for chunk in chunks) == len(f2)
+    
+
+def test_symbol_metadata():
+    ws = gams.GamsWorkspace(system_directory=gams_system_directory)
+    db = ws.add_database_from_gdx(os.path.abspath('examples/files/MainResults_Example1.gdx'))
+    
+    # The index of the file, read without records, matches the loaded database
+    m1 = symbol_metadata(db)
+    m2 = symbol_metadata('examples/files/MainResults_Example1.gdx', gams_system_directory)
+    assert m2.loc['PRO_YCRAGF', 'Records'] == m1.loc['PRO_YCRAGF', 'Records'] > 0
+    assert m2.loc['PRO_YCRAGF', 'Domains'] == m1.loc['PRO_YCRAGF', 'Domains']
+    assert m2.equals(symbol_metadata('examples/files/MainResults_Example1.gdx', gams_system_directory))
+    
+
+def test_parse_listing():
+    with open('tests/output/listing.lst', 'w') as f:
+        f.write("""
+               S O L V E      S U M M A R Y
+
+     MODEL   BALBASE1            OBJECTIVE  VOBJ
+     TYPE    LP                  DIRECTION  MINIMIZE
+     SOLVER  CPLEX               FROM LINE  45617
+
+**** SOLVER STATUS     1 Normal Completion
+**** MODEL STATUS      1 Optimal
+**** OBJECTIVE VALUE         12345.6789
+
+ RESOURCE USAGE, LIMIT         12.345 10000000000.000
+ ITERATION COUNT, LIMIT      5678    2147483647
+""")
+    report = parse_listing('tests/output/listing.lst')
+    assert report.feasible and report.objective == 12345.6789
+    assert report.to_frame().loc[0, 'Iterations'] == 5678 and report.to_frame().loc[0, 'Solver'] == 'CPLEX'
+    
+    # An infeasible solve status in the solver log
+    report.read_line('LP status(3): infeasible')
+    assert not report.feasible
+    
+
+def test_file_manifest():
+    with open('tests/output/manifest_test.inc', 'w') as f:
+        f.write('SET Y / 2030 /;')
+    m1 = build_manifest(['tests/output/manifest_test.inc'])
+    assert build_manifest(['tests/output/manifest_test.inc'], m1) == m1
+    assert compare_manifests(m1, m1) == {'added' : [], 'removed' : [], 'changed' : []}
+    
+    # Changed content is detected, even if the size is the same
+    with open('tests/output/manifest_test.inc', 'w') as f:
+        f.write('SET Y / 2040 /;')
+    m2 = build_manifest(['tests/output/manifest_test.inc'], m1)
+    assert compare_manifests(m1, m2)['changed'] == list(m2.keys())
+    assert compare_manifests({}, m2)['added'] == list(m2.keys())
+    
+
+def test_write_atomically(tmp_path):
+    def failing_write(tmp):
+        tmp.write_text('partial')
+        raise OSError('Disk full')
+    
+    # Temporary files are removed when writing fails
+    for write in [cache.write_atomically, cache.write_if_changed]:
+        with pytest.raises(OSError):
+            write(tmp_path / 'index.json', failing_write)
+        assert list(tmp_path.iterdir()) == []
+    
+    # Threads writing the same file do not share temporary files
+    def write_index(i):
+        cache.write_atomically(tmp_path / 'index.json', lambda tmp: tmp.write_text('{"thread" : %d}'%i))
+    threads = [threading.Thread(target=write_index, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert [file.name for file in tmp_path.iterdir()] == ['index.json'] and 'thread' in cache.read_json(tmp_path / 'index.json')
+
+
+def test_input_store():
+    df = pd.DataFrame({'R' : pd.Categorical(['DK1', 'DK2']), 'Value' : [1.0, 2.0]})
+    changed = df.assign(Value=[1.0, 3.0])
+    assert symbol_hash(df) == symbol_hash(df.astype({'R' : str})) != symbol_hash(changed)
+    
+    # Symbols with the same content as in base are stored once
+    store = InputStore()
+    store.put('base', {'DE' : (symbol_hash(df), df), 'DH' : (symbol_hash(df), df)})
+    store.put('SC1', {'DE' : (symbol_hash(df), None), 'DH' : (symbol_hash(changed), changed)})
+    assert store.get('SC1', 'DE') is store.get('base', 'DE')
+    assert store.shared('SC1') == ['DE'] and len(store.hashes()) == 2
+    
+
+def test_result_cache():
+    df = pd.DataFrame({'R' : ['DK1', 'DK2'], 'Value' : [1.0, 2.0]})
+    result_cache = cache.ResultCache(2**20)
+    assert result_cache.put(('G_CAP_YCRAF',), df) and result_cache.get(('G_CAP_YCRAF',)) is df
+    
+    # Nothing is stored when the cache is disabled, or the DataFrame does not fit
+    assert not cache.ResultCache(0).put(('G_CAP_YCRAF',), df)
+    assert not cache.ResultCache(10).put(('G_CAP_YCRAF',), df)
+
+
+def test_disk_cache_index(tmp_path, monkeypatch):
+    (tmp_path / 'A.gdx').write_bytes(b'a')
+    (tmp_path / 'B.gdx').write_bytes(b'b')
+    disk_cache = cache.DiskCache(tmp_path / 'cache')
+    hash_a = disk_cache.file_hash(tmp_path / 'A.gdx')
+    
+    # The index is kept in memory, and only read again when another instance wrote to it
+    reads = []
+    read_json = cache.read_json
+    monkeypatch.setattr(cache, 'read_json', lambda file: reads.append(file) or read_json(file))
+    assert [disk_cache.file_hash(tmp_path / 'A.gdx') for i in range(3)] == [hash_a]*3
+    assert reads == []
+    other = cache.DiskCache(tmp_path / 'cache')
+    hash_b = other.file_hash(tmp_path / 'B.gdx')
+    os.utime(other._index_file, ns=(0, disk_cache._index_mtime + 10**9))
+    reads.clear()
+    assert disk_cache.file_hash(tmp_path / 'B.gdx') == hash_b
+    assert len(reads) == 1
+
+
+def test_symbol_to_dfs_errors(monkeypatch):
+    def stub_symbol_to_df(db, symbol, **kwargs):
+        if db == 'missing.gdx':
+            raise utils.SymbolNotFoundError('%s is not in the gdx file'%symbol)
+        elif db == 'broken.gdx':
+            raise ValueError('Something else went wrong')
+        return pd.DataFrame({'Year' : ['2050'], 'Value' : [1.0]})
+    monkeypatch.setattr(utils, 'symbol_to_df', stub_symbol_to_df)
+    
+    # Files without the symbol are reported
+    dfs, report = utils.symbol_to_dfs({'SC1' : 'found.gdx', 'SC2' : 'missing.gdx'}, 'G_CAP_YCRAF')
+    assert list(dfs) == ['SC1'] and report.Error.isna().tolist() == [True, False]
+    assert report.Error[1] == 'G_CAP_YCRAF is not in the gdx file'
+    
+    # Other errors are raised, and an unknown aggfunc before any file is read
+    with pytest.raises(ValueError, match='Something else'):
+        utils.symbol_to_dfs({'SC1' : 'broken.gdx'}, 'G_CAP_YCRAF')
+    with pytest.raises(ValueError, match='Unknown aggfunc'):
+        utils.symbol_to_dfs({'SC1' : 'broken.gdx'}, 'G_CAP_YCRAF', keep=['Year'], aggfunc='median')
+
+
+def test_aggregate_df():
+    df = pd.DataFrame({'Year' : ['2030', '2030', '2050'], 'Region' : ['DK1', 'DK2', 'DK1'], 'Value' : [1.0, 2.0, 4.0]})
+    assert utils.aggregate_df(df, ['Year'], chunk_rows=2).to_dict('list') == {'Year' : ['2030', '2050'], 'Value' : [3.0, 4.0]}
+    
+    # Keeping no columns gives the total of all records
+    assert utils.aggregate_df(df, [], chunk_rows=2).to_dict('list') == {'Value' : [7.0]}
+    assert utils.aggregate_df(df, [], 'mean', chunk_rows=2).Value.tolist() == [7/3]
+
+
+def test_export_symbol(tmp_path, monkeypatch):
+    pytest.importorskip('pyarrow')
+    import pyarrow.dataset as ds
+    years = {'SC1' : ['2030', '2040'], 'SC2' : ['2030']}
+    monkeypatch.setattr(utils, 'iter_symbol', lambda db, symbol, chunk_rows, **kwargs: 
+                        iter([pd.DataFrame({'Year' : years[db], 'Value' : 1.0})]))
+    for SC in years:
+        assert utils.export_symbol(SC, SC, 'G_CAP_YCRAF', tmp_path, partition_by=['Year'])[0] == len(years[SC])
+    
+    # Exporting a scenario again replaces its files, also in partitions it no longer has, and keeps the other scenarios
+    years['SC1'] = ['2050']
+    utils.export_symbol('SC1', 'SC1', 'G_CAP_YCRAF', tmp_path, partition_by=['Year'])
+    df = ds.dataset(tmp_path / 'G_CAP_YCRAF', partitioning='hive').to_table().to_pandas()
+    assert sorted(zip(df.Scenario, df.Year.astype(str))) == [('SC1', '2050'), ('SC2', '2030')]
+
+
+def test_diff_frames():
+    df_a = pd.DataFrame({'R' : pd.Categorical(['DK1', 'DK2', 'DE']), 'Value' : [1.0, 2.0, 3.0]})
+    df_b = pd.DataFrame({'R' : ['DK1', 'DK2', 'NO1'], 'Value' : [1.0, 5.0, 3.0]})
+    df = diff_frames(df_a, df_b, ('base', 'SC1')).set_index('R')
+    assert df['Change'].to_dict() == {'DK2' : 'changed', 'DE' : 'removed', 'NO1' : 'added'}
+    assert df.loc['DK2', 'Value_SC1'] == 5.0
+    
+
+def test_scenario_deltas():
+    df = concat_scenarios({'base' : pd.DataFrame({'R' : ['DK1', 'DK2'], 'Value' : [10.0, 20.0]}),
+                           'SC1' : pd.DataFrame({'R' : ['DK1', 'NO1'], 'Value' : [15.0, 5.0]})})
+    df = scenario_deltas(df, 'base').set_index('R')
+    assert df['Delta'].to_dict() == {'DK1' : 5.0, 'NO1' : 5.0, 'DK2' : -20.0}
+    assert df.loc['DK1', 'Relative'] == 0.5 and (df.Scenario == 'SC1').all()
+    
+
+def test_table_to_records():
+    df = pd.DataFrame(index=['DK1 . RESE', 'DK2 . RESE'], columns=[2030, 2040], data=[[17e6, 20e6], [14e6, '']])
+    records = table_to_records(df, ['RRR', 'DEUSER', 'YYY'])
+    assert list(records.columns) == ['RRR', 'DEUSER', 'YYY', 'value'] and len(records) == 3
+    assert records.iloc[2].tolist() == ['DK2', 'RESE', '2030', 14e6]
+    
+
+def test_pivot_table():
+    df = pd.DataFrame({'R' : ['DK2', 'DK1', 'DK1', 'DK2', 'DK1'], 'Y' : ['2050', '2030', '2030', '2030', '2050'],
+                       'Value' : [1.0, 2.0, 3.0, 4.0, 5.0]})
+    for aggfunc in ['sum', 'mean', 'max']:
+        for fill_value in ['', 0]:
+            expected = df.pivot_table(index=['R'], columns=['Y'], values='Value', aggfunc=aggfunc, fill_value=fill_value)
+            assert pivot_table(df, ['R'], ['Y'], 'Value', aggfunc, fill_value).equals(expected)
+    assert pivot_table(df.iloc[1:], ['Y', 'R'], fill_value='').equals(df.iloc[1:].pivot_table(index=['Y', 'R'], values='Value', fill_value=''))
+    
+
+def test_parse_incfile():
+    # A table written in blocks of columns, a set, a parameter list and an assignment reordering the table
+    body = pd.DataFrame(index=['DK1 . RESE', 'DK2 . RESE'], columns=[f'T{i:03d}' for i in range(1, 31)], 
+                        data=[[1.5] * 30, [2.5] * 29 + [None]])
+    IncFile(name='parse_test', path='tests/output',
+            prefix="* A comment\nSET RRRAAA(RRR,AAA) 'Areas' / DK1 . (DK1_A, DK1_B), DK2 . DK2_A /;\n"
+                   "PARAMETER XK(IRRRE,IRRRI) / DK1 . DK2 600, DK2 . DK1 EPS /;\n"
+                   "TABLE DE_VAR_T1(RRR,DEUSER,TTT) 'Profile'\n",
+            body=body, suffix="\n;\nDE_VAR_T(DEUSER,RRR,TTT) = DE_VAR_T1(RRR,DEUSER,TTT);").save(max_line_length=100)
+    
+    dfs = parse_incfile('tests/output/parse_test.inc')
+    assert dfs['RRRAAA'].astype(str).values.tolist() == [['DK1', 'DK1_A'], ['DK1', 'DK1_B'], ['DK2', 'DK2_A']]
+    assert dfs['XK'].Value.tolist() == [600.0, 0.0]
+    assert len(dfs['DE_VAR_T1']) == 59 and dfs['DE_VAR_T1'].Value.sum() == 1.5 * 30 + 2.5 * 29
+    assert list(dfs['DE_VAR_T'].columns) == ['DEUSER', 'RRR', 'TTT', 'Value']
+    assert dfs['DE_VAR_T'].query('RRR == "DK2" and TTT == "T029"').Value.item() == 2.5
+
+
+def test_parse_incfiles(tmp_path):
+    (tmp_path / 'A.inc').write_text("SET CCC / DENMARK, NORWAY /;")
+    (tmp_path / 'B.inc').write_text("TABLE X(A,B)\n     C1\nR1    5       7\n;")
+    
+    # Errors are raised, or collected if asked for
+    with pytest.raises(ValueError):
+        parse_incfiles([tmp_path / 'A.inc', tmp_path / 'B.inc'])
+    errors = {}
+    parsed = parse_incfiles([tmp_path / 'A.inc', tmp_path / 'B.inc'], errors=errors)
+    assert list(parsed) == [tmp_path / 'A.inc'] and list(errors) == [tmp_path / 'B.inc']
+    
+    # Cached files are only parsed again when they change
+    cache = {}
+    parse_incfiles([tmp_path / 'A.inc'], cache=cache)
+    key = (str(tmp_path / 'A.inc'), 'balmorel')
+    cache[key] = cache[key][:2] + ({'CCC' : pd.DataFrame({'*' : ['CACHED']})},)
+    assert parse_incfiles([tmp_path / 'A.inc'], cache=cache)[tmp_path / 'A.inc']['CCC']['*'].tolist() == ['CACHED']
+    (tmp_path / 'A.inc').write_text("SET CCC / DENMARK, SWEDEN /;")
+    os.utime(tmp_path / 'A.inc', ns=(0, cache[key][1] + 10**9))
+    assert parse_incfiles([tmp_path / 'A.inc'], cache=cache)[tmp_path / 'A.inc']['CCC']['*'].tolist() == ['DENMARK', 'SWEDEN']
+    
+
 # test_symbol_to_df_optiflow()
 
 def test_symbol_to_df_all_endofmodel():